@@ -0,0 +1,209 @@
+from quart import Quart, jsonify, request, Response, make_response
+from quart.json.provider import JSONProvider
+from quart.wrappers.response import DataBody
+from quart_cors import cors
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import HTTPException
+from app.main import create_app, sse_event, chat_conversation_id, record_chat_for, QUOTE_KEEPALIVE_SECONDS
+from app.data_retrieval.stock_data_manager import parse_symbols, MAX_BATCH_SYMBOLS
+from app.database.mongodb import ensure_db
+from app.services import get_assistant_id, get_document_index, get_quote_streamer
+from app.data_retrieval.quote_streamer import AsyncSubscription
+from app.utils.json_provider import OrjsonProviderMixin
+from app.utils.compression import COMPRESSIBLE_MIMETYPES, COMPRESS_MIN_SIZE, is_compressible, choose_encoding, compress
+from app.utils.http_cache import (
+    dataset_name, request_symbols, combine_versions, is_fresh, is_not_modified, apply_validators, is_error
+)
+from app.data_retrieval.async_stock_data_manager import AsyncStockDataManager
+from app.assistant.async_assistant import AsyncStockAnalysisAssistant
+import asyncio
+import functools
+import logging
+import markdown2
+
+# ASGI entry point: the I/O-bound stock, filing and chat endpoints are served by async views;
+# every other route falls through to the existing Flask app.
+#
+#   hypercorn app.asgi:application --bind 0.0.0.0:5000
+
+class AsyncOrjsonProvider(OrjsonProviderMixin, JSONProvider):
+    pass
+
+async_app = cors(Quart(__name__), allow_origin="http://localhost:3000", allow_credentials=True)
+async_app.json = AsyncOrjsonProvider(async_app)
+
+# Same negotiation as app.utils.compression.compress_response; Quart bodies are read asynchronously
+@async_app.after_request
+async def compress_response(response):
+    if response.mimetype in COMPRESSIBLE_MIMETYPES:
+        response.vary.add('Accept-Encoding')
+    if not is_compressible(response) or not isinstance(response.response, DataBody):
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    data = await response.get_data()
+    if encoding and len(data) >= COMPRESS_MIN_SIZE:
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+async_data_manager = AsyncStockDataManager()
+_async_assistant = None
+
+async def get_async_assistant():
+    global _async_assistant
+    if _async_assistant is None:
+        # Resolving the assistant may create it through the sync client, so keep that off the loop
+        assistant_id = await asyncio.to_thread(get_assistant_id)
+        _async_assistant = AsyncStockAnalysisAssistant(async_data_manager, assistant_id, document_index=get_document_index())
+    return _async_assistant
+
+async def load_versions(symbols, dataset):
+    versions = {}
+    async for doc in async_data_manager.stocks.find({'symbol': {'$in': symbols}}, {'symbol': 1, f'data_versions.{dataset}': 1}):
+        versions[doc['symbol']] = (doc.get('data_versions') or {}).get(dataset)
+    return [versions.get(symbol) for symbol in symbols]
+
+def data_response(data):
+    if isinstance(data, str):
+        return Response(data, mimetype='text/plain')
+    return jsonify(data)
+
+# Async counterpart of app.utils.http_cache.conditional_view
+def conditional_view(kind):
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(**view_args):
+            symbols = request_symbols(view_args, request.args)
+            dataset = dataset_name(kind, view_args)
+            if dataset is None:
+                return data_response(await view(**view_args))
+
+            if request.if_none_match or request.if_modified_since:
+                entries = await load_versions(symbols, dataset)
+                validators = combine_versions(entries)
+                if validators and is_fresh(entries, kind) and is_not_modified(request, *validators):
+                    return apply_validators(await make_response('', 304), kind, validators)
+
+            data = await view(**view_args)
+            response = data_response(data)
+            if is_error(data):
+                return response
+            return apply_validators(response, kind, combine_versions(await load_versions(symbols, dataset)))
+        return wrapper
+    return decorator
+
+@async_app.route('/api/stock_summary/<symbol>')
+@conditional_view('summary')
+async def stock_summary(symbol):
+    return await async_data_manager.get_stock_summary(symbol)
+
+@async_app.route('/api/<filing_type>_filing/<symbol>')
+async def get_filing(filing_type, symbol):
+    return jsonify(await async_data_manager.get_filing_info(symbol, filing_type))
+
+@async_app.route('/api/full_report/<filing_type>/<symbol>')
+@conditional_view('report')
+async def get_full_report(filing_type, symbol):
+    return await async_data_manager.get_full_report(filing_type, symbol)
+
+@async_app.route('/api/<statement_type>/<symbol>')
+@async_app.route('/api/<statement_type>/<symbol>/<int:years>')
+@conditional_view('statement')
+async def get_financial_statement(statement_type, symbol, years=5):
+    return await async_data_manager.get_financial_statement(symbol, statement_type, years)
+
+@async_app.route('/api/key_metrics/<symbol>')
+@async_app.route('/api/key_metrics/<symbol>/<int:years>')
+@conditional_view('key_metrics')
+async def get_key_metrics(symbol, years=5):
+    period = request.args.get('period')
+    return await async_data_manager.get_key_metrics(symbol, years, period)
+
+@async_app.route('/api/chat', methods=['POST'])
+async def chat():
+    try:
+        data = await request.get_json()
+        stock_symbol = data.get('stock')
+        message = data.get('message')
+        conversation_history = data.get('conversation_history', [])
+        conversation_id = chat_conversation_id(data)
+
+        if not stock_symbol or not message:
+            return jsonify({"error": "Missing stock symbol or message"}), 400
+        if data.get('user'):
+            await asyncio.to_thread(record_chat, data, conversation_id)
+
+        async_assistant = await get_async_assistant()
+        if data.get('stream') or request.accept_mimetypes.best == 'text/event-stream':
+            return stream_chat(async_assistant, stock_symbol, message, conversation_history, conversation_id)
+
+        response = await async_assistant.process_stock_conversation(stock_symbol, message, conversation_history, conversation_id)
+        return jsonify({"message": markdown2.markdown(response), "conversation_id": conversation_id})
+    except Exception as e:
+        logging.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+def record_chat(data, conversation_id):
+    ensure_db()
+    record_chat_for(data, conversation_id)
+
+def stream_chat(async_assistant, stock_symbol, message, conversation_history, conversation_id):
+    async def generate():
+        chunks = []
+        try:
+            async for delta in async_assistant.stream_stock_conversation(stock_symbol, message, conversation_history, conversation_id):
+                chunks.append(delta)
+                yield sse_event({"delta": delta})
+            yield sse_event({"message": markdown2.markdown("".join(chunks)), "conversation_id": conversation_id}, event="done")
+        except Exception as e:
+            logging.error(f"Error in streaming chat: {str(e)}", exc_info=True)
+            yield sse_event({"error": str(e)}, event="error")
+
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None
+    return response
+
+@async_app.route('/api/quotes/stream')
+async def quote_stream():
+    symbols = parse_symbols(request.args.get('symbols'))
+    if not symbols or len(symbols) > MAX_BATCH_SYMBOLS:
+        return jsonify({"error": f"Pass between 1 and {MAX_BATCH_SYMBOLS} symbols"}), 400
+    streamer = get_quote_streamer()
+    subscription = streamer.subscribe(AsyncSubscription(symbols))
+
+    async def generate():
+        try:
+            while True:
+                quote = await subscription.get(timeout=QUOTE_KEEPALIVE_SECONDS)
+                yield sse_event(quote, event="quote") if quote else ": keepalive\n\n"
+        finally:
+            streamer.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None
+    return response
+
+# Endpoints are matched against the Flask URL map, which has every route; a path is only
+# handed to the async app when Flask would have routed it to one of these views.
+ASYNC_ENDPOINTS = {'api.stock_summary', 'api.get_filing', 'api.get_full_report', 'api.get_financial_statement',
+                   'api.get_key_metrics', 'api.chat', 'api.quote_stream'}
+
+flask_app = create_app()
+flask_asgi = WsgiToAsgi(flask_app)
+flask_urls = flask_app.url_map.bind('localhost')
+
+def is_async_route(scope):
+    try:
+        endpoint, _ = flask_urls.match(scope['path'], method=scope['method'])
+    except HTTPException:
+        return False
+    return endpoint in ASYNC_ENDPOINTS
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and not is_async_route(scope):
+        await flask_asgi(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
@@ -1,24 +1,93 @@
-import openai
 import os
 from dotenv import load_dotenv
 import json
-import time
 import logging
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from app.assistant.sessions import ChatSessionManager
+from app.assistant.tool_output import encode_tool_output
+from app.utils.ttl_cache import TTLCache
 
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+TOOL_RESULT_TTL_SECONDS = int(os.getenv('TOOL_RESULT_TTL_SECONDS', '300'))
+TOOL_CALL_WORKERS = int(os.getenv('TOOL_CALL_WORKERS', '8'))
+ASSISTANT_MODEL = "gpt-4o-mini"
+# Events that end a run without a complete answer
+RUN_END_EVENTS = ('thread.run.failed', 'thread.run.cancelled', 'thread.run.expired', 'thread.run.incomplete')
 
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+# Shared across assistants, turns and users: tool results only depend on (symbol, data_type)
+tool_result_cache = TTLCache(TOOL_RESULT_TTL_SECONDS, maxsize=2048)
+tool_call_executor = ThreadPoolExecutor(max_workers=TOOL_CALL_WORKERS, thread_name_prefix='tool-call')
+
+ASSISTANT_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_stock_data",
+            "description": "Retrieve various types of stock data",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string",
+                        "description": "The stock symbol to retrieve data for"
+                    },
+                    "data_type": {
+                        "type": "string",
+                        "enum": ["summary", "income_statement", "balance_sheet", "cash_flow_statement", "financial_metrics"],
+                        "description": "The type of data to retrieve"
+                    }
+                },
+                "required": ["symbol", "data_type"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_documents",
+            "description": "Search stored SEC filings and financial statement summaries for the passages most relevant to a question",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string",
+                        "description": "The stock symbol whose documents should be searched"
+                    },
+                    "query": {
+                        "type": "string",
+                        "description": "What to look for, e.g. 'risk factors related to supply chain'"
+                    },
+                    "k": {
+                        "type": "integer",
+                        "description": "Number of passages to return (default 5)"
+                    }
+                },
+                "required": ["symbol", "query"]
+            }
+        }
+    }
+]
+
+# openai takes about a second to import, so it is only loaded once an assistant is built
+def default_client():
+    import openai
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    return openai
+
+def run_instructions(stock_symbol):
+    return f"You are analyzing the stock {stock_symbol}. Provide relevant and detailed information based on the user's query. Use the get_stock_data function to retrieve necessary information."
+
+def is_cacheable(data):
+    return not (isinstance(data, dict) and "error" in data)
 
 class StockAnalysisAssistant:
-    def __init__(self, stock_data_manager, assistant_id=None):
+    def __init__(self, stock_data_manager, assistant_id=None, document_index=None, client=None):
         self.stock_data_manager = stock_data_manager
+        # Any object exposing the openai `beta` namespace works, e.g. a local fake of the Assistants API
+        self.client = client or default_client()
+        self.sessions = ChatSessionManager(self.client)
+        self.document_index = document_index
         if assistant_id:
             self.assistant = self.get_assistant(assistant_id)
         else:
@@ -26,14 +95,19 @@ class StockAnalysisAssistant:
 
     def get_assistant(self, assistant_id):
         try:
-            return openai.beta.assistants.retrieve(assistant_id)
+            assistant = self.client.beta.assistants.retrieve(assistant_id)
+            # Assistants created before a tool was added need their tool list refreshed
+            tool_names = {tool.function.name for tool in assistant.tools if tool.type == "function"}
+            if tool_names != {tool["function"]["name"] for tool in ASSISTANT_TOOLS}:
+                assistant = self.client.beta.assistants.update(assistant_id, tools=ASSISTANT_TOOLS)
+            return assistant
         except Exception as e:
             logging.error(f"Error retrieving assistant: {str(e)}")
             raise
 
     def create_assistant(self):
         try:
-            assistant = openai.beta.assistants.create(
+            assistant = self.client.beta.assistants.create(
                 name="Stock Analysis Assistant",
                 instructions="""
                 You are a stock analysis assistant. Your role is to analyze stock data and provide insightful reports.
@@ -47,32 +121,12 @@ class StockAnalysisAssistant:
                 5. Potential risks and opportunities
                 6. A summary and recommendation (buy, sell or hold). Include a recommended entry price.
                 
-                Use the provided tools to fetch and analyze data. Always provide clear explanations and justify your analysis.
+                Use the provided tools to fetch and analyze data. Use search_documents to pull relevant passages
+                from filings instead of asking for whole documents. Always provide clear explanations and justify your analysis.
                 Be conversational and engaging in your responses. Remember the context of the ongoing conversation.
                 """,
-                model="gpt-4o-mini",
-                tools=[{
-                    "type": "function",
-                    "function": {
-                        "name": "get_stock_data",
-                        "description": "Retrieve various types of stock data",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "symbol": {
-                                    "type": "string",
-                                    "description": "The stock symbol to retrieve data for"
-                                },
-                                "data_type": {
-                                    "type": "string",
-                                    "enum": ["summary", "income_statement", "balance_sheet", "cash_flow_statement", "financial_metrics"],
-                                    "description": "The type of data to retrieve"
-                                }
-                            },
-                            "required": ["symbol", "data_type"]
-                        }
-                    }
-                }]
+                model=ASSISTANT_MODEL,
+                tools=ASSISTANT_TOOLS
             )
             return assistant
         except Exception as e:
@@ -90,73 +144,127 @@ class StockAnalysisAssistant:
             else:
                 return {"error": f"Invalid data type: {data_type}"}
             
-            return json.loads(json.dumps(data, cls=CustomJSONEncoder))
+            return data
         except Exception as e:
             logging.error(f"Error getting stock data: {str(e)}")
             return {"error": f"Failed to retrieve {data_type} for {symbol}: {str(e)}"}
 
-    def process_stock_conversation(self, stock_symbol, message, conversation_history):
+    def search_documents(self, symbol, query, k=5):
+        if self.document_index is None:
+            return {"error": "Document search is not available"}
         try:
-            thread = openai.beta.threads.create()
-            
-            # Add conversation history to the thread
-            for msg in conversation_history:
-                openai.beta.threads.messages.create(
-                    thread_id=thread.id,
-                    role=msg['role'],
-                    content=msg['content']
-                )
-            
-            # Add the new user message
-            openai.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=f"Regarding {stock_symbol}: {message}"
-            )
-            
-            run = openai.beta.threads.runs.create(
-                thread_id=thread.id,
-                assistant_id=self.assistant.id,
-                instructions=f"You are analyzing the stock {stock_symbol}. Provide relevant and detailed information based on the user's query. Use the get_stock_data function to retrieve necessary information."
-            )
-            
-            while True:
-                time.sleep(1)
-                run_status = openai.beta.threads.runs.retrieve(
-                    thread_id=thread.id,
-                    run_id=run.id
+            passages = self.document_index.search(query, symbol=symbol, k=k)
+            return [{
+                "source": p["source"],
+                "date": p.get("date"),
+                "score": round(p["score"], 3),
+                "text": p["text"]
+            } for p in passages]
+        except Exception as e:
+            logging.error(f"Error searching documents: {str(e)}")
+            return {"error": f"Failed to search documents for {symbol}: {str(e)}"}
+
+    def get_cached_stock_data(self, symbol, data_type="summary"):
+        return tool_result_cache.get_or_compute(
+            (symbol.upper(), data_type),
+            lambda: self.get_stock_data(symbol, data_type),
+            should_cache=is_cacheable
+        )
+
+    # A failing call (e.g. malformed arguments) answers with an error for its own tool_call_id,
+    # so the other outputs still go back and the run continues
+    def run_tool_call(self, stock_symbol, message, tool_call):
+        try:
+            arguments = json.loads(tool_call.function.arguments or "{}")
+            # The model names the ticker, e.g. the other stock in a comparison
+            symbol = arguments.get('symbol') or stock_symbol
+            if tool_call.function.name == "get_stock_data":
+                data_type = arguments.get('data_type', 'summary')
+                output = encode_tool_output(self.get_cached_stock_data(symbol, data_type), data_type)
+            elif tool_call.function.name == "search_documents":
+                output = encode_tool_output(self.search_documents(symbol, arguments.get('query', message), arguments.get('k', 5)), "documents")
+            else:
+                output = json.dumps({"error": f"Unknown tool: {tool_call.function.name}"})
+        except Exception as e:
+            logging.error(f"Error running tool call {tool_call.function.name}: {str(e)}")
+            output = json.dumps({"error": f"{tool_call.function.name} failed: {str(e)}"})
+        return {
+            "tool_call_id": tool_call.id,
+            "output": output
+        }
+
+    def handle_tool_calls(self, stock_symbol, message, tool_calls):
+        # Tool calls in one batch are independent, so the batch takes as long as its slowest call
+        if len(tool_calls) == 1:
+            return [self.run_tool_call(stock_symbol, message, tool_calls[0])]
+        futures = [tool_call_executor.submit(self.run_tool_call, stock_symbol, message, tool_call)
+                   for tool_call in tool_calls]
+        return [future.result() for future in futures]
+
+    def create_conversation_thread(self, stock_symbol, message, conversation_history, conversation_id=None):
+        new_messages = [{"role": "user", "content": f"Regarding {stock_symbol}: {message}"}]
+        # History is only replayed when a thread is first created
+        initial_messages = [{"role": msg['role'], "content": msg['content']} for msg in conversation_history] + new_messages
+
+        if conversation_id:
+            thread_id, created = self.sessions.open(conversation_id, stock_symbol, initial_messages)
+            if not created:
+                self.client.beta.threads.messages.create(thread_id=thread_id, **new_messages[0])
+            return thread_id
+
+        return self.client.beta.threads.create(messages=initial_messages).id
+
+    def stream_stock_conversation(self, stock_symbol, message, conversation_history, conversation_id=None):
+        thread_id = self.create_conversation_thread(stock_symbol, message, conversation_history, conversation_id)
+
+        stream = self.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=self.assistant.id,
+            instructions=run_instructions(stock_symbol),
+            stream=True
+        )
+
+        # A run pauses on requires_action and continues on the stream returned by submit_tool_outputs.
+        # Each stream is closed before the tool outputs go back, so its connection is released.
+        while stream is not None:
+            required = None
+            with stream:
+                for event in stream:
+                    logging.debug(f"Run event: {event.event}")
+                    if event.event == 'thread.message.delta':
+                        for part in event.data.delta.content or []:
+                            if part.type == 'text' and part.text and part.text.value:
+                                yield part.text.value
+                    elif event.event == 'thread.run.requires_action':
+                        required = event.data
+                        break
+                    elif event.event in RUN_END_EVENTS:
+                        raise Exception(f"Run ended with status: {event.data.status}")
+            stream = None
+            if required is not None:
+                tool_calls = required.required_action.submit_tool_outputs.tool_calls
+                stream = self.client.beta.threads.runs.submit_tool_outputs(
+                    thread_id=thread_id,
+                    run_id=required.id,
+                    tool_outputs=self.handle_tool_calls(stock_symbol, message, tool_calls),
+                    stream=True
                 )
-                logging.debug(f"Run status: {run_status.status}")
-                
-                if run_status.status == 'completed':
-                    break
-                elif run_status.status == 'requires_action':
-                    tool_calls = run_status.required_action.submit_tool_outputs.tool_calls
-                    tool_outputs = []
-                    for tool_call in tool_calls:
-                        if tool_call.function.name == "get_stock_data":
-                            arguments = json.loads(tool_call.function.arguments)
-                            data_type = arguments.get('data_type', 'summary')
-                            output = self.get_stock_data(stock_symbol, data_type)
-                            tool_outputs.append({
-                                "tool_call_id": tool_call.id,
-                                "output": json.dumps(output)
-                            })
-                    openai.beta.threads.runs.submit_tool_outputs(
-                        thread_id=thread.id,
-                        run_id=run.id,
-                        tool_outputs=tool_outputs
-                    )
-                elif run_status.status in ['failed', 'cancelled', 'expired']:
-                    raise Exception(f"Run ended with status: {run_status.status}")
-            
-            messages = openai.beta.threads.messages.list(thread_id=thread.id)
-            for message in reversed(messages.data):
-                if message.role == 'assistant':
-                    content = message.content[0].text.value if isinstance(message.content, list) else message.content
-                    return content
 
-            raise Exception("No assistant message found")
+    def analyze_stock(self, symbol):
+        try:
+            message = "Provide a comprehensive analysis of this stock covering every section of your analysis framework."
+            content = "".join(self.stream_stock_conversation(symbol, message, []))
+            return content or None
+        except Exception as e:
+            logging.error(f"Error analyzing stock {symbol}: {str(e)}", exc_info=True)
+            return None
+
+    def process_stock_conversation(self, stock_symbol, message, conversation_history, conversation_id=None):
+        try:
+            content = "".join(self.stream_stock_conversation(stock_symbol, message, conversation_history, conversation_id))
+            if not content:
+                raise Exception("No assistant message found")
+            return content
         except Exception as e:
             logging.error(f"Error in process_stock_conversation: {str(e)}", exc_info=True)
-            return f"I apologize, but I encountered an error while processing your request. Error details: {str(e)}"
\ No newline at end of file
+            return f"I apologize, but I encountered an error while processing your request. Error details: {str(e)}"
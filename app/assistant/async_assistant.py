@@ -0,0 +1,134 @@
+import json
+import asyncio
+import logging
+from app.assistant.assistant import RUN_END_EVENTS, run_instructions, is_cacheable, tool_result_cache
+from app.assistant.sessions import AsyncChatSessionManager
+from app.assistant.tool_output import encode_tool_output
+
+# Async counterpart of StockAnalysisAssistant for the ASGI app. It reuses the assistant
+# created by the sync app and shares its tool result cache and output encoding.
+class AsyncStockAnalysisAssistant:
+    def __init__(self, data_manager, assistant_id, document_index=None, client=None):
+        self.data_manager = data_manager
+        self.assistant_id = assistant_id
+        self.document_index = document_index
+        if client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI()
+        self.client = client
+        self.sessions = AsyncChatSessionManager(self.client)
+
+    async def get_stock_data(self, symbol, data_type="summary"):
+        key = (symbol.upper(), data_type)
+        data = tool_result_cache.get(key)
+        if data is not None:
+            return data
+
+        if data_type == "summary":
+            data = await self.data_manager.get_stock_summary(symbol)
+        elif data_type in ["income_statement", "balance_sheet", "cash_flow_statement"]:
+            data = await self.data_manager.get_financial_statement(symbol, data_type)
+        elif data_type == "financial_metrics":
+            data = await self.data_manager.get_key_metrics(symbol)
+        else:
+            return {"error": f"Invalid data type: {data_type}"}
+
+        if is_cacheable(data):
+            tool_result_cache.set(key, data)
+        return data
+
+    async def search_documents(self, symbol, query, k=5):
+        if self.document_index is None:
+            return {"error": "Document search is not available"}
+        try:
+            # Embedding the query is CPU work, so it runs in a worker thread
+            passages = await asyncio.to_thread(self.document_index.search, query, symbol, k)
+            return [{
+                "source": p["source"],
+                "date": p.get("date"),
+                "score": round(p["score"], 3),
+                "text": p["text"]
+            } for p in passages]
+        except Exception as e:
+            logging.error(f"Error searching documents: {str(e)}")
+            return {"error": f"Failed to search documents for {symbol}: {str(e)}"}
+
+    async def run_tool_call(self, stock_symbol, message, tool_call):
+        try:
+            arguments = json.loads(tool_call.function.arguments or "{}")
+            symbol = arguments.get('symbol') or stock_symbol
+            if tool_call.function.name == "get_stock_data":
+                data_type = arguments.get('data_type', 'summary')
+                output = encode_tool_output(await self.get_stock_data(symbol, data_type), data_type)
+            elif tool_call.function.name == "search_documents":
+                output = encode_tool_output(await self.search_documents(symbol, arguments.get('query', message), arguments.get('k', 5)), "documents")
+            else:
+                output = json.dumps({"error": f"Unknown tool: {tool_call.function.name}"})
+        except Exception as e:
+            logging.error(f"Error running tool call {tool_call.function.name}: {str(e)}")
+            output = json.dumps({"error": f"{tool_call.function.name} failed: {str(e)}"})
+        return {
+            "tool_call_id": tool_call.id,
+            "output": output
+        }
+
+    async def handle_tool_calls(self, stock_symbol, message, tool_calls):
+        return list(await asyncio.gather(*[self.run_tool_call(stock_symbol, message, tool_call) for tool_call in tool_calls]))
+
+    async def create_conversation_thread(self, stock_symbol, message, conversation_history, conversation_id=None):
+        new_messages = [{"role": "user", "content": f"Regarding {stock_symbol}: {message}"}]
+        initial_messages = [{"role": msg['role'], "content": msg['content']} for msg in conversation_history] + new_messages
+
+        if conversation_id:
+            thread_id, created = await self.sessions.open(conversation_id, stock_symbol, initial_messages)
+            if not created:
+                await self.client.beta.threads.messages.create(thread_id=thread_id, **new_messages[0])
+            return thread_id
+
+        return (await self.client.beta.threads.create(messages=initial_messages)).id
+
+    async def stream_stock_conversation(self, stock_symbol, message, conversation_history, conversation_id=None):
+        thread_id = await self.create_conversation_thread(stock_symbol, message, conversation_history, conversation_id)
+
+        stream = await self.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=self.assistant_id,
+            instructions=run_instructions(stock_symbol),
+            stream=True
+        )
+
+        # Each stream is closed before the tool outputs go back, so its connection is released
+        while stream is not None:
+            required = None
+            async with stream:
+                async for event in stream:
+                    logging.debug(f"Run event: {event.event}")
+                    if event.event == 'thread.message.delta':
+                        for part in event.data.delta.content or []:
+                            if part.type == 'text' and part.text and part.text.value:
+                                yield part.text.value
+                    elif event.event == 'thread.run.requires_action':
+                        required = event.data
+                        break
+                    elif event.event in RUN_END_EVENTS:
+                        raise Exception(f"Run ended with status: {event.data.status}")
+            stream = None
+            if required is not None:
+                tool_calls = required.required_action.submit_tool_outputs.tool_calls
+                stream = await self.client.beta.threads.runs.submit_tool_outputs(
+                    thread_id=thread_id,
+                    run_id=required.id,
+                    tool_outputs=await self.handle_tool_calls(stock_symbol, message, tool_calls),
+                    stream=True
+                )
+
+    async def process_stock_conversation(self, stock_symbol, message, conversation_history, conversation_id=None):
+        try:
+            chunks = [delta async for delta in self.stream_stock_conversation(stock_symbol, message, conversation_history, conversation_id)]
+            content = "".join(chunks)
+            if not content:
+                raise Exception("No assistant message found")
+            return content
+        except Exception as e:
+            logging.error(f"Error in process_stock_conversation: {str(e)}", exc_info=True)
+            return f"I apologize, but I encountered an error while processing your request. Error details: {str(e)}"
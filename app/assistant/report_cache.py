@@ -0,0 +1,69 @@
+import json
+import hashlib
+import logging
+import markdown2
+from datetime import datetime, timezone
+from app.models.stock import Stock
+from app.models.report import AnalysisReport
+
+# Bump when the analysis prompt or rendering changes so every cached report is regenerated
+REPORT_VERSION = 1
+
+PROFILE_FIELDS = ['companyName', 'sector', 'industry', 'description', 'ceo', 'isActivelyTrading']
+# Quote fields that change at most once per session; anything derived from the live price
+# (price, change, pe, marketCap...) would regenerate the report on every quote refresh
+QUOTE_FIELDS = ['previousClose', 'eps', 'sharesOutstanding', 'earningsAnnouncement']
+STATEMENT_FIELDS = ['income_statement', 'balance_sheets', 'cash_flow_statements', 'key_metrics']
+
+def compute_input_hash(symbol):
+    projection = {field: 1 for field in PROFILE_FIELDS}
+    projection.update({f"real_time_quote.{field}": 1 for field in QUOTE_FIELDS})
+    # Statements are stored newest first, so the first element identifies the latest period
+    projection.update({field: {'$slice': 1} for field in STATEMENT_FIELDS})
+
+    doc = Stock._get_collection().find_one({'symbol': symbol}, projection)
+    if not doc:
+        return None
+    doc.pop('_id', None)
+    doc['report_version'] = REPORT_VERSION
+    payload = json.dumps(doc, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ReportCache:
+    def __init__(self, assistant, job_queue):
+        self.assistant = assistant
+        # Regenerations go through the job queue, which also dedupes concurrent refreshes of a symbol
+        self.job_queue = job_queue
+
+    def get_report(self, symbol, force_refresh=False):
+        report = AnalysisReport.objects(symbol=symbol).first()
+        if report is None or force_refresh:
+            return self.generate(symbol)
+
+        input_hash = compute_input_hash(symbol)
+        if input_hash and input_hash != report.input_hash:
+            logging.info(f"Inputs changed for {symbol}; serving cached report and regenerating")
+            self.refresh_in_background(symbol)
+        return report.analysis_html
+
+    def generate(self, symbol):
+        analysis = self.assistant.analyze_stock(symbol)
+        if not analysis:
+            return None
+        html = markdown2.markdown(analysis)
+
+        # Hash after the run: the analysis refreshes the stored data it is based on
+        input_hash = compute_input_hash(symbol)
+        if input_hash:
+            AnalysisReport.objects(symbol=symbol).update_one(
+                upsert=True,
+                set__input_hash=input_hash,
+                set__analysis_markdown=analysis,
+                set__analysis_html=html,
+                set__generated_at=datetime.now(timezone.utc)
+            )
+            logging.info(f"Cached analysis report for {symbol}")
+        return html
+
+    def refresh_in_background(self, symbol):
+        self.job_queue.submit('analyze_stock', {"symbol": symbol, "force_refresh": True})
@@ -0,0 +1,119 @@
+import os
+import logging
+from datetime import datetime, timezone, timedelta
+from dotenv import load_dotenv
+from mongoengine.errors import NotUniqueError
+from pymongo.errors import DuplicateKeyError
+from app.models.chat import ChatSession
+from app.database.async_mongodb import get_async_db
+
+load_dotenv()
+
+CHAT_SESSION_IDLE_MINUTES = int(os.getenv('CHAT_SESSION_IDLE_MINUTES', '60'))
+
+def session_expired(last_active, idle_timeout, now):
+    if last_active.tzinfo is None:
+        last_active = last_active.replace(tzinfo=timezone.utc)
+    return now - last_active > idle_timeout
+
+class ChatSessionManager:
+    def __init__(self, client, idle_minutes=CHAT_SESSION_IDLE_MINUTES):
+        self.client = client
+        self.idle_timeout = timedelta(minutes=idle_minutes)
+
+    def open(self, conversation_id, stock_symbol, initial_messages):
+        # Returns (thread_id, created). A new thread is seeded with initial_messages in a single
+        # call; an existing one is left untouched so the caller only appends the new message.
+        now = datetime.now(timezone.utc)
+        session = ChatSession.objects(conversation_id=conversation_id).first()
+        if session and not session_expired(session.last_active, self.idle_timeout, now):
+            ChatSession.objects(id=session.id).update_one(set__last_active=now, inc__message_count=1)
+            return session.thread_id, False
+
+        if session:
+            self.close(session)
+
+        thread = self.client.beta.threads.create(messages=initial_messages)
+        try:
+            ChatSession(
+                conversation_id=conversation_id,
+                thread_id=thread.id,
+                stock_symbol=stock_symbol,
+                created_at=now,
+                last_active=now,
+                message_count=len(initial_messages)
+            ).save()
+        except NotUniqueError:
+            # Another request opened the same conversation first; use its thread
+            self._delete_thread(thread.id)
+            session = ChatSession.objects(conversation_id=conversation_id).first()
+            return session.thread_id, False
+
+        logging.info(f"Created thread {thread.id} for conversation {conversation_id}")
+        return thread.id, True
+
+    def _delete_thread(self, thread_id):
+        try:
+            self.client.beta.threads.delete(thread_id)
+        except Exception as e:
+            logging.warning(f"Failed to delete thread {thread_id}: {str(e)}")
+
+    def close(self, session):
+        self._delete_thread(session.thread_id)
+        session.delete()
+
+    def expire_idle(self):
+        cutoff = datetime.now(timezone.utc) - self.idle_timeout
+        expired = 0
+        for session in ChatSession.objects(last_active__lt=cutoff):
+            self.close(session)
+            expired += 1
+        if expired:
+            logging.info(f"Expired {expired} idle chat sessions")
+        return expired
+
+# Counterpart of ChatSessionManager for the ASGI app: an AsyncOpenAI client and Motor
+class AsyncChatSessionManager:
+    def __init__(self, client, idle_minutes=CHAT_SESSION_IDLE_MINUTES):
+        self.client = client
+        self.idle_timeout = timedelta(minutes=idle_minutes)
+
+    @property
+    def sessions(self):
+        return get_async_db()[ChatSession._get_collection_name()]
+
+    async def open(self, conversation_id, stock_symbol, initial_messages):
+        now = datetime.now(timezone.utc)
+        session = await self.sessions.find_one({'conversation_id': conversation_id})
+        if session and not session_expired(session['last_active'], self.idle_timeout, now):
+            await self.sessions.update_one({'_id': session['_id']},
+                                           {'$set': {'last_active': now}, '$inc': {'message_count': 1}})
+            return session['thread_id'], False
+
+        if session:
+            await self._delete_thread(session['thread_id'])
+            await self.sessions.delete_one({'_id': session['_id']})
+
+        thread = await self.client.beta.threads.create(messages=initial_messages)
+        try:
+            await self.sessions.insert_one({
+                'conversation_id': conversation_id,
+                'thread_id': thread.id,
+                'stock_symbol': stock_symbol,
+                'created_at': now,
+                'last_active': now,
+                'message_count': len(initial_messages)
+            })
+        except DuplicateKeyError:
+            await self._delete_thread(thread.id)
+            session = await self.sessions.find_one({'conversation_id': conversation_id})
+            return session['thread_id'], False
+
+        logging.info(f"Created thread {thread.id} for conversation {conversation_id}")
+        return thread.id, True
+
+    async def _delete_thread(self, thread_id):
+        try:
+            await self.client.beta.threads.delete(thread_id)
+        except Exception as e:
+            logging.warning(f"Failed to delete thread {thread_id}: {str(e)}")
@@ -0,0 +1,192 @@
+import os
+import json
+import math
+from datetime import datetime, date
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TOOL_OUTPUT_TOKEN_BUDGET = int(os.getenv('TOOL_OUTPUT_TOKEN_BUDGET', '2000'))
+SIGNIFICANT_DIGITS = 4
+MAX_STRING_LENGTH = 400
+# Rough size of a token for JSON-ish English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Fields that identify a row and are never dropped from a period series
+SERIES_KEY_FIELDS = ['date', 'period']
+
+# Most important first; fields not listed are dropped before any listed field
+FIELD_PRIORITIES = {
+    "summary": [
+        "symbol", "companyName", "price", "changesPercentage", "change", "marketCap", "pe", "eps",
+        "volume", "avgVolume", "dayLow", "dayHigh", "yearLow", "yearHigh", "priceAvg50", "priceAvg200",
+        "open", "previousClose", "sector", "industry", "exchange", "currency", "earningsAnnouncement",
+        "sharesOutstanding", "ceo", "ipoDate", "description", "website", "timestamp", "last_updated"
+    ],
+    "income_statement": [
+        "revenue", "netIncome", "eps", "epsdiluted", "grossProfit", "operatingIncome", "ebitda",
+        "grossProfitRatio", "operatingIncomeRatio", "netIncomeRatio", "ebitdaratio", "costOfRevenue",
+        "operatingExpenses", "researchAndDevelopmentExpenses", "sellingGeneralAndAdministrativeExpenses",
+        "interestExpense", "incomeTaxExpense", "incomeBeforeTax", "weightedAverageShsOutDil", "calendarYear"
+    ],
+    "balance_sheet": [
+        "totalAssets", "totalLiabilities", "totalStockholdersEquity", "cashAndCashEquivalents",
+        "cashAndShortTermInvestments", "totalDebt", "netDebt", "totalCurrentAssets", "totalCurrentLiabilities",
+        "longTermDebt", "shortTermDebt", "inventory", "netReceivables", "goodwillAndIntangibleAssets",
+        "retainedEarnings", "totalEquity", "calendarYear"
+    ],
+    "cash_flow_statement": [
+        "operatingCashFlow", "freeCashFlow", "capitalExpenditure", "netIncome", "dividendsPaid",
+        "commonStockRepurchased", "stockBasedCompensation", "depreciationAndAmortization",
+        "netCashUsedForInvestingActivites", "netCashUsedProvidedByFinancingActivities", "netChangeInCash",
+        "changeInWorkingCapital", "acquisitionsNet", "debtRepayment", "calendarYear"
+    ],
+    "financial_metrics": [
+        "peRatio", "pbRatio", "priceToSalesRatio", "enterpriseValueOverEBITDA", "pfcfRatio", "roe", "roic",
+        "debtToEquity", "currentRatio", "freeCashFlowYield", "earningsYield", "dividendYield", "payoutRatio",
+        "netDebtToEBITDA", "interestCoverage", "marketCap", "enterpriseValue", "revenuePerShare",
+        "netIncomePerShare", "freeCashFlowPerShare", "bookValuePerShare", "grahamNumber"
+    ],
+    "documents": ["source", "date", "score", "text"]
+}
+
+def compact_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return None
+        rounded = float(f"{value:.{SIGNIFICANT_DIGITS}g}")
+        return int(rounded) if rounded.is_integer() and abs(rounded) < 1e15 else rounded
+    if isinstance(value, datetime):
+        if (value.hour, value.minute, value.second, value.microsecond) == (0, 0, 0, 0):
+            return value.date().isoformat()
+        return value.replace(microsecond=0, tzinfo=None).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str):
+        # Statement dates arrive as midnight ISO timestamps; the date part carries all the information
+        if len(value) > 10 and value[10:19] == "T00:00:00":
+            return value[:10]
+        if len(value) > MAX_STRING_LENGTH:
+            return value[:MAX_STRING_LENGTH] + "..."
+        return value
+    if isinstance(value, dict):
+        return compact_dict(value)
+    if isinstance(value, (list, tuple)):
+        return [compact_value(v) for v in value]
+    return value
+
+def compact_dict(data):
+    compacted = {}
+    for key, value in data.items():
+        value = compact_value(value)
+        if value is not None and value != "" and value != [] and value != {}:
+            compacted[key] = value
+    return compacted
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str)
+
+def _priority_order(fields, priorities):
+    rank = {field: i for i, field in enumerate(priorities)}
+    return sorted(fields, key=lambda field: (rank.get(field, len(priorities)), field))
+
+def to_columnar(rows, priorities):
+    rows = [compact_dict(row) for row in rows]
+    fields = []
+    seen = set()
+    for row in rows:
+        for field in row:
+            if field not in seen:
+                seen.add(field)
+                fields.append(field)
+
+    # Values shared by every row (symbol, currency, cik...) are stated once
+    constant = {}
+    for field in fields:
+        if field in SERIES_KEY_FIELDS:
+            continue
+        first = rows[0].get(field)
+        if first is not None and all(row.get(field) == first for row in rows):
+            constant[field] = first
+
+    keys = [f for f in SERIES_KEY_FIELDS if f in seen]
+    columns = keys + _priority_order([f for f in fields if f not in constant and f not in keys], priorities)
+    table = {"columns": columns, "rows": [[row.get(field) for field in columns] for row in rows]}
+    if constant:
+        table["constant"] = constant
+    return table
+
+def _fit_columnar(table, budget_chars, priorities):
+    columns = table["columns"]
+    n_keys = len([c for c in columns if c in SERIES_KEY_FIELDS])
+    omitted_count = 0
+
+    # Cost per column in characters, so columns can be dropped without re-serializing
+    costs = [len(_dumps(column)) + sum(len(_dumps(row[i])) + 1 for row in table["rows"]) for i, column in enumerate(columns)]
+    total = len(_dumps(table))
+    keep = list(range(len(columns)))
+    # to_columnar already orders non-key columns by priority, so drop from the end
+    droppable = keep[n_keys:]
+
+    while total > budget_chars and len(droppable) > 1:
+        i = droppable.pop()
+        keep.remove(i)
+        omitted_count += 1
+        total -= costs[i]
+
+    table["columns"] = [columns[i] for i in keep]
+    table["rows"] = [[row[i] for i in keep] for row in table["rows"]]
+
+    # Shared values are trimmed like a dict; a one-row table holds nearly everything here
+    constant = table.get("constant")
+    if constant and len(_dumps(table)) > budget_chars:
+        rest = len(_dumps(dict(table, constant={})))
+        constant = _fit_dict(constant, max(budget_chars - rest, 0), priorities)
+        omitted_count += constant.pop("omitted_fields", 0)
+        table["constant"] = constant
+
+    # Still too large: keep the most recent periods
+    rows = table["rows"]
+    while len(rows) > 1 and len(_dumps(table)) > budget_chars:
+        rows.pop()
+        table["omitted_rows"] = table.get("omitted_rows", 0) + 1
+
+    if omitted_count:
+        table["omitted_fields"] = omitted_count
+    return table
+
+def _fit_dict(data, budget_chars, priorities):
+    ordered = _priority_order(list(data), priorities)
+    compacted = {key: data[key] for key in ordered}
+    omitted = []
+    while len(_dumps(compacted)) > budget_chars and len(compacted) > 1:
+        key = ordered.pop()
+        del compacted[key]
+        omitted.append(key)
+    if omitted:
+        compacted["omitted_fields"] = len(omitted)
+    return compacted
+
+def encode_tool_output(data, data_type=None, token_budget=TOOL_OUTPUT_TOKEN_BUDGET):
+    priorities = FIELD_PRIORITIES.get(data_type, [])
+    budget_chars = token_budget * CHARS_PER_TOKEN
+
+    if isinstance(data, dict):
+        if "error" in data:
+            return _dumps(compact_dict(data))
+        data = compact_dict(data)
+        if len(_dumps(data)) > budget_chars:
+            data = _fit_dict(data, budget_chars, priorities)
+        return _dumps(data)
+
+    if isinstance(data, list) and data and all(isinstance(row, dict) for row in data):
+        table = to_columnar(data, priorities)
+        if len(_dumps(table)) > budget_chars:
+            table = _fit_columnar(table, budget_chars, priorities)
+        return _dumps(table)
+
+    return _dumps(compact_value(data))
@@ -0,0 +1,58 @@
+import json
+import time
+import logging
+import argparse
+from app.backtesting.data import load_prices, synthetic_prices
+from app.backtesting.strategies import STRATEGIES
+from app.backtesting.engine import run_backtest, summarize, DEFAULT_COST_BPS
+from app.backtesting.sweep import run_sweep
+
+# python -m app.backtesting --strategy sma_crossover --symbols AAPL,MSFT fast=10 slow=50
+# python -m app.backtesting --strategy rsi_reversion --fixture 200 2500 --sweep --top 10
+
+def parse_params(pairs):
+    params = {}
+    for pair in pairs:
+        name, _, value = pair.partition('=')
+        params[name] = float(value) if '.' in value else int(value)
+    return params
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest rule-based strategies over stored or synthetic prices")
+    parser.add_argument('params', nargs='*', help="Strategy parameters as name=value (single run)")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='sma_crossover')
+    parser.add_argument('--symbols', help="Comma-separated symbols from the database (default: all stored)")
+    parser.add_argument('--fixture', nargs=2, type=int, metavar=('SYMBOLS', 'BARS'),
+                        help="Use deterministic synthetic prices instead of the database")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sweep', action='store_true', help="Run the strategy's parameter grid")
+    parser.add_argument('--workers', type=int, default=None, help="Processes for --sweep (default: the shared pool, PROCESS_POOL_WORKERS)")
+    parser.add_argument('--cost-bps', type=float, default=DEFAULT_COST_BPS)
+    parser.add_argument('--sort', default='mean_sharpe')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.fixture:
+        data = synthetic_prices(*args.fixture, seed=args.seed)
+    else:
+        from app.database.mongodb import ensure_db
+        ensure_db()
+        data = load_prices(args.symbols.split(',') if args.symbols else None)
+    print(f"{len(data.symbols)} symbols x {data.shape[1]} bars")
+
+    start = time.perf_counter()
+    if args.sweep:
+        results = run_sweep(data, args.strategy, workers=args.workers, cost_bps=args.cost_bps, sort=args.sort)
+        for result in results[:args.top]:
+            print(json.dumps(result))
+        print(f"{len(results)} parameter sets in {time.perf_counter() - start:.2f}s")
+    else:
+        positions = STRATEGIES[args.strategy](data, **parse_params(args.params))
+        if positions is None:
+            parser.error("Invalid parameters for this strategy")
+        print(json.dumps(summarize(run_backtest(data, positions, args.cost_bps)['metrics'])))
+        print(f"Backtest in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
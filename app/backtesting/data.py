@@ -0,0 +1,66 @@
+import numpy as np
+from app.models.stock import Stock
+from app.data_processing.fundamentals import EPOCH_ORDINAL
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+# OHLCV of many symbols on one calendar: each field is a symbol x bar float array,
+# NaN where a symbol has no bar that day
+class PriceData:
+    def __init__(self, symbols, dates, fields):
+        self.symbols = list(symbols)
+        self.dates = dates
+        self.fields = fields
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    @property
+    def shape(self):
+        return self.fields['close'].shape
+
+    def select(self, symbols):
+        rows = [self.symbols.index(symbol) for symbol in symbols]
+        return PriceData(symbols, self.dates, {name: values[rows] for name, values in self.fields.items()})
+
+def load_prices(symbols=None):
+    query = {'symbol': {'$in': list(symbols)}} if symbols is not None else {}
+    projection = {'symbol': 1, **{f'historical_data.{name}': 1 for name in FIELDS + ('date',)}}
+    bars = {}
+    for doc in Stock._get_collection().find(query, projection):
+        history = doc.get('historical_data') or []
+        if history:
+            days = np.array([bar['date'].toordinal() - EPOCH_ORDINAL for bar in history], dtype=np.int64)
+            values = np.array([[bar.get(name, np.nan) for name in FIELDS] for bar in history], dtype=np.float64)
+            bars[doc['symbol']] = (days, values)
+
+    found = [symbol for symbol in (symbols if symbols is not None else sorted(bars)) if symbol in bars]
+    calendar = np.unique(np.concatenate([bars[symbol][0] for symbol in found])) if found else np.array([], dtype=np.int64)
+    fields = {name: np.full((len(found), len(calendar)), np.nan) for name in FIELDS}
+    for row, symbol in enumerate(found):
+        days, values = bars[symbol]
+        columns = np.searchsorted(calendar, days)
+        for i, name in enumerate(FIELDS):
+            fields[name][row, columns] = values[:, i]
+    return PriceData(found, calendar.astype('datetime64[D]'), fields)
+
+# Deterministic stand-in for stored history: the same seed always yields the same bars, so
+# backtests and benchmarks can run without a database or network
+def synthetic_prices(n_symbols=20, n_bars=1000, seed=42, start='2015-01-02'):
+    rng = np.random.default_rng(seed)
+    drift = rng.normal(0.0003, 0.0002, (n_symbols, 1))
+    volatility = rng.uniform(0.01, 0.03, (n_symbols, 1))
+    log_returns = drift + volatility * rng.standard_normal((n_symbols, n_bars))
+    close = rng.uniform(20, 200, (n_symbols, 1)) * np.exp(np.cumsum(log_returns, axis=1))
+    previous = np.concatenate([close[:, :1], close[:, :-1]], axis=1)
+    open_ = previous * (1 + rng.normal(0, 0.002, close.shape))
+    spread = np.abs(rng.normal(0, 0.01, close.shape)) * close
+    fields = {
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.integers(100_000, 5_000_000, close.shape).astype(np.float64),
+    }
+    dates = np.busday_offset(np.datetime64(start, 'D'), np.arange(n_bars), roll='forward')
+    return PriceData([f'SYN{i:04d}' for i in range(n_symbols)], dates, fields)
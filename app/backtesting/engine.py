@@ -0,0 +1,55 @@
+import numpy as np
+
+TRADING_DAYS = 252
+DEFAULT_COST_BPS = 5.0
+
+# Positions decided on bar t's close earn bar t+1's return; every change of position pays
+# `cost_bps` of the traded notional. Everything is computed for all symbols at once.
+def run_backtest(data, positions, cost_bps=DEFAULT_COST_BPS):
+    close = data['close']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.nan_to_num(close[:, 1:] / close[:, :-1] - 1, nan=0.0, posinf=0.0, neginf=0.0)
+    held = positions[:, :-1]
+    turnover = np.abs(np.diff(positions, axis=1, prepend=0.0))[:, :-1]
+    strategy_returns = held * returns - turnover * cost_bps / 10_000
+    equity = np.cumprod(1 + strategy_returns, axis=1)
+    return {
+        'returns': strategy_returns,
+        'equity': equity,
+        'metrics': performance_metrics(strategy_returns, equity, held, turnover),
+    }
+
+def performance_metrics(returns, equity, held, turnover):
+    n_bars = returns.shape[1]
+    if not n_bars:
+        empty = np.full(returns.shape[0], np.nan)
+        return {name: empty for name in ('total_return', 'cagr', 'volatility', 'sharpe', 'max_drawdown', 'exposure', 'trades')}
+    total_return = equity[:, -1] - 1
+    years = n_bars / TRADING_DAYS
+    mean = returns.mean(axis=1)
+    std = returns.std(axis=1, ddof=1) if n_bars > 1 else np.zeros(returns.shape[0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cagr = np.where(equity[:, -1] > 0, equity[:, -1] ** (1 / years) - 1, -1.0)
+        sharpe = np.where(std > 0, mean / std * np.sqrt(TRADING_DAYS), np.nan)
+    peak = np.maximum.accumulate(equity, axis=1)
+    return {
+        'total_return': total_return,
+        'cagr': cagr,
+        'volatility': std * np.sqrt(TRADING_DAYS),
+        'sharpe': sharpe,
+        'max_drawdown': (equity / peak - 1).min(axis=1),
+        'exposure': (held != 0).mean(axis=1),
+        # Entries and exits each count once
+        'trades': (turnover > 0).sum(axis=1),
+    }
+
+# One row per parameter set: metrics averaged over symbols (median for drawdown)
+def summarize(metrics):
+    return {
+        'mean_total_return': float(np.nanmean(metrics['total_return'])),
+        'mean_cagr': float(np.nanmean(metrics['cagr'])),
+        'mean_sharpe': float(np.nanmean(metrics['sharpe'])) if np.any(~np.isnan(metrics['sharpe'])) else None,
+        'median_max_drawdown': float(np.nanmedian(metrics['max_drawdown'])),
+        'mean_exposure': float(np.nanmean(metrics['exposure'])),
+        'total_trades': int(metrics['trades'].sum()),
+    }
@@ -0,0 +1,56 @@
+import numpy as np
+
+# Indicators over symbol x bar arrays, computed for every symbol at once. Each output has the
+# input's shape with NaN until enough bars are available.
+
+def forward_fill(values):
+    # Each NaN takes the last value before it; leading NaNs stay
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return values[np.arange(values.shape[0])[:, None], index]
+
+def sma(values, window):
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        cumulative = np.cumsum(np.concatenate([np.zeros((values.shape[0], 1)), values], axis=1), axis=1)
+        result[:, window - 1:] = (cumulative[:, window:] - cumulative[:, :-window]) / window
+    return result
+
+def _recursive_average(values, alpha, warmup):
+    # y[t] = y[t-1] + alpha * (x[t] - y[t-1]), seeded with each symbol's first bar like
+    # pandas' ewm(adjust=False). Gaps carry the previous value. The recursion runs over bars,
+    # vectorized across symbols; the first `warmup` valid bars of each symbol are NaN.
+    result = np.full(values.shape, np.nan)
+    current = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        current = np.where(np.isnan(current), x, np.where(np.isnan(x), current, current + alpha * (x - current)))
+        result[:, t] = current
+    result[np.cumsum(~np.isnan(values), axis=1) < warmup] = np.nan
+    return result
+
+def ema(values, span):
+    return _recursive_average(values, 2 / (span + 1), span)
+
+def rsi(close, period=14):
+    change = np.diff(close, axis=1)
+    gains = np.clip(change, 0, None)
+    losses = np.clip(-change, 0, None)
+    # Wilder smoothing
+    average_gain = _recursive_average(gains, 1 / period, period)
+    average_loss = _recursive_average(losses, 1 / period, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100 - 100 / (1 + average_gain / average_loss)
+    values = np.where((average_loss == 0) & ~np.isnan(average_gain), 100.0, values)
+    return np.concatenate([np.full((close.shape[0], 1), np.nan), values], axis=1)
+
+def macd(close, fast=12, slow=26, signal=9):
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+def bollinger_bands(close, window=20, num_std=2):
+    middle = sma(close, window)
+    squared = sma(close ** 2, window)
+    std = np.sqrt(np.maximum(squared - middle ** 2, 0) * window / (window - 1))
+    return middle + num_std * std, middle, middle - num_std * std
@@ -0,0 +1,68 @@
+import numpy as np
+from app.backtesting.indicators import forward_fill, sma, ema, rsi, macd, bollinger_bands
+
+# A strategy maps PriceData plus parameters to a symbol x bar array of target positions
+# (1 long, 0 flat, -1 short) decided on each bar's close.
+
+def valid_windows(*windows, minimum=1):
+    # Window and period lengths are bar counts; anything else breaks the indicators
+    return all(isinstance(window, (int, np.integer)) and not isinstance(window, bool) and window >= minimum
+               for window in windows)
+
+def hold_signals(entries, exits):
+    # 1 from an entry bar until the next exit bar, without a Python loop: mark entries 1 and
+    # exits 0, then carry the last mark forward
+    marks = np.full(entries.shape, np.nan)
+    marks[exits] = 0.0
+    marks[entries] = 1.0
+    return np.nan_to_num(forward_fill(marks))
+
+def sma_crossover(data, fast=20, slow=50):
+    if not valid_windows(fast, slow) or fast >= slow:
+        return None
+    close = forward_fill(data['close'])
+    fast_ma, slow_ma = sma(close, fast), sma(close, slow)
+    return (fast_ma > slow_ma).astype(np.float64)
+
+def ema_crossover(data, fast=12, slow=26):
+    if not valid_windows(fast, slow) or fast >= slow:
+        return None
+    close = forward_fill(data['close'])
+    return (ema(close, fast) > ema(close, slow)).astype(np.float64)
+
+def rsi_reversion(data, period=14, lower=30, upper=70):
+    if not valid_windows(period) or lower >= upper:
+        return None
+    values = rsi(forward_fill(data['close']), period)
+    return hold_signals(values < lower, values > upper)
+
+def macd_crossover(data, fast=12, slow=26, signal=9):
+    if not valid_windows(fast, slow, signal) or fast >= slow:
+        return None
+    line, signal_line, _ = macd(forward_fill(data['close']), fast, slow, signal)
+    return (line > signal_line).astype(np.float64)
+
+def bollinger_reversion(data, window=20, num_std=2.0):
+    # The sample standard deviation needs at least two bars
+    if not valid_windows(window, minimum=2):
+        return None
+    close = forward_fill(data['close'])
+    upper, middle, lower = bollinger_bands(close, window, num_std)
+    return hold_signals(close < lower, close > middle)
+
+STRATEGIES = {
+    'sma_crossover': sma_crossover,
+    'ema_crossover': ema_crossover,
+    'rsi_reversion': rsi_reversion,
+    'macd_crossover': macd_crossover,
+    'bollinger_reversion': bollinger_reversion,
+}
+
+# Default sweep grids for `python -m app.backtesting --sweep`
+PARAMETER_GRIDS = {
+    'sma_crossover': {'fast': list(range(5, 55, 5)), 'slow': list(range(20, 260, 10))},
+    'ema_crossover': {'fast': list(range(4, 40, 2)), 'slow': list(range(20, 120, 5))},
+    'rsi_reversion': {'period': [7, 10, 14, 21, 28], 'lower': list(range(15, 45, 5)), 'upper': list(range(55, 90, 5))},
+    'macd_crossover': {'fast': [6, 8, 10, 12, 15], 'slow': [20, 26, 30, 35, 40], 'signal': [5, 7, 9, 12]},
+    'bollinger_reversion': {'window': [10, 15, 20, 30, 40, 50], 'num_std': [1.5, 2.0, 2.5, 3.0]},
+}
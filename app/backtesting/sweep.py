@@ -0,0 +1,63 @@
+import math
+import logging
+import itertools
+from app.backtesting.data import PriceData
+from app.backtesting.strategies import STRATEGIES, PARAMETER_GRIDS
+from app.backtesting.engine import run_backtest, summarize, DEFAULT_COST_BPS
+from app.utils.process_pool import SharedArrays, attach_arrays, map_in_pool, new_process_pool, PROCESS_POOL_WORKERS
+
+def parameter_grid(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+def evaluate(data, strategy, params, cost_bps=DEFAULT_COST_BPS):
+    positions = STRATEGIES[strategy](data, **params)
+    if positions is None:
+        # Invalid combination, e.g. fast >= slow
+        return None
+    return dict({'params': params}, **summarize(run_backtest(data, positions, cost_bps)['metrics']))
+
+def _run_chunk(data, strategy, combos, cost_bps):
+    results = []
+    for params in combos:
+        result = evaluate(data, strategy, params, cost_bps)
+        if result:
+            results.append(result)
+    return results
+
+def _run_shared_chunk(symbols, handles, strategy, combos, cost_bps):
+    # The price arrays are mapped from shared memory, not unpickled, in every worker
+    arrays = attach_arrays(handles)
+    dates = arrays.pop('dates')
+    return _run_chunk(PriceData(symbols, dates, arrays), strategy, combos, cost_bps)
+
+def _sort_key(sort):
+    # Missing values rank last
+    return lambda result: (result[sort] is not None, result[sort] if result[sort] is not None else 0)
+
+def run_sweep(data, strategy, grid=None, workers=None, cost_bps=DEFAULT_COST_BPS, sort='mean_sharpe', chunk_size=None):
+    combos = parameter_grid(grid or PARAMETER_GRIDS[strategy])
+    # Default to the shared pool; an explicit `workers` gets a dedicated one
+    pool_workers = workers or max(PROCESS_POOL_WORKERS, 1)
+    # A few chunks per worker keeps every core busy without paying per-combination overhead
+    chunk_size = chunk_size or max(1, math.ceil(len(combos) / (pool_workers * 4)))
+    chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+    logging.info(f"Sweeping {len(combos)} {strategy} parameter sets over {len(data.symbols)} symbols on {pool_workers} workers")
+
+    results = []
+    if pool_workers == 1:
+        for chunk in chunks:
+            results.extend(_run_chunk(data, strategy, chunk, cost_bps))
+        return sorted(results, key=_sort_key(sort), reverse=True)
+
+    with SharedArrays(dict(data.fields, dates=data.dates)) as shared:
+        tasks = (itertools.repeat(data.symbols, len(chunks)), itertools.repeat(shared.handles, len(chunks)),
+                 itertools.repeat(strategy, len(chunks)), chunks, itertools.repeat(cost_bps, len(chunks)))
+        if workers:
+            with new_process_pool(workers) as pool:
+                chunk_results = list(pool.map(_run_shared_chunk, *tasks))
+        else:
+            chunk_results = map_in_pool(_run_shared_chunk, *tasks)
+    for chunk_result in chunk_results:
+        results.extend(chunk_result)
+    return sorted(results, key=_sort_key(sort), reverse=True)
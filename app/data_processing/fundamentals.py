@@ -0,0 +1,268 @@
+import os
+import time
+import logging
+import threading
+from datetime import date
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from dotenv import load_dotenv
+from app.models.stock import Stock
+
+load_dotenv()
+
+# Statement fields the ratios below are computed from, per Stock list field
+STATEMENT_FIELDS = {
+    'income_statement': ['revenue', 'grossProfit', 'operatingIncome', 'netIncome', 'ebitda', 'interestExpense', 'eps',
+                         'epsdiluted', 'weightedAverageShsOutDil'],
+    'balance_sheets': ['totalAssets', 'totalCurrentAssets', 'totalCurrentLiabilities', 'totalLiabilities', 'totalDebt',
+                       'netDebt', 'cashAndCashEquivalents', 'totalStockholdersEquity'],
+    'cash_flow_statements': ['operatingCashFlow', 'capitalExpenditure', 'freeCashFlow', 'dividendsPaid'],
+}
+# Flows add up over a year; balance-sheet items are point-in-time and are never summed
+FLOW_FIELDS = ['revenue', 'grossProfit', 'operatingIncome', 'netIncome', 'ebitda', 'interestExpense', 'eps', 'epsdiluted',
+               'operatingCashFlow', 'capitalExpenditure', 'freeCashFlow', 'dividendsPaid']
+GROWTH_FIELDS = ['revenue', 'grossProfit', 'operatingIncome', 'netIncome', 'ebitda', 'epsdiluted', 'freeCashFlow', 'operatingCashFlow']
+
+PERIODS = {'annual': ['FY'], 'quarter': ['Q1', 'Q2', 'Q3', 'Q4']}
+# Periods per year, for year-over-year lags
+PERIODS_PER_YEAR = {'annual': 1, 'quarter': 4}
+# Slack allowed when matching period dates against whole quarters or years (52/53-week fiscal years)
+SPAN_TOLERANCE_DAYS = 15
+
+DATE_KEY_RANGE = 10 ** 6
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+SCREEN_CACHE_SECONDS = int(os.getenv('FUNDAMENTALS_CACHE_SECONDS', '600'))
+
+def safe_divide(numerator, denominator):
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype=np.float64), np.asarray(denominator, dtype=np.float64))
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=(denominator != 0) & np.isfinite(denominator))
+    return out
+
+# Statements of many symbols as symbol x period arrays. Each row is right-aligned: the last
+# column is the symbol's latest period and missing periods or fields are NaN.
+class Panel:
+    def __init__(self, symbols, dates, fields, period):
+        self.symbols = symbols
+        self.dates = dates
+        self.fields = fields
+        self.period = period
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def row(self, symbol):
+        return self.symbols.index(symbol)
+
+def load_statement_docs(symbols=None, fields=STATEMENT_FIELDS):
+    projection = {'symbol': 1}
+    for list_field, names in fields.items():
+        projection.update({f'{list_field}.{name}': 1 for name in names + ['date', 'period']})
+    query = {'symbol': {'$in': list(symbols)}} if symbols is not None else {}
+    return list(Stock._get_collection().find(query, projection))
+
+def build_panel(docs, period='annual', fields=STATEMENT_FIELDS, max_periods=None):
+    kinds = PERIODS[period]
+    symbols = [doc['symbol'] for doc in docs]
+    # Flatten every statement into (symbol, date) keyed rows, one set per statement type
+    rows = {}
+    for list_field, names in fields.items():
+        symbol_idx, dates, values = [], [], []
+        for s, doc in enumerate(docs):
+            for statement in doc.get(list_field) or []:
+                if statement.get('period') in kinds and statement.get('date'):
+                    symbol_idx.append(s)
+                    dates.append(statement['date'].toordinal() - EPOCH_ORDINAL)
+                    # Unset fields are not stored, so a missing key is the common case for gaps
+                    values.append([statement.get(name, np.nan) for name in names])
+        values = np.array(values, dtype=np.float64) if values else np.empty((0, len(names)))
+        rows[list_field] = (np.array(symbol_idx, dtype=np.int64), np.array(dates, dtype=np.int64), values)
+
+    # Union of (symbol, date) keys across the three statement types, sorted by symbol then date;
+    # a key is symbol * DATE_KEY_RANGE + days since the epoch
+    all_keys = [s * DATE_KEY_RANGE + d for s, d, _ in rows.values()]
+    keys = np.unique(np.concatenate(all_keys)) if all_keys else np.array([], dtype=np.int64)
+    key_symbol = keys // DATE_KEY_RANGE
+    counts = np.bincount(key_symbol, minlength=len(symbols))
+    n_periods = int(counts.max()) if len(keys) else 0
+    if max_periods:
+        n_periods = min(n_periods, max_periods)
+    # Column of each key: position counted back from the symbol's latest period
+    first = np.concatenate([[0], np.cumsum(counts)[:-1]]) if len(symbols) else np.array([], dtype=np.int64)
+    column = n_periods - counts[key_symbol] + (np.arange(len(keys)) - first[key_symbol])
+    kept = column >= 0
+
+    dates = np.full((len(symbols), n_periods), np.datetime64('NaT'), dtype='datetime64[D]')
+    dates[key_symbol[kept], column[kept]] = (keys[kept] % DATE_KEY_RANGE).astype('datetime64[D]')
+    panel_fields = {}
+    for list_field, names in fields.items():
+        symbol_idx, statement_dates, values = rows[list_field]
+        position = np.searchsorted(keys, symbol_idx * DATE_KEY_RANGE + statement_dates)
+        col = column[position] if len(position) else position
+        keep = col >= 0
+        for i, name in enumerate(names):
+            array = np.full((len(symbols), n_periods), np.nan)
+            array[symbol_idx[keep], col[keep]] = values[keep, i]
+            panel_fields[name] = array
+    return Panel(symbols, dates, panel_fields, period)
+
+def load_panel(symbols=None, period='annual', max_periods=None):
+    return build_panel(load_statement_docs(symbols), period, max_periods=max_periods)
+
+def compute_ratios(panel):
+    p = panel
+    # calculate_roic's definition, with dividendsPaid (reported as a negative outflow) made positive
+    dividends = np.abs(p['dividendsPaid'])
+    return {
+        'gross_margin': safe_divide(p['grossProfit'], p['revenue']),
+        'operating_margin': safe_divide(p['operatingIncome'], p['revenue']),
+        'net_margin': safe_divide(p['netIncome'], p['revenue']),
+        'fcf_margin': safe_divide(p['freeCashFlow'], p['revenue']),
+        'roe': safe_divide(p['netIncome'], p['totalStockholdersEquity']),
+        'roa': safe_divide(p['netIncome'], p['totalAssets']),
+        'roic': safe_divide(p['netIncome'] - dividends, p['totalDebt'] + p['totalStockholdersEquity'] - dividends),
+        'debt_to_equity': safe_divide(p['totalDebt'], p['totalStockholdersEquity']),
+        'debt_to_ebitda': safe_divide(p['totalDebt'], p['ebitda']),
+        'net_debt_to_ebitda': safe_divide(p['netDebt'], p['ebitda']),
+        'current_ratio': safe_divide(p['totalCurrentAssets'], p['totalCurrentLiabilities']),
+        'interest_coverage': safe_divide(p['operatingIncome'], p['interestExpense']),
+        'cash_conversion': safe_divide(p['operatingCashFlow'], p['netIncome']),
+        'payout_ratio': safe_divide(dividends, p['netIncome']),
+    }
+
+def years_apart(dates, lag, years):
+    # Rows are right-aligned on the periods a symbol has, so a missing period shifts the
+    # columns and a fixed lag would compare the wrong periods; the dates have to agree too
+    span = (dates[:, lag:] - dates[:, :-lag]).astype(np.float64)
+    # NaT spans come out hugely negative and fail the check
+    return np.abs(span - years * 365.25) <= SPAN_TOLERANCE_DAYS
+
+def lagged_growth(values, dates, lag, years):
+    # Growth against `lag` periods earlier, measured on |base| so a move from a loss still reads as growth
+    growth = np.full(values.shape, np.nan)
+    if values.shape[1] > lag:
+        change = safe_divide(values[:, lag:] - values[:, :-lag], np.abs(values[:, :-lag]))
+        growth[:, lag:] = np.where(years_apart(dates, lag, years), change, np.nan)
+    return growth
+
+def yoy_growth(values, dates, period='annual'):
+    return lagged_growth(values, dates, PERIODS_PER_YEAR[period], 1)
+
+def cagr(values, dates, years, period='annual'):
+    # Compound annual growth over each trailing `years` window; only defined between positive values
+    lag = years * PERIODS_PER_YEAR[period]
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] > lag:
+        start, end = values[:, :-lag], values[:, lag:]
+        valid = (start > 0) & (end > 0) & years_apart(dates, lag, years)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[:, lag:] = np.where(valid, (end / start) ** (1 / years) - 1, np.nan)
+    return result
+
+def trailing_twelve_months(values, dates):
+    # Rolling four-quarter sums; NaN where a quarter is missing from the values or the dates
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] < 4:
+        return result
+    sums = sliding_window_view(values, 4, axis=1).sum(axis=2)
+    # The first and last of four consecutive quarters end three quarters apart
+    result[:, 3:] = np.where(years_apart(dates, 3, 0.75), sums, np.nan)
+    return result
+
+def compute_growth(panel, years=(3, 5)):
+    growth = {}
+    for field in GROWTH_FIELDS:
+        growth[f'{field}_yoy'] = yoy_growth(panel[field], panel.dates, panel.period)
+        for n in years:
+            growth[f'{field}_cagr_{n}y'] = cagr(panel[field], panel.dates, n, panel.period)
+    growth['dividend_cagr_3y'] = cagr(np.abs(panel['dividendsPaid']), panel.dates, 3, panel.period)
+    return growth
+
+def compute_ttm(panel):
+    if panel.period != 'quarter':
+        return {}
+    ttm = {field: trailing_twelve_months(panel[field], panel.dates) for field in FLOW_FIELDS}
+    ttm['net_margin'] = safe_divide(ttm['netIncome'], ttm['revenue'])
+    ttm['roe'] = safe_divide(ttm['netIncome'], panel['totalStockholdersEquity'])
+    return ttm
+
+def latest(series):
+    # Last column of every symbol x period array
+    return {name: values[:, -1] if values.shape[1] else np.full(values.shape[0], np.nan) for name, values in series.items()}
+
+def _json_values(array):
+    values = array.astype(object)
+    values[np.isnan(array)] = None
+    return values.tolist()
+
+def _json_dates(dates):
+    return [None if np.isnat(d) else str(d) for d in dates]
+
+def get_fundamentals(symbol, period='annual', max_periods=None):
+    if period not in PERIODS:
+        return {"error": f"Invalid period: {period}"}
+    try:
+        panel = load_panel([symbol], period, max_periods)
+    except Exception as e:
+        logging.error(f"Error loading statements for {symbol}: {str(e)}")
+        return {"error": "An unexpected error occurred"}
+    if not panel.symbols or not panel.dates.shape[1]:
+        return {"error": f"No {period} statements found for {symbol}"}
+
+    series = {'ratios': compute_ratios(panel), 'growth': compute_growth(panel), 'ttm': compute_ttm(panel)}
+    row = panel.row(symbol)
+    result = {"symbol": symbol, "period": period, "dates": _json_dates(panel.dates[row])}
+    for group, values in series.items():
+        result[group] = {name: _json_values(array[row]) for name, array in values.items()}
+    return result
+
+# Latest ratios and growth of every stored symbol, as one column per metric
+def universe_snapshot(period='annual'):
+    panel = load_panel(None, period)
+    metrics = dict(compute_ratios(panel), **compute_growth(panel))
+    if period == 'quarter':
+        metrics.update({f'{name}_ttm': values for name, values in compute_ttm(panel).items()})
+    return panel.symbols, latest(metrics)
+
+_snapshot_lock = threading.Lock()
+_snapshots = {}
+
+def cached_universe_snapshot(period='annual'):
+    with _snapshot_lock:
+        cached = _snapshots.get(period)
+        if cached and time.monotonic() - cached[0] < SCREEN_CACHE_SECONDS:
+            return cached[1]
+        snapshot = universe_snapshot(period)
+        _snapshots[period] = (time.monotonic(), snapshot)
+        return snapshot
+
+# `filters` maps a metric to (minimum, maximum), either bound None; symbols missing a
+# filtered metric do not pass
+def screen(filters, period='annual', sort=None, descending=True, limit=50):
+    symbols, metrics = cached_universe_snapshot(period)
+    unknown = [name for name in list(filters) + ([sort] if sort else []) if name not in metrics]
+    if unknown:
+        return {"error": f"Unknown metrics: {', '.join(unknown)}"}
+
+    passed = np.ones(len(symbols), dtype=bool)
+    for name, (minimum, maximum) in filters.items():
+        values = metrics[name]
+        passed &= ~np.isnan(values)
+        if minimum is not None:
+            passed &= values >= minimum
+        if maximum is not None:
+            passed &= values <= maximum
+    indices = np.flatnonzero(passed)
+    if sort:
+        keys = metrics[sort][indices]
+        # NaNs sort last either way
+        order = np.argsort(np.where(np.isnan(keys), -np.inf, keys))[::-1] if descending else np.argsort(keys)
+        indices = indices[order]
+    indices = indices[:limit]
+
+    columns = sorted(set(filters) | ({sort} if sort else set()))
+    results = []
+    for i in indices:
+        results.append(dict({"symbol": symbols[i]}, **{name: _json_values(metrics[name][i:i + 1])[0] for name in columns}))
+    return {"count": int(passed.sum()), "results": results}
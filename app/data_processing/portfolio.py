@@ -0,0 +1,214 @@
+import os
+import logging
+from datetime import datetime, timezone, timedelta
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from app.data_retrieval.stock_api import fetch_stock_data
+from app.models.stock import Stock
+from app.models.user import User
+
+load_dotenv()
+
+BENCHMARK_SYMBOL = os.getenv('PORTFOLIO_BENCHMARK', 'SPY')
+RISK_LOOKBACK_DAYS = int(os.getenv('PORTFOLIO_RISK_LOOKBACK_DAYS', '365'))
+TRADING_DAYS = 252
+# Fewer overlapping daily returns than this and volatility/beta are left unset
+MIN_RETURN_OBSERVATIONS = 20
+
+# Every holding of every user flattened into parallel arrays, ordered by user
+def load_positions():
+    user_ids, counts, symbols, quantities, buy_prices = [], [], [], [], []
+    for doc in User._get_collection().find({'portfolio.0': {'$exists': True}},
+                                           {'portfolio.symbol': 1, 'portfolio.quantity': 1, 'portfolio.average_buy_price': 1}):
+        user_ids.append(doc['_id'])
+        counts.append(len(doc['portfolio']))
+        for position in doc['portfolio']:
+            symbols.append(position['symbol'])
+            quantities.append(position.get('quantity') or 0.0)
+            buy_prices.append(position.get('average_buy_price') or 0.0)
+
+    universe, symbol_idx = np.unique(np.array(symbols, dtype=object), return_inverse=True)
+    return {
+        'user_ids': user_ids,
+        'counts': np.array(counts, dtype=np.int64),
+        'user_idx': np.repeat(np.arange(len(user_ids)), counts),
+        'symbols': list(universe),
+        'symbol_idx': symbol_idx.astype(np.int64),
+        'quantity': np.array(quantities, dtype=np.float64),
+        'average_buy_price': np.array(buy_prices, dtype=np.float64),
+    }
+
+# Latest stored quote per symbol; `overrides` (e.g. QuoteStreamer.latest) wins where present
+def load_prices(symbols, overrides=None):
+    prices = {}
+    for doc in Stock._get_collection().find({'symbol': {'$in': symbols}}, {'symbol': 1, 'real_time_quote.price': 1}):
+        prices[doc['symbol']] = (doc.get('real_time_quote') or {}).get('price')
+    for symbol, quote in (overrides or {}).items():
+        if quote and quote.get('price') is not None:
+            prices[symbol] = quote['price']
+    return np.array([np.nan if prices.get(s) is None else prices[s] for s in symbols], dtype=np.float64)
+
+# Bars change once a day, so the return matrix is reused across the day's valuations
+_returns_cache = {}
+
+def cached_returns(symbols):
+    key = (tuple(symbols), datetime.now(timezone.utc).date())
+    if key not in _returns_cache:
+        _returns_cache.clear()
+        _returns_cache[key] = load_returns(symbols)
+    return _returns_cache[key]
+
+# Daily log returns, one row per symbol on a shared calendar; NaN where a symbol has no bar
+def load_returns(symbols, lookback_days=RISK_LOOKBACK_DAYS):
+    start = datetime.now(timezone.utc) - timedelta(days=lookback_days)
+    bars = {}
+    for doc in Stock._get_collection().find({'symbol': {'$in': symbols}},
+                                            {'symbol': 1, 'historical_data.date': 1, 'historical_data.close': 1}):
+        history = doc.get('historical_data') or []
+        dates = np.array([bar['date'] for bar in history], dtype='datetime64[D]')
+        closes = np.array([bar['close'] for bar in history], dtype=np.float64)
+        keep = dates >= np.datetime64(start.date())
+        bars[doc['symbol']] = (dates[keep], closes[keep])
+
+    if not bars:
+        return np.full((len(symbols), 0), np.nan)
+    calendar = np.unique(np.concatenate([dates for dates, _ in bars.values()]))
+    closes = np.full((len(symbols), len(calendar)), np.nan)
+    for row, symbol in enumerate(symbols):
+        if symbol in bars:
+            dates, values = bars[symbol]
+            closes[row, np.searchsorted(calendar, dates)] = values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.diff(np.log(closes), axis=1)
+
+def value_positions(user_idx, symbol_idx, quantity, average_buy_price, prices, n_users):
+    price = prices[symbol_idx]
+    market_value = quantity * price
+    cost_basis = quantity * average_buy_price
+    pnl = market_value - cost_basis
+    priced = ~np.isnan(market_value)
+
+    total_value = np.bincount(user_idx, weights=np.where(priced, market_value, 0.0), minlength=n_users)
+    total_cost = np.bincount(user_idx, weights=np.where(priced, cost_basis, 0.0), minlength=n_users)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pnl_pct = np.where(cost_basis != 0, pnl / cost_basis, np.nan)
+        weight = np.where(total_value[user_idx] != 0, market_value / total_value[user_idx], np.nan)
+        total_pnl_pct = np.where(total_cost != 0, (total_value - total_cost) / total_cost, np.nan)
+
+    return {
+        'price': price,
+        'market_value': market_value,
+        'unrealized_pnl': pnl,
+        'unrealized_pnl_pct': pnl_pct,
+        'weight': weight,
+        'total_value': total_value,
+        'total_cost': total_cost,
+        'total_pnl': total_value - total_cost,
+        'total_pnl_pct': total_pnl_pct,
+    }
+
+def _deviations(values, mask):
+    n = mask.sum(axis=1)
+    mean = np.where(mask, values, 0.0).sum(axis=1) / n
+    return np.where(mask, values - mean[:, None], 0.0), n
+
+# Annualized volatility of each row of `returns` over the days it has data, and its beta
+# against `benchmark` over the days both have data
+def volatility_and_beta(returns, benchmark):
+    observed = ~np.isnan(returns)
+    both = observed & ~np.isnan(benchmark)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_dev, n_observed = _deviations(returns, observed)
+        volatility = np.sqrt((r_dev ** 2).sum(axis=1) / (n_observed - 1) * TRADING_DAYS)
+        r_dev, n_both = _deviations(returns, both)
+        b_dev, _ = _deviations(benchmark, both)
+        beta = (r_dev * b_dev).sum(axis=1) / (b_dev ** 2).sum(axis=1)
+
+    volatility[n_observed < MIN_RETURN_OBSERVATIONS] = np.nan
+    beta[n_both < MIN_RETURN_OBSERVATIONS] = np.nan
+    return volatility, beta
+
+def portfolio_returns(user_idx, symbol_idx, weight, returns, n_users):
+    # Users x symbols weight matrix (duplicate lots of a symbol add up), so every
+    # portfolio's daily return comes out of one matrix product
+    n_symbols = returns.shape[0]
+    weights = np.bincount(user_idx * n_symbols + symbol_idx, weights=np.nan_to_num(weight),
+                          minlength=n_users * n_symbols).reshape(n_users, n_symbols)
+    return weights @ np.nan_to_num(returns)
+
+def _values(array):
+    # Plain floats for BSON, with NaN stored as null
+    values = array.astype(object)
+    values[np.isnan(array)] = None
+    return values.tolist()
+
+POSITION_FIELDS = ['last_price', 'current_value', 'unrealized_pnl', 'unrealized_pnl_pct', 'weight', 'volatility', 'beta']
+
+def build_updates(positions, valuation, symbol_risk, portfolio_risk, now):
+    symbol_volatility, symbol_beta = symbol_risk
+    symbol_idx = positions['symbol_idx']
+    columns = list(zip(*(_values(column) for column in (
+        valuation['price'], valuation['market_value'], valuation['unrealized_pnl'], valuation['unrealized_pnl_pct'],
+        valuation['weight'], symbol_volatility[symbol_idx], symbol_beta[symbol_idx]))))
+    summaries = list(zip(*(_values(column) for column in (
+        valuation['total_value'], valuation['total_cost'], valuation['total_pnl'], valuation['total_pnl_pct'],
+        *portfolio_risk))))
+
+    updates = []
+    offset = 0
+    for user_id, count, summary in zip(positions['user_ids'], positions['counts'].tolist(), summaries):
+        fields = {}
+        for i in range(count):
+            for name, value in zip(POSITION_FIELDS, columns[offset + i]):
+                fields[f'portfolio.{i}.{name}'] = value
+        total_value, cost_basis, pnl, pnl_pct, volatility, beta = summary
+        fields['portfolio_summary'] = {
+            'total_value': total_value,
+            'cost_basis': cost_basis,
+            'unrealized_pnl': pnl,
+            'unrealized_pnl_pct': pnl_pct,
+            'volatility': volatility,
+            'beta': beta,
+            'valued_at': now,
+        }
+        # Positions are addressed by index, so skip users whose holdings changed since they were read
+        updates.append(UpdateOne({'_id': user_id, 'portfolio': {'$size': count}}, {'$set': fields}))
+        offset += count
+    return updates
+
+# Nothing else stores the benchmark, so its bars are fetched the first time they are missing;
+# update_all_stocks keeps them current from then on like any other stored symbol
+def ensure_benchmark_history(symbol):
+    if Stock._get_collection().find_one({'symbol': symbol, 'historical_data.0': {'$exists': True}}, {'_id': 1}):
+        return True
+    logging.info(f"Fetching price history for benchmark {symbol}")
+    return fetch_stock_data(symbol) is not None
+
+def value_portfolios(quote_overrides=None, benchmark_symbol=BENCHMARK_SYMBOL, write=True):
+    positions = load_positions()
+    n_users = len(positions['user_ids'])
+    if not n_users:
+        return {"users": 0, "positions": 0}
+
+    symbols = positions['symbols']
+    prices = load_prices(symbols, quote_overrides)
+    ensure_benchmark_history(benchmark_symbol)
+    returns = cached_returns(symbols + [benchmark_symbol])
+    symbol_returns, benchmark = returns[:-1], returns[-1]
+    if np.isnan(benchmark).all():
+        logging.warning(f"No price history for benchmark {benchmark_symbol}; betas are left unset")
+        # Retried on the next valuation instead of serving the gap for the rest of the day
+        _returns_cache.clear()
+
+    valuation = value_positions(positions['user_idx'], positions['symbol_idx'], positions['quantity'],
+                                positions['average_buy_price'], prices, n_users)
+    symbol_risk = volatility_and_beta(symbol_returns, np.broadcast_to(benchmark, symbol_returns.shape))
+    user_returns = portfolio_returns(positions['user_idx'], positions['symbol_idx'], valuation['weight'], symbol_returns, n_users)
+    portfolio_risk = volatility_and_beta(user_returns, np.broadcast_to(benchmark, user_returns.shape))
+
+    if write:
+        updates = build_updates(positions, valuation, symbol_risk, portfolio_risk, datetime.now(timezone.utc))
+        result = User._get_collection().bulk_write(updates, ordered=False)
+        logging.info(f"Valued {n_users} portfolios ({len(positions['quantity'])} positions), {result.modified_count} updated")
+    return {"users": n_users, "positions": len(positions['quantity'])}
@@ -0,0 +1,135 @@
+import logging
+from datetime import datetime, timezone
+import numpy as np
+from mongoengine import FloatField
+from app.models.stock import FinancialStatement, BalanceSheet, CashFlowStatement
+from app.models.rollup import StatementRollup
+from app.data_processing.fundamentals import trailing_twelve_months, safe_divide, EPOCH_ORDINAL
+
+ROLLUP_MODELS = {
+    'income_statement': FinancialStatement,
+    'balance_sheet': BalanceSheet,
+    'cash_flow_statement': CashFlowStatement,
+}
+# Balance sheets are point-in-time, so their "TTM" view is the latest quarter's balances
+FLOW_STATEMENTS = ('income_statement', 'cash_flow_statement')
+QUARTERS = ('Q1', 'Q2', 'Q3', 'Q4')
+
+def numeric_fields(statement_type):
+    model_cls = ROLLUP_MODELS[statement_type]
+    return [name for name, field in model_cls._fields.items() if isinstance(field, FloatField)]
+
+def _values(array):
+    values = array.astype(object)
+    values[np.isnan(array)] = None
+    return values.tolist()
+
+def _date(value):
+    # Stored dates come back naive (UTC), freshly built ones are aware
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def period_series(statements, fields):
+    # Oldest first, one array per field, aligned with `dates`
+    statements = sorted(statements, key=lambda s: s['date'])
+    matrix = np.array([[s.get(name, np.nan) for name in fields] for s in statements], dtype=np.float64).reshape(len(statements), len(fields))
+    return [s['date'] for s in statements], matrix
+
+# TTM ratios are recomputed from the summed numerator and revenue; share counts are not summed
+TTM_RATIOS = {
+    'grossProfitRatio': 'grossProfit',
+    'ebitdaratio': 'ebitda',
+    'operatingIncomeRatio': 'operatingIncome',
+    'incomeBeforeTaxRatio': 'incomeBeforeTax',
+    'netIncomeRatio': 'netIncome',
+}
+POINT_IN_TIME_FIELDS = ('weightedAverageShsOut', 'weightedAverageShsOutDil')
+
+def ttm_series(statement_type, fields, dates, matrix):
+    # Rows follow `dates` (quarters, oldest first); NaN until four consecutive quarters are available
+    if statement_type not in FLOW_STATEMENTS:
+        return matrix
+    days = np.array([d.toordinal() - EPOCH_ORDINAL for d in dates], dtype=np.int64).astype('datetime64[D]')
+    ttm = trailing_twelve_months(matrix.T, np.broadcast_to(days, (len(fields), len(days)))).T
+    complete = ~np.isnan(ttm[:, fields.index('revenue')]) if 'revenue' in fields else np.ones(len(dates), dtype=bool)
+    for name in POINT_IN_TIME_FIELDS:
+        if name in fields:
+            i = fields.index(name)
+            ttm[:, i] = np.where(complete, matrix[:, i], np.nan)
+    for name, numerator in TTM_RATIOS.items():
+        if name in fields:
+            ttm[:, fields.index(name)] = safe_divide(ttm[:, fields.index(numerator)], ttm[:, fields.index('revenue')])
+    return ttm
+
+def _series(dates, matrix, fields):
+    return dict({'dates': dates}, **{name: _values(matrix[:, i]) for i, name in enumerate(fields)})
+
+# Latest annual, latest quarter, TTM and aligned series for one statement type.
+# `statements` are stored period dicts (annual and quarterly mixed, any order).
+def build_rollup(statement_type, statements):
+    fields = numeric_fields(statement_type)
+    statements = [dict(s, date=_date(s['date'])) for s in statements if s.get('date')]
+    annual = [s for s in statements if s.get('period') == 'FY']
+    quarterly = [s for s in statements if s.get('period') in QUARTERS]
+    annual_dates, annual_matrix = period_series(annual, fields)
+    quarter_dates, quarter_matrix = period_series(quarterly, fields)
+
+    rollup = {
+        'as_of': max([s['date'] for s in annual + quarterly], default=None),
+        'latest_annual': max(annual, key=lambda s: s['date']) if annual else None,
+        'latest_quarter': max(quarterly, key=lambda s: s['date']) if quarterly else None,
+        'ttm': None,
+        'series': {
+            'annual': _series(annual_dates, annual_matrix, fields),
+            'quarter': _series(quarter_dates, quarter_matrix, fields),
+        },
+    }
+    if quarterly:
+        ttm = ttm_series(statement_type, fields, quarter_dates, quarter_matrix)
+        if statement_type in FLOW_STATEMENTS:
+            rollup['series']['ttm'] = _series(quarter_dates, ttm, fields)
+        latest = dict(zip(fields, _values(ttm[-1])))
+        if any(value is not None for value in latest.values()):
+            rollup['ttm'] = dict({'as_of': quarter_dates[-1], 'quarters': quarter_dates[-4:]},
+                                 **{name: value for name, value in latest.items() if value is not None})
+    return rollup
+
+def newest_date(statements):
+    return max((_date(s['date']) for s in statements if s.get('date')), default=None)
+
+def _same_date(a, b):
+    return a is not None and b is not None and _date(a) == b
+
+def rollup_update(statement_type, statements):
+    return {'$set': {statement_type: build_rollup(statement_type, statements), 'updated_at': datetime.now(timezone.utc)}}
+
+# Called whenever statements are saved; skips the write unless a newer period came in
+def update_rollup(symbol, statement_type, statements, force=False):
+    try:
+        statements = [s if isinstance(s, dict) else s.to_mongo().to_dict() for s in statements or []]
+        if not statements:
+            return None
+        collection = StatementRollup._get_collection()
+        if not force:
+            stored = collection.find_one({'symbol': symbol}, {f'{statement_type}.as_of': 1})
+            if stored and _same_date((stored.get(statement_type) or {}).get('as_of'), newest_date(statements)):
+                return None
+        update = rollup_update(statement_type, statements)
+        collection.update_one({'symbol': symbol}, update, upsert=True)
+        logging.info(f"Updated {statement_type} rollup for {symbol} as of {update['$set'][statement_type]['as_of']}")
+        return update['$set'][statement_type]
+    except Exception as e:
+        logging.error(f"Error updating {statement_type} rollup for {symbol}: {str(e)}")
+        return None
+
+TTM_PROJECTION = {'symbol': 1, 'updated_at': 1, 'balance_sheet.latest_quarter': 1,
+                  **{f'{statement_type}.ttm': 1 for statement_type in ROLLUP_MODELS},
+                  **{f'{statement_type}.latest_annual': 1 for statement_type in ROLLUP_MODELS}}
+
+def get_ttm(symbol, include_series=False):
+    projection = {'_id': 0, 'symbol': 1, 'updated_at': 1} if include_series else dict(TTM_PROJECTION, _id=0)
+    if include_series:
+        projection.update({statement_type: 1 for statement_type in ROLLUP_MODELS})
+    doc = StatementRollup._get_collection().find_one({'symbol': symbol}, projection)
+    if not doc:
+        return {"error": f"No statement rollups found for {symbol}"}
+    return doc
@@ -7,9 +7,15 @@ from app.data_processing.technical_indicators import (
     calculate_peg_ratio, calculate_debt_to_ebitda, calculate_roic,
     calculate_dividend_growth_rate
 )
+from app.utils.process_pool import SharedArrays, attach_arrays, map_in_pool, PROCESS_POOL_WORKERS
+import os
 import logging
 from datetime import datetime, timedelta, timezone
 
+BAR_FIELDS = ['close', 'high', 'low', 'volume']
+# Below this many symbols, handing the work to the process pool costs more than it saves
+PARALLEL_MIN_SYMBOLS = int(os.getenv('PARALLEL_INDICATOR_MIN_SYMBOLS', '8'))
+
 def calculate_moving_average(prices, window):
     if len(prices) < window:
         return None
@@ -42,6 +48,66 @@ def calculate_rsi(prices, period=14):
 
     return rsi[-1]
 
+def _number(value):
+    # Indicators come back as numpy scalars; store plain floats, NaN as None
+    if value is None:
+        return None
+    value = float(value)
+    return None if np.isnan(value) else value
+
+def calculate_indicators(prices, high_prices, low_prices, volumes):
+    sma_50 = calculate_moving_average(prices, 50)
+    sma_200 = calculate_moving_average(prices, 200)
+    rsi = calculate_rsi(prices)
+
+    ema_20 = calculate_ema(prices, 20)
+    macd, signal, histogram = calculate_macd(prices)
+    upper_bb, middle_bb, lower_bb = calculate_bollinger_bands(prices)
+    stoch_k, stoch_d = calculate_stochastic_oscillator(prices, low_prices, high_prices)
+    atr = calculate_atr(high_prices, low_prices, prices)
+    obv = calculate_obv(prices, volumes)
+
+    indicators = {
+        "50_day_ma": sma_50,
+        "200_day_ma": sma_200,
+        "rsi": rsi,
+        "20_day_ema": ema_20,
+        "macd": macd,
+        "macd_signal": signal,
+        "macd_histogram": histogram,
+        "bollinger_upper": upper_bb,
+        "bollinger_middle": middle_bb,
+        "bollinger_lower": lower_bb,
+        "stochastic_k": stoch_k,
+        "stochastic_d": stoch_d,
+        "atr": atr,
+        "obv": obv,
+    }
+    return {key: _number(value) for key, value in indicators.items()}
+
+def _indicators_chunk(handles, bounds):
+    arrays = attach_arrays(handles)
+    return [calculate_indicators(*(arrays[field][start:end] for field in BAR_FIELDS)) for start, end in bounds]
+
+# Indicators for many symbols' bar lists at once. The bars are packed end to end into one
+# shared array per field, so pool workers slice them in place instead of unpickling copies.
+def calculate_indicators_batch(bar_lists):
+    lengths = np.array([len(bars) for bars in bar_lists], dtype=np.int64)
+    ends = np.cumsum(lengths)
+    bounds = list(zip((ends - lengths).tolist(), ends.tolist()))
+    arrays = {field: np.array([bar.get(field) for bars in bar_lists for bar in bars], dtype=np.float64)
+              for field in BAR_FIELDS}
+
+    if len(bar_lists) < PARALLEL_MIN_SYMBOLS or PROCESS_POOL_WORKERS < 1:
+        return [calculate_indicators(*(arrays[field][start:end] for field in BAR_FIELDS)) for start, end in bounds]
+
+    # A few chunks per worker keeps them busy when some symbols have much longer histories
+    size = max(1, -(-len(bounds) // (PROCESS_POOL_WORKERS * 4)))
+    chunks = [bounds[i:i + size] for i in range(0, len(bounds), size)]
+    with SharedArrays(arrays) as shared:
+        results = map_in_pool(_indicators_chunk, [shared.handles] * len(chunks), chunks)
+    return [indicators for chunk in results for indicators in chunk]
+
 def get_stock_summary(stock_symbol):
     try:
         stock = fetch_stock_data(stock_symbol)
@@ -50,25 +116,16 @@ def get_stock_summary(stock_symbol):
             logging.error(f"No stock data found for {stock_symbol}")
             return None
 
-        prices = [data.close for data in stock.historical_data]
-        high_prices = [data.high for data in stock.historical_data]
-        low_prices = [data.low for data in stock.historical_data]
-        volumes = [data.volume for data in stock.historical_data]
-
-        if not prices:
+        if not stock.historical_data:
             logging.error(f"No historical price data found for {stock_symbol}")
             return None
 
-        sma_50 = calculate_moving_average(prices, 50)
-        sma_200 = calculate_moving_average(prices, 200)
-        rsi = calculate_rsi(prices)
-
-        ema_20 = calculate_ema(prices, 20)
-        macd, signal, histogram = calculate_macd(prices)
-        upper_bb, middle_bb, lower_bb = calculate_bollinger_bands(prices)
-        stoch_k, stoch_d = calculate_stochastic_oscillator(prices, low_prices, high_prices)
-        atr = calculate_atr(high_prices, low_prices, prices)
-        obv = calculate_obv(prices, volumes)
+        indicators = calculate_indicators(
+            [data.close for data in stock.historical_data],
+            [data.high for data in stock.historical_data],
+            [data.low for data in stock.historical_data],
+            [data.volume for data in stock.historical_data],
+        )
 
         summary = {
             "symbol": stock.symbol,
@@ -86,22 +143,10 @@ def get_stock_summary(stock_symbol):
             "dividend_yield": stock.current_data.get('dividend_yield'),
             "52_week_high": stock.current_data.get('52_week_high'),
             "52_week_low": stock.current_data.get('52_week_low'),
-            "50_day_ma": sma_50,
-            "200_day_ma": sma_200,
-            "rsi": rsi,
-            "20_day_ema": ema_20,
-            "macd": macd,
-            "macd_signal": signal,
-            "macd_histogram": histogram,
-            "bollinger_upper": upper_bb,
-            "bollinger_middle": middle_bb,
-            "bollinger_lower": lower_bb,
-            "stochastic_k": stoch_k,
-            "stochastic_d": stoch_d,
-            "atr": atr,
-            "obv": obv,
         }
 
+        summary.update(indicators)
+
         # Add financial ratios
         summary.update(stock.financial_ratios)
 
@@ -1,10 +1,13 @@
 import numpy as np
-import pandas as pd
+
+# pandas costs ~0.4s to import, so each indicator imports it on use
 
 def calculate_ema(prices, period):
+    import pandas as pd
     return pd.Series(prices).ewm(span=period, adjust=False).mean().iloc[-1]
 
 def calculate_macd(prices, fast=12, slow=26, signal=9):
+    import pandas as pd
     ema_fast = pd.Series(prices).ewm(span=fast, adjust=False).mean()
     ema_slow = pd.Series(prices).ewm(span=slow, adjust=False).mean()
     macd_line = ema_fast - ema_slow
@@ -13,6 +16,7 @@ def calculate_macd(prices, fast=12, slow=26, signal=9):
     return macd_line.iloc[-1], signal_line.iloc[-1], histogram.iloc[-1]
 
 def calculate_bollinger_bands(prices, period=20, num_std_dev=2):
+    import pandas as pd
     rolling_mean = pd.Series(prices).rolling(window=period).mean()
     rolling_std = pd.Series(prices).rolling(window=period).std()
     upper_band = rolling_mean + (rolling_std * num_std_dev)
@@ -20,6 +24,7 @@ def calculate_bollinger_bands(prices, period=20, num_std_dev=2):
     return upper_band.iloc[-1], rolling_mean.iloc[-1], lower_band.iloc[-1]
 
 def calculate_stochastic_oscillator(prices, low_prices, high_prices, period=14):
+    import pandas as pd
     low_min = pd.Series(low_prices).rolling(window=period).min()
     high_max = pd.Series(high_prices).rolling(window=period).max()
     k = 100 * (prices[-1] - low_min.iloc[-1]) / (high_max.iloc[-1] - low_min.iloc[-1])
@@ -27,6 +32,7 @@ def calculate_stochastic_oscillator(prices, low_prices, high_prices, period=14):
     return k, d
 
 def calculate_atr(high_prices, low_prices, close_prices, period=14):
+    import pandas as pd
     high = pd.Series(high_prices)
     low = pd.Series(low_prices)
     close = pd.Series(close_prices)
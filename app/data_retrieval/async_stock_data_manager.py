@@ -0,0 +1,204 @@
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+import httpx
+from pymongo import ReturnDocument
+from app.database.async_mongodb import get_async_db
+from app.data_retrieval.sec_scraper import (
+    FILING_TYPES, DEFAULT_USER_AGENT, cik_lookup_url, filing_list_url, parse_cik, parse_filing_list,
+    parse_document_url, format_filing_info, process_filing_content, truncate_report
+)
+from app.data_retrieval.stock_api import (
+    FMP_BASE_URL, FMP_API_KEY, STATEMENT_SOURCES, KEY_METRICS_ALIASES, build_period_records,
+    parse_real_time_quote, profile_fields, summary_version, statements_are_recent, periods_within
+)
+from app.data_retrieval.stock_data_manager import SUMMARY_PROJECTION, build_stock_summary, is_stale, key_metrics_are_fresh
+from app.models.stock import Stock, KeyMetrics, SECReport, version_entry
+from app.models.rollup import StatementRollup
+from app.data_processing.rollups import ROLLUP_MODELS, rollup_update
+from app.utils.process_pool import run_in_pool_async
+from app.data_retrieval import upstream
+
+# Same behaviour as StockDataManager, but every upstream and database call is awaited,
+# so one event loop can keep hundreds of slow requests in flight.
+class AsyncStockDataManager:
+    def __init__(self, http_client=None, user_agent=DEFAULT_USER_AGENT):
+        self.http = http_client or httpx.AsyncClient(timeout=30.0)
+        self.sec_headers = {'User-Agent': user_agent}
+
+    @property
+    def stocks(self):
+        return get_async_db()[Stock._get_collection_name()]
+
+    @property
+    def rollups(self):
+        return get_async_db()[StatementRollup._get_collection_name()]
+
+    async def _get_json(self, url):
+        response = await upstream.async_get(self.http, url)
+        response.raise_for_status()
+        return response.json()
+
+    async def refresh_profile_and_quote(self, symbol):
+        profile_data, quote_data = await asyncio.gather(
+            self._get_json(f"{FMP_BASE_URL}/profile/{symbol}?apikey={FMP_API_KEY}"),
+            self._get_json(f"{FMP_BASE_URL}/quote/{symbol}?apikey={FMP_API_KEY}")
+        )
+        if not profile_data:
+            logging.warning(f"No profile data found for symbol {symbol}")
+            return None
+
+        update = profile_fields(profile_data[0])
+        quote = parse_real_time_quote(quote_data[0]).to_mongo().to_dict() if quote_data else None
+        update['data_versions.summary'] = summary_version(dict(update), quote)
+        if quote:
+            update['real_time_quote'] = quote
+        update['last_updated'] = datetime.now(timezone.utc)
+
+        return await self.stocks.find_one_and_update(
+            {'symbol': symbol}, {'$set': update}, projection=SUMMARY_PROJECTION,
+            upsert=True, return_document=ReturnDocument.AFTER)
+
+    async def get_stock_summary(self, symbol):
+        try:
+            doc = await self.stocks.find_one({'symbol': symbol}, SUMMARY_PROJECTION)
+            if not doc or is_stale(doc.get('last_updated')):
+                doc = await self.refresh_profile_and_quote(symbol) or doc
+            if not doc:
+                logging.warning(f"Stock not found: {symbol}")
+                return {"error": "Stock not found or unable to retrieve data"}
+            return build_stock_summary(doc)
+        except httpx.HTTPError as e:
+            logging.error(f"Error fetching summary data for {symbol}: {str(e)}")
+            return {"error": "Stock not found or unable to retrieve data"}
+        except Exception as e:
+            logging.error(f"Unexpected error getting summary for stock {symbol}: {str(e)}")
+            return {"error": "An unexpected error occurred"}
+
+    async def _fetch_periods(self, endpoint, symbol, years):
+        annual_data, quarterly_data = await asyncio.gather(
+            self._get_json(f"{FMP_BASE_URL}/{endpoint}/{symbol}?period=annual&limit={years}&apikey={FMP_API_KEY}"),
+            self._get_json(f"{FMP_BASE_URL}/{endpoint}/{symbol}?period=quarter&limit={years * 4}&apikey={FMP_API_KEY}"),
+            return_exceptions=True
+        )
+        if isinstance(annual_data, Exception):
+            raise annual_data
+        if isinstance(quarterly_data, Exception):
+            logging.warning(f"Failed to fetch quarterly {endpoint} data for {symbol}: {str(quarterly_data)}")
+            quarterly_data = []
+        return annual_data + quarterly_data
+
+    # `is_fresh(doc)` is the sync path's freshness rule for the dataset; stored periods that
+    # pass it are served, cut to the requested years, and anything else is refetched
+    async def _load_or_fetch_periods(self, symbol, dataset, field, endpoint, model_cls, years, is_fresh,
+                                     aliases=None, set_symbol=False):
+        doc = await self.stocks.find_one({'symbol': symbol}, {field: 1, f'data_versions.{dataset}': 1})
+        if doc and doc.get(field) and is_fresh(doc):
+            return periods_within(doc[field], years)
+
+        start_date = datetime.now(timezone.utc) - timedelta(days=years * 365)
+        records = await self._fetch_periods(endpoint, symbol, years)
+        # Validating and converting every period is CPU-bound, so it runs in the process pool
+        periods = await run_in_pool_async(build_period_records, model_cls, records, start_date,
+                                          symbol=symbol if set_symbol else None, aliases=aliases)
+        if periods:
+            version = version_entry(periods, ((doc or {}).get('data_versions') or {}).get(dataset))
+            await self.stocks.update_one({'symbol': symbol}, {'$set': {field: periods, f'data_versions.{dataset}': version}}, upsert=True)
+            if dataset in ROLLUP_MODELS:
+                await self.rollups.update_one({'symbol': symbol}, rollup_update(dataset, periods), upsert=True)
+        return periods
+
+    async def get_financial_statement(self, symbol, statement_type, years=5):
+        if statement_type not in STATEMENT_SOURCES:
+            return {"error": f"Invalid statement type: {statement_type}"}
+        endpoint, model_cls, field = STATEMENT_SOURCES[statement_type]
+        try:
+            statements = await self._load_or_fetch_periods(symbol, statement_type, field, endpoint, model_cls, years,
+                                                           lambda doc: statements_are_recent(doc[field]))
+            if not statements:
+                logging.warning(f"{statement_type.capitalize()} not found for {symbol}")
+                return {"error": f"{statement_type.capitalize()} not found or unable to retrieve data"}
+            return statements
+        except Exception as e:
+            logging.error(f"Unexpected error getting {statement_type} for stock {symbol}: {str(e)}")
+            return {"error": "An unexpected error occurred"}
+
+    async def get_key_metrics(self, symbol, years=5, period=None):
+        try:
+            metrics = await self._load_or_fetch_periods(symbol, 'key_metrics', 'key_metrics', 'key-metrics', KeyMetrics, years,
+                                                        key_metrics_are_fresh,
+                                                        aliases=KEY_METRICS_ALIASES, set_symbol=True)
+            if period:
+                metrics = [m for m in metrics if m.get('period') == period]
+            if not metrics:
+                logging.warning(f"Key metrics not found for {symbol}")
+                return {"error": "Key metrics not found or unable to retrieve data"}
+            return metrics
+        except Exception as e:
+            logging.error(f"Unexpected error getting key metrics for stock {symbol}: {str(e)}")
+            return {"error": "An unexpected error occurred"}
+
+    async def _get_sec_page(self, url):
+        response = await upstream.async_get(self.http, url, headers=self.sec_headers)
+        response.raise_for_status()
+        return response.content
+
+    async def _fetch_filing_info(self, symbol, form_type):
+        cik = parse_cik(await self._get_sec_page(cik_lookup_url(symbol)))
+        if not cik:
+            return {"error": f"CIK not found for symbol {symbol}"}
+
+        filing_detail_url, accepted_date = parse_filing_list(await self._get_sec_page(filing_list_url(cik, form_type)))
+        if not filing_detail_url:
+            return {"error": f"No {form_type} filing found for symbol {symbol}"}
+
+        doc_url = parse_document_url(await self._get_sec_page(filing_detail_url), form_type)
+        if not doc_url:
+            return {"error": f"{form_type} document link not found for symbol {symbol}"}
+
+        return format_filing_info(symbol, cik, form_type, filing_detail_url, doc_url, accepted_date)
+
+    async def get_filing_info(self, symbol, filing_type):
+        form_type = FILING_TYPES.get(filing_type.lower())
+        if not form_type:
+            return {"error": f"Unsupported filing type: {filing_type}"}
+        try:
+            return await self._fetch_filing_info(symbol, form_type)
+        except Exception as e:
+            logging.error(f"Unexpected error getting {filing_type} filing info for stock {symbol}: {str(e)}")
+            return {"error": "An unexpected error occurred"}
+
+    async def get_full_report(self, filing_type, symbol):
+        form_type = FILING_TYPES.get(filing_type.lower())
+        if not form_type:
+            return {"error": f"Unsupported filing type: {filing_type}"}
+        try:
+            doc = await self.stocks.find_one({'symbol': symbol, 'sec_reports.filing_type': form_type},
+                                             {'sec_reports.$': 1})
+            if doc:
+                return doc['sec_reports'][0]['full_text']
+
+            filing_info = await self._fetch_filing_info(symbol, form_type)
+            if "error" in filing_info:
+                return filing_info
+
+            response = await upstream.async_get(self.http, filing_info["finalLink"], headers=self.sec_headers)
+            response.raise_for_status()
+            # html2text is CPU-bound; run it in the process pool, off the event loop and the GIL
+            processed_text = await run_in_pool_async(process_filing_content, response.text)
+            truncated_text, truncated = truncate_report(processed_text)
+
+            report = SECReport(
+                filing_type=form_type,
+                url=filing_info["finalLink"],
+                full_text=truncated_text,
+                full_text_length=len(processed_text),
+                truncated=truncated
+            ).to_mongo().to_dict()
+            await self.stocks.update_one({'symbol': symbol}, {'$pull': {'sec_reports': {'filing_type': form_type}}}, upsert=True)
+            await self.stocks.update_one({'symbol': symbol}, {'$push': {'sec_reports': report},
+                                                              '$set': {f'data_versions.report_{form_type}': version_entry(report)}})
+            return truncated_text
+        except Exception as e:
+            logging.error(f"Unexpected error getting full {filing_type} report for stock {symbol}: {str(e)}")
+            return {"error": "An unexpected error occurred"}
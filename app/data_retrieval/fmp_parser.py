@@ -0,0 +1,139 @@
+import logging
+import warnings
+from datetime import datetime, timezone
+import numpy as np
+from mongoengine import FloatField, IntField, StringField, BooleanField, DateTimeField
+from app.models.stock import Stock, KeyMetrics, RealTimeQuote
+
+def safe_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        logging.warning(f"Could not convert {value} to float")
+        return None
+
+def safe_int(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        logging.warning(f"Could not convert {value} to int")
+        return None
+
+def safe_str(value):
+    return str(value) if value is not None else None
+
+def safe_bool(value):
+    return bool(value) if value is not None else None
+
+def safe_datetime(value):
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            for fmt in ('%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+                try:
+                    parsed = datetime.strptime(value, fmt)
+                    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+                except ValueError:
+                    continue
+            raise ValueError("unknown format")
+        elif isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    except ValueError as e:
+        logging.warning(f"Could not parse datetime {value}: {e}")
+    return None
+
+def _float_column(values):
+    try:
+        array = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return [safe_float(value) for value in values]
+    column = array.astype(object)
+    column[np.isnan(array)] = None
+    return column.tolist()
+
+def _datetime_array(values):
+    # One numpy parse for the whole column; FMP dates are ISO 'YYYY-MM-DD[ HH:MM:SS]' in UTC
+    if not all(value is None or isinstance(value, str) for value in values):
+        return None
+    try:
+        with warnings.catch_warnings():
+            # numpy warns on (and will stop accepting) UTC offsets; those go the slow way
+            warnings.simplefilter('error')
+            return np.array(values, dtype='datetime64[us]')
+    except (ValueError, DeprecationWarning):
+        return None
+
+def _datetime_column(values):
+    array = _datetime_array(values)
+    if array is None:
+        return [safe_datetime(value) for value in values]
+    # Naive UTC, as mongo hands datetimes back
+    column = array.astype(object)
+    column[np.isnat(array)] = None
+    return column.tolist()
+
+COLUMN_CONVERTERS = {
+    FloatField: _float_column,
+    IntField: lambda values: [safe_int(value) for value in values],
+    StringField: lambda values: [safe_str(value) for value in values],
+    BooleanField: lambda values: [safe_bool(value) for value in values],
+    DateTimeField: _datetime_column,
+}
+
+# Field plan for one model, built once from its mongoengine fields: which response key feeds
+# each field and how that column is converted. Rows come out as plain BSON-ready dicts
+# (unset fields left out, like to_mongo()) that can go straight to pymongo; documents()
+# wraps them the way documents loaded from the database are built, without validation.
+class Schema:
+    def __init__(self, model_cls, aliases=None):
+        self.model_cls = model_cls
+        self.columns = []
+        for name, field in model_cls._fields.items():
+            converter = COLUMN_CONVERTERS.get(type(field))
+            if converter:
+                self.columns.append((name, (aliases or {}).get(name, name), converter))
+
+    def rows(self, records, start_date=None, symbol=None):
+        rows = [{} for _ in records]
+        for name, key, converter in self.columns:
+            for row, value in zip(rows, converter([record.get(key) for record in records])):
+                if value is not None:
+                    row[name] = value
+        if symbol:
+            for row in rows:
+                row['symbol'] = symbol
+        if start_date is not None:
+            start_date = start_date.astimezone(timezone.utc).replace(tzinfo=None) if start_date.tzinfo else start_date
+            rows = [row for row in rows if row.get('date') and _naive(row['date']) >= start_date]
+        return rows
+
+    def row(self, record):
+        return self.rows([record])[0]
+
+    def documents(self, rows):
+        return [self.model_cls._from_son(row) for row in rows]
+
+def _naive(value):
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+# Periods newest first, matching how statements are stored
+def sort_periods(rows):
+    rows.sort(key=lambda row: _naive(row['date']), reverse=True)
+    return rows
+
+# Model field -> FMP key where the API spells it differently
+KEY_METRICS_ALIASES = {'researchAndDevelopmentToRevenue': 'researchAndDevelopementToRevenue'}
+
+_schemas = {}
+
+def schema_for(model_cls, aliases=None):
+    key = (model_cls, tuple(sorted((aliases or {}).items())))
+    if key not in _schemas:
+        _schemas[key] = Schema(model_cls, aliases)
+    return _schemas[key]
+
+KEY_METRICS_SCHEMA = schema_for(KeyMetrics, KEY_METRICS_ALIASES)
+QUOTE_SCHEMA = schema_for(RealTimeQuote)
+# Profile responses only feed the Stock document's scalar fields
+PROFILE_SCHEMA = schema_for(Stock)
@@ -0,0 +1,67 @@
+import os
+import logging
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from dotenv import load_dotenv
+from app.data_retrieval.stock_data_manager import MAX_BATCH_SYMBOLS
+from app.models.user import User
+from app.models.history import analysis_counts
+
+load_dotenv()
+
+# Upper bound on how many symbols one prefetch run keeps warm
+PREFETCH_LIMIT = int(os.getenv('PREFETCH_LIMIT', '500'))
+ANALYSIS_LOOKBACK = timedelta(days=int(os.getenv('PREFETCH_ANALYSIS_DAYS', '30')))
+# Points a symbol earns per user that holds, watches or prefers it, and per recent analysis
+DEMAND_WEIGHTS = {
+    'portfolio': 4,
+    'watchlist': 3,
+    'preferred': 2,
+    'analysis': 1,
+}
+
+def _symbols(items, key):
+    return {item[key].strip().upper() for item in items or [] if item.get(key)}
+
+def symbol_demand(since=None):
+    since = since or datetime.now(timezone.utc) - ANALYSIS_LOOKBACK
+    demand = Counter()
+    projection = {'portfolio.symbol': 1, 'watchlist.symbol': 1, 'preferences.preferred_stocks': 1}
+    for doc in User._get_collection().find({}, projection):
+        # A symbol counts once per user and source, however many lots or entries mention it
+        for symbol in _symbols(doc.get('portfolio'), 'symbol'):
+            demand[symbol] += DEMAND_WEIGHTS['portfolio']
+        for symbol in _symbols(doc.get('watchlist'), 'symbol'):
+            demand[symbol] += DEMAND_WEIGHTS['watchlist']
+        for symbol in {s.strip().upper() for s in (doc.get('preferences') or {}).get('preferred_stocks') or [] if s}:
+            demand[symbol] += DEMAND_WEIGHTS['preferred']
+    # Read from the full history, since the User document only keeps the latest analyses
+    for symbol, count in analysis_counts(since).items():
+        if symbol:
+            demand[symbol.strip().upper()] += DEMAND_WEIGHTS['analysis'] * count
+    return demand
+
+def rank_symbols(limit=PREFETCH_LIMIT):
+    return [symbol for symbol, _ in symbol_demand().most_common(limit)]
+
+# Runs the same manager calls the API serves from, so stale entries are refreshed upstream
+# (concurrently, per batch) and fresh ones cost a single read
+def warm_symbols(manager, symbols):
+    failed = set()
+    for start in range(0, len(symbols), MAX_BATCH_SYMBOLS):
+        batch = symbols[start:start + MAX_BATCH_SYMBOLS]
+        for results in (manager.get_stock_summaries(batch), manager.get_key_metrics_batch(batch),
+                        manager.get_technical_indicators(batch)):
+            failed.update(symbol for symbol, result in results.items() if isinstance(result, dict) and "error" in result)
+    return failed
+
+def prefetch(manager, limit=PREFETCH_LIMIT):
+    symbols = rank_symbols(limit)
+    if not symbols:
+        logging.info("Prefetch: no watched, held or preferred symbols")
+        return {"symbols": 0, "failed": []}
+    logging.info(f"Prefetching {len(symbols)} symbols, most requested first: {', '.join(symbols[:10])}")
+    failed = warm_symbols(manager, symbols)
+    if failed:
+        logging.warning(f"Prefetch could not warm {', '.join(sorted(failed))}")
+    return {"symbols": len(symbols), "failed": sorted(failed)}
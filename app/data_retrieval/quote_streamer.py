@@ -0,0 +1,176 @@
+import os
+import queue
+import asyncio
+import logging
+import threading
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from app.data_retrieval.stock_api import FMP_BASE_URL, FMP_API_KEY, PROFILE_FIELDS, parse_real_time_quotes, summary_version
+from app.data_retrieval import upstream
+from app.models.stock import Stock
+from app.database.mongodb import ensure_db
+
+load_dotenv()
+
+QUOTE_POLL_SECONDS = float(os.getenv('QUOTE_POLL_SECONDS', '5'))
+# FMP's /quote endpoint takes a comma-separated symbol list
+QUOTE_BATCH_SIZE = int(os.getenv('QUOTE_BATCH_SIZE', '50'))
+SUBSCRIBER_QUEUE_SIZE = 256
+
+def fetch_quotes(symbols):
+    url = f"{FMP_BASE_URL}/quote/{','.join(symbols)}?apikey={FMP_API_KEY}"
+    # Polled every few seconds, so replayable but not worth archiving
+    response = upstream.get(url, timeout=10, record=False)
+    response.raise_for_status()
+    return parse_real_time_quotes(response.json())
+
+def quote_payload(symbol, quote):
+    payload = quote.to_mongo().to_dict()
+    payload['symbol'] = symbol
+    return payload
+
+# Fed from the poller thread; read by a (sync) streaming response
+class Subscription:
+    def __init__(self, symbols):
+        self.symbols = set(symbols)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, payload):
+        # A slow client loses its oldest update rather than blocking the poller
+        while True:
+            try:
+                self.queue.put_nowait(payload)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+# Same interface for the ASGI app: updates are handed to the subscriber's event loop
+class AsyncSubscription:
+    def __init__(self, symbols, loop=None):
+        self.symbols = set(symbols)
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, payload):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(payload)
+
+    def deliver(self, payload):
+        try:
+            self.loop.call_soon_threadsafe(self._put, payload)
+        except RuntimeError:
+            # The client's loop has shut down; it is unsubscribed when its stream closes
+            pass
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+# One poller per process fetches every subscribed symbol in batches and fans changes out,
+# so upstream calls grow with the number of distinct symbols, not with connected clients.
+class QuoteStreamer:
+    def __init__(self, fetch=fetch_quotes, interval=QUOTE_POLL_SECONDS, batch_size=QUOTE_BATCH_SIZE, persist=True):
+        self.fetch = fetch
+        self.interval = interval
+        self.batch_size = batch_size
+        self.persist = persist
+        self.latest = {}
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def symbols(self):
+        with self._lock:
+            return sorted({symbol for subscription in self._subscriptions for symbol in subscription.symbols})
+
+    def subscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='quote-streamer', daemon=True)
+                self._thread.start()
+            snapshot = [self.latest[symbol] for symbol in subscription.symbols if symbol in self.latest]
+
+        # New clients start from the current snapshot; unseen symbols are fetched right away
+        for payload in snapshot:
+            subscription.deliver(payload)
+        if len(snapshot) < len(subscription.symbols):
+            self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def poll_once(self):
+        symbols = self.symbols()
+        updates = {}
+        for start in range(0, len(symbols), self.batch_size):
+            batch = symbols[start:start + self.batch_size]
+            try:
+                quotes = self.fetch(batch)
+            except Exception as e:
+                logging.error(f"Error fetching quotes for {', '.join(batch)}: {str(e)}")
+                continue
+            for symbol, quote in quotes.items():
+                payload = quote_payload(symbol, quote)
+                if self.latest.get(symbol) != payload:
+                    updates[symbol] = payload
+
+        if not updates:
+            return updates
+        with self._lock:
+            self.latest.update(updates)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            for symbol in subscription.symbols & updates.keys():
+                subscription.deliver(updates[symbol])
+        if self.persist:
+            self.save(updates)
+        return updates
+
+    def save(self, updates):
+        # Keep the stored quote current too, so summaries served from Mongo see the same prices.
+        # The summary version moves with it, or revalidating clients would keep a stale price.
+        try:
+            ensure_db()
+            stocks = Stock._get_collection()
+            projection = dict.fromkeys(PROFILE_FIELDS + ['data_versions.summary'], 1)
+            docs = {doc['symbol']: doc for doc in stocks.find({'symbol': {'$in': list(updates)}}, projection)}
+            operations = []
+            for symbol, payload in updates.items():
+                doc = docs.get(symbol)
+                if doc is None:
+                    continue
+                quote = {k: v for k, v in payload.items() if k != 'symbol'}
+                profile = {field: doc[field] for field in PROFILE_FIELDS if doc.get(field) is not None}
+                version = summary_version(profile, quote, (doc.get('data_versions') or {}).get('summary'))
+                operations.append(UpdateOne({'symbol': symbol}, {'$set': {'real_time_quote': quote, 'data_versions.summary': version}}))
+            if operations:
+                stocks.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logging.error(f"Error saving streamed quotes: {str(e)}")
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscriptions:
+                    # Nobody is listening; the next subscribe() starts a new thread
+                    self._thread = None
+                    return
+            self.poll_once()
+            self._wake.wait(self.interval)
+            self._wake.clear()
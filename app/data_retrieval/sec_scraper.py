@@ -1,84 +1,147 @@
+import os
 import requests
-from bs4 import BeautifulSoup
 import re
 from datetime import datetime, timezone
 import json
 import logging
-import html2text
+from dotenv import load_dotenv
 from app.models.stock import Stock, SECReport
+from app.utils.process_pool import run_in_pool
+from app.data_retrieval import upstream
+
+load_dotenv()
+
+SEC_BASE_URL = os.getenv('SEC_BASE_URL', "https://www.sec.gov")
+MAX_REPORT_LENGTH = 500000
+CIK_RE = re.compile(r'CIK=(\d{10})')
+DEFAULT_USER_AGENT = 'StockSage vincenzo.riccardi.jobs@gmail.com'
+
+# URL filing type (as used by the get_<type>_filing_info helpers) -> EDGAR form type
+FILING_TYPES = {
+    '10k': '10-K',
+    '10q': '10-Q',
+    '8k': '8-K',
+    'def_14a': 'DEF 14A',
+    's1': 'S-1',
+    'form4': '4',
+    '13d': 'SC 13D',
+    '13g': 'SC 13G',
+    '20f': '20-F',
+}
+
+# bs4 and html2text are imported on first use so that importing the data layer stays cheap
+def _soup(content):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(content, 'html.parser')
+
+# The EDGAR lookups are split into URL builders and parsers so the async path can reuse them
+
+def cik_lookup_url(symbol):
+    return f"{SEC_BASE_URL}/cgi-bin/browse-edgar?CIK={symbol}&Find=Search&owner=exclude&action=getcompany"
+
+def filing_list_url(cik, filing_type):
+    return f"{SEC_BASE_URL}/cgi-bin/browse-edgar?action=getcompany&CIK={cik}&type={filing_type}&dateb=&owner=exclude&count=1"
+
+def parse_cik(content):
+    soup = _soup(content)
+    cik_match = CIK_RE.search(str(soup))
+    return cik_match.group(1) if cik_match else None
+
+def parse_filing_list(content):
+    soup = _soup(content)
+
+    # Find the link to the filing detail page
+    filing_detail_link = soup.select_one('table.tableFile2 td:nth-of-type(2) a')
+    if not filing_detail_link:
+        return None, None
+    filing_detail_url = f"{SEC_BASE_URL}{filing_detail_link['href']}"
+
+    # Get the accepted date
+    accepted_date_elem = soup.select_one('table.tableFile2 td:nth-of-type(3)')
+    accepted_date = accepted_date_elem.text.strip() if accepted_date_elem else None
+    return filing_detail_url, accepted_date
+
+def parse_document_url(content, filing_type):
+    soup = _soup(content)
+    doc_link = soup.select_one(f'table.tableFile tr:has(td:contains("{filing_type}")) a')
+    if not doc_link:
+        return None
+
+    # Correct the final link to remove '/ix?doc='
+    doc_href = doc_link['href']
+    if '/ix?doc=' in doc_href:
+        return f"{SEC_BASE_URL}{doc_href.replace('/ix?doc=', '')}"
+    return f"{SEC_BASE_URL}{doc_href}"
+
+def format_filing_info(symbol, cik, filing_type, filing_detail_url, doc_url, accepted_date):
+    # Format dates
+    try:
+        accepted_datetime = datetime.strptime(accepted_date, "%Y-%m-%d")
+        formatted_accepted_date = accepted_datetime.strftime("%Y-%m-%d %H:%M:%S")
+        formatted_filing_date = accepted_datetime.strftime("%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        logging.warning(f"Unable to parse date: {accepted_date}")
+        formatted_accepted_date = accepted_date
+        formatted_filing_date = accepted_date
+
+    return {
+        "symbol": symbol,
+        "cik": cik,
+        "type": filing_type,
+        "link": filing_detail_url,
+        "finalLink": doc_url,
+        "acceptedDate": formatted_accepted_date,
+        "fillingDate": formatted_filing_date
+    }
+
+def process_filing_content(content):
+    import html2text
+    h = html2text.HTML2Text()
+    h.ignore_links = True
+    h.ignore_images = True
+    text = h.handle(content)
+    text = re.sub(r'\n\s*\n', '\n\n', text)
+    text = re.sub(r' +', ' ', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    return text.strip()
+
+def truncate_report(processed_text):
+    truncated = len(processed_text) > MAX_REPORT_LENGTH
+    truncated_text = processed_text[:MAX_REPORT_LENGTH] + "..." if truncated else processed_text
+    return truncated_text, truncated
 
 class SECScraper:
-    def __init__(self, user_agent='StockSage vincenzo.riccardi.jobs@gmail.com'):
+    def __init__(self, user_agent=DEFAULT_USER_AGENT):
         self.headers = {'User-Agent': user_agent}
 
     def get_filing_info(self, symbol, filing_type):
         try:
             # Step 1: Get the CIK
-            cik_url = f"https://www.sec.gov/cgi-bin/browse-edgar?CIK={symbol}&Find=Search&owner=exclude&action=getcompany"
-            response = requests.get(cik_url, headers=self.headers)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            cik_re = re.compile(r'CIK=(\d{10})')
-            cik_match = cik_re.search(str(soup))
-            if not cik_match:
+            response = upstream.get(cik_lookup_url(symbol), headers=self.headers)
+            cik = parse_cik(response.content)
+            if not cik:
                 return {"error": f"CIK not found for symbol {symbol}"}
-            cik = cik_match.group(1)
 
             # Step 2: Get the latest filing
-            edgar_url = f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany&CIK={cik}&type={filing_type}&dateb=&owner=exclude&count=1"
-            response = requests.get(edgar_url, headers=self.headers)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find the link to the filing detail page
-            filing_detail_link = soup.select_one('table.tableFile2 td:nth-of-type(2) a')
-            if not filing_detail_link:
+            response = upstream.get(filing_list_url(cik, filing_type), headers=self.headers)
+            filing_detail_url, accepted_date = parse_filing_list(response.content)
+            if not filing_detail_url:
                 return {"error": f"No {filing_type} filing found for symbol {symbol}"}
-            filing_detail_url = f"https://www.sec.gov{filing_detail_link['href']}"
-
-            # Get the accepted date
-            accepted_date_elem = soup.select_one('table.tableFile2 td:nth-of-type(3)')
-            accepted_date = accepted_date_elem.text.strip() if accepted_date_elem else None
 
             # Step 3: Get the actual document link
-            response = requests.get(filing_detail_url, headers=self.headers)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            doc_link = soup.select_one(f'table.tableFile tr:has(td:contains("{filing_type}")) a')
-            if not doc_link:
+            response = upstream.get(filing_detail_url, headers=self.headers)
+            doc_url = parse_document_url(response.content, filing_type)
+            if not doc_url:
                 return {"error": f"{filing_type} document link not found for symbol {symbol}"}
-            doc_url = f"https://www.sec.gov{doc_link['href']}"
-
-            # Correct the final link to remove '/ix?doc='
-            doc_href = doc_link['href']
-            if '/ix?doc=' in doc_href:
-                doc_url = f"https://www.sec.gov{doc_href.replace('/ix?doc=', '')}"
-            else:
-                doc_url = f"https://www.sec.gov{doc_href}"
-
-            # Format dates
-            try:
-                accepted_datetime = datetime.strptime(accepted_date, "%Y-%m-%d")
-                formatted_accepted_date = accepted_datetime.strftime("%Y-%m-%d %H:%M:%S")
-                formatted_filing_date = accepted_datetime.strftime("%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                logging.warning(f"Unable to parse date: {accepted_date}")
-                formatted_accepted_date = accepted_date
-                formatted_filing_date = accepted_date
-
-            return [{
-                "symbol": symbol,
-                "cik": cik,
-                "type": filing_type,
-                "link": filing_detail_url,
-                "finalLink": doc_url,
-                "acceptedDate": formatted_accepted_date,
-                "fillingDate": formatted_filing_date
-            }]
+
+            return [format_filing_info(symbol, cik, filing_type, filing_detail_url, doc_url, accepted_date)]
         except Exception as e:
             logging.error(f"Error fetching {filing_type} filing info for {symbol}: {str(e)}")
             return {"error": f"Failed to fetch {filing_type} filing info: {str(e)}"}
 
     def download_filing_content(self, url):
         try:
-            response = requests.get(url, headers=self.headers)
+            response = upstream.get(url, headers=self.headers)
             response.raise_for_status()
             return response.text
         except requests.RequestException as e:
@@ -86,14 +149,9 @@ class SECScraper:
             return None
 
     def process_filing_content(self, content):
-        h = html2text.HTML2Text()
-        h.ignore_links = True
-        h.ignore_images = True
-        text = h.handle(content)
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        text = re.sub(r' +', ' ', text)
-        text = re.sub(r'<[^>]+>', '', text)
-        return text.strip()
+        # Filings run to megabytes of HTML; converting them in the process pool lets
+        # concurrent ingests use every core instead of queueing on the GIL
+        return run_in_pool(process_filing_content, content)
 
     def get_filing_report(self, symbol, filing_type):
         try:
@@ -125,9 +183,7 @@ class SECScraper:
 
             processed_text = self.process_filing_content(content)
             
-            max_length = 500000
-            truncated = len(processed_text) > max_length
-            truncated_text = processed_text[:max_length] + "..." if truncated else processed_text
+            truncated_text, truncated = truncate_report(processed_text)
             
             # Store the report in the database
             if not stock:
@@ -144,6 +200,7 @@ class SECScraper:
             # Remove old report of the same type if it exists
             stock.sec_reports = [report for report in stock.sec_reports if report.filing_type != filing_type]
             stock.sec_reports.append(new_report)
+            stock.record_version(f'report_{filing_type}', new_report)
             stock.save()
 
             return {
@@ -1,68 +1,116 @@
-from app.data_processing.stock_analysis import get_stock_summary
 from app.data_retrieval.sec_scraper import SECScraper
-from app.data_retrieval.stock_api import fetch_stock_data, fetch_income_statement, fetch_balance_sheet, fetch_cash_flow_statement, fetch_key_metrics
+from app.data_retrieval.stock_api import fetch_stock_data, fetch_income_statement, fetch_balance_sheet, fetch_cash_flow_statement, fetch_key_metrics, STATEMENT_SOURCES, statements_are_recent, periods_within
+from app.data_processing.stock_analysis import calculate_indicators_batch
 from app.models.stock import Stock
+from app.models.user import User
+from pymongo import UpdateOne
+from concurrent.futures import ThreadPoolExecutor
+import os
 import logging
-from datetime import timezone, datetime
+from datetime import timezone, datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How long a stored profile and quote can be served before it is refreshed from FMP
+SUMMARY_MAX_AGE = timedelta(minutes=int(os.getenv('SUMMARY_MAX_AGE_MINUTES', '15')))
+SUMMARY_FIELDS = ['symbol', 'companyName', 'currency', 'exchange', 'industry', 'sector', 'description',
+                  'website', 'ceo', 'ipoDate', 'isActivelyTrading', 'last_updated']
+SUMMARY_PROJECTION = {field: 1 for field in SUMMARY_FIELDS + ['real_time_quote']}
+# How long fetched key metrics are served before they are fetched again
+KEY_METRICS_MAX_AGE = timedelta(days=1)
+
+# Batch requests read everything cached in one query and fetch the rest from upstream in parallel
+MAX_BATCH_SYMBOLS = int(os.getenv('MAX_BATCH_SYMBOLS', '100'))
+BATCH_FETCH_WORKERS = int(os.getenv('BATCH_FETCH_WORKERS', '8'))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_FETCH_WORKERS)
+
+QUOTE_SUMMARY_FIELDS = ['price', 'changesPercentage', 'change', 'dayLow', 'dayHigh', 'yearHigh', 'yearLow',
+                        'marketCap', 'priceAvg50', 'priceAvg200', 'volume', 'avgVolume', 'open', 'previousClose',
+                        'eps', 'pe', 'earningsAnnouncement', 'sharesOutstanding', 'timestamp']
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def is_stale(last_updated, max_age=SUMMARY_MAX_AGE):
+    if last_updated is None:
+        return True
+    if last_updated.tzinfo is None:
+        last_updated = last_updated.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - last_updated > max_age
+
+# Every key metrics fetch records data_versions.key_metrics, whichever path made it
+# (fetch_stock_data, the sync or async managers), so its 'checked' time is the fetch time
+def key_metrics_are_fresh(doc):
+    checked = ((doc.get('data_versions') or {}).get('key_metrics') or {}).get('checked')
+    return bool(doc.get('key_metrics')) and not is_stale(checked, KEY_METRICS_MAX_AGE)
+
+def stock_summary_doc(stock):
+    doc = {field: getattr(stock, field) for field in SUMMARY_FIELDS}
+    doc['real_time_quote'] = stock.real_time_quote.to_mongo() if stock.real_time_quote else None
+    return doc
+
+# Works on raw Mongo documents as well as stock_summary_doc() output
+def build_stock_summary(doc):
+    summary = {field: _isoformat(doc.get(field)) for field in SUMMARY_FIELDS}
+
+    quote = doc.get('real_time_quote')
+    if quote:
+        summary.update({field: _isoformat(quote.get(field)) for field in QUOTE_SUMMARY_FIELDS})
+    else:
+        summary["real_time_quote_missing"] = True
+    return summary
+
+def parse_symbols(value):
+    symbols = []
+    for symbol in (value or '').split(','):
+        symbol = symbol.strip()
+        if symbol and symbol not in symbols:
+            symbols.append(symbol)
+    return symbols
+
+# One $in query for every requested symbol, keyed by symbol
+def load_stock_docs(symbols, projection):
+    projection = dict(projection, symbol=1)
+    return {doc['symbol']: doc for doc in Stock._get_collection().find({'symbol': {'$in': list(symbols)}}, projection)}
+
+def fetch_concurrently(fetch, symbols):
+    if not symbols:
+        return {}
+    return dict(zip(symbols, batch_executor.map(fetch, symbols)))
 
 class StockDataManager:
     def __init__(self):
         self.sec_scraper = SECScraper()
 
     def get_stock_summary(self, symbol):
+        summary = self.get_stock_summaries([symbol])[symbol]
+        if summary.get("real_time_quote_missing"):
+            logging.warning(f"Real-time quote missing for {symbol}")
+        return summary
+
+    def get_stock_summaries(self, symbols):
         try:
-            stock = fetch_stock_data(symbol)
-            if stock:
-                summary = {
-                    "symbol": stock.symbol,
-                    "companyName": stock.companyName,
-                    "currency": stock.currency,
-                    "exchange": stock.exchange,
-                    "industry": stock.industry,
-                    "sector": stock.sector,
-                    "description": stock.description,
-                    "website": stock.website,
-                    "ceo": stock.ceo,
-                    "ipoDate": stock.ipoDate,
-                    "isActivelyTrading": stock.isActivelyTrading,
-                    "last_updated": stock.last_updated.isoformat()
-                }
-
-                if stock.real_time_quote:
-                    real_time_data = {
-                        "price": stock.real_time_quote.price,
-                        "changesPercentage": stock.real_time_quote.changesPercentage,
-                        "change": stock.real_time_quote.change,
-                        "dayLow": stock.real_time_quote.dayLow,
-                        "dayHigh": stock.real_time_quote.dayHigh,
-                        "yearHigh": stock.real_time_quote.yearHigh,
-                        "yearLow": stock.real_time_quote.yearLow,
-                        "marketCap": stock.real_time_quote.marketCap,
-                        "priceAvg50": stock.real_time_quote.priceAvg50,
-                        "priceAvg200": stock.real_time_quote.priceAvg200,
-                        "volume": stock.real_time_quote.volume,
-                        "avgVolume": stock.real_time_quote.avgVolume,
-                        "open": stock.real_time_quote.open,
-                        "previousClose": stock.real_time_quote.previousClose,
-                        "eps": stock.real_time_quote.eps,
-                        "pe": stock.real_time_quote.pe,
-                        "earningsAnnouncement": stock.real_time_quote.earningsAnnouncement.isoformat() if stock.real_time_quote.earningsAnnouncement else None,
-                        "sharesOutstanding": stock.real_time_quote.sharesOutstanding,
-                        "timestamp": stock.real_time_quote.timestamp.isoformat() if stock.real_time_quote.timestamp else None,
-                    }
-                    summary.update(real_time_data)
-                else:
-                    logging.warning(f"Real-time quote missing for {symbol}")
-                    summary["real_time_quote_missing"] = True
+            docs = load_stock_docs(symbols, SUMMARY_PROJECTION)
+            stale = [symbol for symbol in symbols if symbol not in docs or is_stale(docs[symbol].get('last_updated'))]
+            if stale:
+                logging.info(f"Refreshing summary data for {', '.join(stale)}")
+            # A failed refresh keeps serving the stored summary
+            for symbol, stock in fetch_concurrently(fetch_stock_data, stale).items():
+                if stock:
+                    docs[symbol] = stock_summary_doc(stock)
+        except Exception as e:
+            logging.error(f"Unexpected error getting summaries for {', '.join(symbols)}: {str(e)}")
+            return {symbol: {"error": "An unexpected error occurred"} for symbol in symbols}
 
-                logging.info(f"Successfully retrieved summary for {symbol}")
-                return summary
+        summaries = {}
+        for symbol in symbols:
+            if symbol in docs:
+                summaries[symbol] = build_stock_summary(docs[symbol])
             else:
                 logging.warning(f"Stock not found: {symbol}")
-                return {"error": "Stock not found or unable to retrieve data"}
-        except Exception as e:
-            logging.error(f"Unexpected error getting summary for stock {symbol}: {str(e)}")
-            return {"error": "An unexpected error occurred"}
+                summaries[symbol] = {"error": "Stock not found or unable to retrieve data"}
+        return summaries
 
     def get_filing_info(self, symbol, filing_type):
         try:
@@ -123,13 +171,9 @@ class StockDataManager:
                     return {"error": f"Invalid statement type: {statement_type}"}
 
                 if statement:
-                    statement_data = [stmt.to_mongo().to_dict() for stmt in statement]
-                    for stmt in statement_data:
-                        for key in ['date', 'fillingDate', 'acceptedDate']:
-                            if key in stmt and stmt[key]:
-                                stmt[key] = stmt[key].isoformat()
+                    # Dates stay datetimes; the JSON provider writes them as ISO 8601 UTC
                     logging.info(f"Successfully retrieved {statement_type} for {symbol}")
-                    return statement_data
+                    return statement
                 else:
                     logging.warning(f"{statement_type.capitalize()} not found for {symbol}")
                     return {"error": f"{statement_type.capitalize()} not found or unable to retrieve data"}
@@ -148,37 +192,21 @@ class StockDataManager:
                 stock = fetch_stock_data(symbol)
             
             if stock:
-                # Check if we have recent key metrics data
-                if stock.key_metrics:
-                    latest_metric = max(stock.key_metrics, key=lambda x: x.date)
-                    now = datetime.now(timezone.utc)
-                    latest_metric_date = latest_metric.date.replace(tzinfo=timezone.utc) if latest_metric.date.tzinfo is None else latest_metric.date
-                    if (now - latest_metric_date).days < 1:
-                        logging.info(f"Using cached key metrics for {symbol}")
-                        metrics = stock.key_metrics
-                    else:
-                        metrics = fetch_key_metrics(symbol, years)
-                        if metrics:
-                            stock.key_metrics = metrics
-                            stock.save()
+                if key_metrics_are_fresh({'key_metrics': stock.key_metrics, 'data_versions': stock.data_versions}):
+                    logging.info(f"Using cached key metrics for {symbol}")
+                    metrics = stock.key_metrics
                 else:
                     metrics = fetch_key_metrics(symbol, years)
                     if metrics:
                         stock.key_metrics = metrics
+                        stock.record_version('key_metrics', metrics)
                         stock.save()
 
                 if metrics:
-                    if period:
-                        metrics = [m for m in metrics if m.period == period]
-                    
-                    metrics_data = []
-                    for km in metrics:
-                        metric_dict = km.to_mongo().to_dict()
-                        if 'date' in metric_dict and metric_dict['date']:
-                            metric_dict['date'] = metric_dict['date'].replace(tzinfo=timezone.utc).isoformat()
-                        metric_dict = {k: v for k, v in metric_dict.items() if v is not None}
-                        metrics_data.append(metric_dict)
-                    
+                    # to_mongo() already leaves out unset fields
+                    metrics_data = [km.to_mongo() for km in metrics if not period or km.period == period]
+                    # Stored metrics can reach further back than a fetch for `years` would
+                    metrics_data = periods_within(metrics_data, years)
                     logging.info(f"Successfully retrieved key metrics for {symbol}")
                     return metrics_data
                 else:
@@ -190,3 +218,81 @@ class StockDataManager:
         except Exception as e:
             logging.error(f"Unexpected error getting key metrics for stock {symbol}: {str(e)}")
             return {"error": "An unexpected error occurred"}
+
+    def get_financial_statements(self, symbols, statement_type, years=5):
+        if statement_type not in STATEMENT_SOURCES:
+            return {"error": f"Invalid statement type: {statement_type}"}
+        field = STATEMENT_SOURCES[statement_type][2]
+        try:
+            docs = load_stock_docs(symbols, {field: 1})
+        except Exception as e:
+            logging.error(f"Unexpected error getting {statement_type} for {', '.join(symbols)}: {str(e)}")
+            return {symbol: {"error": "An unexpected error occurred"} for symbol in symbols}
+
+        results = {}
+        missing = []
+        for symbol in symbols:
+            periods = docs.get(symbol, {}).get(field) or []
+            # Same rule as fetch_statements, so stored statements are refreshed like on the single-symbol route
+            statements = periods_within(periods, years) if periods and statements_are_recent(periods) else []
+            if statements:
+                results[symbol] = statements
+            else:
+                missing.append(symbol)
+
+        results.update(fetch_concurrently(lambda symbol: self.get_financial_statement(symbol, statement_type, years), missing))
+        return {symbol: results[symbol] for symbol in symbols}
+
+    def get_key_metrics_batch(self, symbols, years=5, period=None):
+        try:
+            docs = load_stock_docs(symbols, {'key_metrics': 1, 'data_versions.key_metrics': 1})
+        except Exception as e:
+            logging.error(f"Unexpected error getting key metrics for {', '.join(symbols)}: {str(e)}")
+            return {symbol: {"error": "An unexpected error occurred"} for symbol in symbols}
+
+        results = {}
+        missing = []
+        for symbol in symbols:
+            doc = docs.get(symbol, {})
+            if key_metrics_are_fresh(doc):
+                metrics = [m for m in periods_within(doc['key_metrics'], years) if not period or m.get('period') == period]
+                results[symbol] = metrics
+            else:
+                missing.append(symbol)
+
+        results.update(fetch_concurrently(lambda symbol: self.get_key_metrics(symbol, years, period), missing))
+        return {symbol: results[symbol] for symbol in symbols}
+
+    def get_technical_indicators(self, symbols):
+        try:
+            # Only the last bar is needed to tell whether the stored indicators are current
+            docs = load_stock_docs(symbols, {'technical_indicators': 1, 'historical_data': {'$slice': -1}})
+            outdated = [symbol for symbol, doc in docs.items() if doc.get('historical_data') and
+                        (doc.get('technical_indicators') or {}).get('as_of') != doc['historical_data'][-1]['date']]
+            updates = []
+            histories = {symbol: doc['historical_data'] for symbol, doc in load_stock_docs(outdated, {'historical_data': 1}).items()}
+            # Spread across the process pool when many symbols are outdated at once
+            for (symbol, bars), indicators in zip(histories.items(), calculate_indicators_batch(list(histories.values()))):
+                indicators['as_of'] = bars[-1]['date']
+                docs[symbol]['technical_indicators'] = indicators
+                updates.append(UpdateOne({'symbol': symbol}, {'$set': {'technical_indicators': indicators}}))
+            if updates:
+                Stock._get_collection().bulk_write(updates, ordered=False)
+                logging.info(f"Computed technical indicators for {len(updates)} stocks")
+        except Exception as e:
+            logging.error(f"Unexpected error getting technical indicators for {', '.join(symbols)}: {str(e)}")
+            return {symbol: {"error": "An unexpected error occurred"} for symbol in symbols}
+
+        return {symbol: docs[symbol].get('technical_indicators') if symbol in docs else {"error": f"Stock data not found for {symbol}"}
+                for symbol in symbols}
+
+    def get_watchlist(self, username):
+        user = User._get_collection().find_one({'username': username}, {'watchlist': 1})
+        if not user:
+            return {"error": f"User not found: {username}"}
+        items = user.get('watchlist') or []
+        symbols = list(dict.fromkeys(item['symbol'] for item in items))
+        summaries = self.get_stock_summaries(symbols) if symbols else {}
+        indicators = self.get_technical_indicators(symbols) if symbols else {}
+        return [dict(summaries[item['symbol']], symbol=item['symbol'], added_date=item.get('added_date'), notes=item.get('notes'),
+                     technical_indicators=indicators[item['symbol']]) for item in items]
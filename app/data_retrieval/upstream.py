@@ -0,0 +1,184 @@
+import io
+import os
+import gzip
+import json
+import asyncio
+import hashlib
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# live:   call upstream, keep nothing
+# record: call upstream and archive every successful raw response (default)
+# replay: serve the data layer from the archive only; nothing goes upstream
+UPSTREAM_MODES = ('live', 'record', 'replay')
+UPSTREAM_MODE = os.getenv('UPSTREAM_MODE', 'record')
+ARCHIVE_DIR = os.getenv('UPSTREAM_ARCHIVE_DIR', os.path.join('data', 'upstream_archive'))
+ARCHIVE_GZIP_LEVEL = int(os.getenv('UPSTREAM_ARCHIVE_GZIP_LEVEL', '9'))
+# Credentials are dropped from archive keys, so recordings replay under any API key
+SECRET_PARAMS = {'apikey', 'api_key', 'token'}
+
+class ArchiveMiss(requests.RequestException):
+    pass
+
+def set_mode(mode):
+    global UPSTREAM_MODE
+    if mode not in UPSTREAM_MODES:
+        raise ValueError(f"Unknown upstream mode: {mode}")
+    UPSTREAM_MODE = mode
+
+def request_key(url):
+    parts = urlsplit(url)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+def _sha(value):
+    return hashlib.sha256(value).hexdigest()
+
+# Bodies are stored once per distinct content under blobs/, gzip-compressed and named by
+# their SHA-256, so unchanged responses fetched again cost no space. refs/ holds one
+# append-only JSON-lines file per request key listing every fetch of it, oldest first.
+class Archive:
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, 'blobs', digest[:2], f'{digest}.gz')
+
+    def _ref_path(self, key):
+        name = _sha(key.encode())
+        return os.path.join(self.root, 'refs', name[:2], f'{name}.jsonl')
+
+    def put(self, key, content, status=200, content_type=None, encoding=None, fetched_at=None):
+        digest = _sha(content)
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            # Written aside and renamed, so a reader never sees half a blob
+            tmp_path = f'{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(content, compresslevel=ARCHIVE_GZIP_LEVEL, mtime=0))
+            os.replace(tmp_path, blob_path)
+
+        entry = {
+            'key': key,
+            'digest': digest,
+            'status': status,
+            'content_type': content_type,
+            'encoding': encoding,
+            'size': len(content),
+            'fetched_at': (fetched_at or datetime.now(timezone.utc)).isoformat(),
+        }
+        ref_path = self._ref_path(key)
+        os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+        with self._lock, open(ref_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        return digest
+
+    def entries(self, key):
+        try:
+            with open(self._ref_path(key)) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def read(self, digest):
+        with open(self._blob_path(digest), 'rb') as f:
+            return gzip.decompress(f.read())
+
+    # Latest recording of `key` (or the latest at or before `as_of`), with its body
+    def get(self, key, as_of=None):
+        entries = self.entries(key)
+        if as_of is not None:
+            entries = [entry for entry in entries if datetime.fromisoformat(entry['fetched_at']) <= as_of]
+        if not entries:
+            return None, None
+        return entries[-1], self.read(entries[-1]['digest'])
+
+    def keys(self):
+        refs = os.path.join(self.root, 'refs')
+        for directory, _, files in os.walk(refs):
+            for name in files:
+                with open(os.path.join(directory, name)) as f:
+                    line = f.readline()
+                if line.strip():
+                    yield json.loads(line)['key']
+
+_archive = None
+
+def get_archive():
+    global _archive
+    if _archive is None:
+        _archive = Archive()
+    return _archive
+
+def _recording(record):
+    return record and UPSTREAM_MODE == 'record'
+
+def _replay_entry(key):
+    entry, content = get_archive().get(key)
+    if entry is None:
+        raise ArchiveMiss(f"No archived response for {key}")
+    return entry, content
+
+def _replayed_response(url, entry, content):
+    response = requests.Response()
+    response.status_code = entry['status']
+    response._content = content
+    response.headers = CaseInsensitiveDict({'Content-Type': entry['content_type']} if entry['content_type'] else {})
+    response.encoding = entry.get('encoding')
+    response.url = url
+    response.reason = 'Replayed'
+    return response
+
+# Single entry point for upstream GETs (FMP, EDGAR). `record=False` keeps high-frequency
+# polls such as the quote stream out of the archive. `key` replaces the URL-derived archive
+# key for requests whose URL changes from day to day (e.g. date ranges ending today).
+def get(url, headers=None, timeout=None, record=True, key=None):
+    key = key or request_key(url)
+    if UPSTREAM_MODE == 'replay':
+        return _replayed_response(url, *_replay_entry(key))
+    response = requests.get(url, headers=headers, timeout=timeout)
+    if _recording(record) and response.ok:
+        get_archive().put(key, response.content, response.status_code,
+                          response.headers.get('Content-Type'), response.encoding)
+    return response
+
+async def async_get(client, url, headers=None, record=True, key=None):
+    import httpx
+    key = key or request_key(url)
+    if UPSTREAM_MODE == 'replay':
+        entry, content = await asyncio.to_thread(_replay_entry, key)
+        headers = {'Content-Type': entry['content_type']} if entry['content_type'] else {}
+        return httpx.Response(entry['status'], content=content, headers=headers, request=httpx.Request('GET', url))
+    response = await client.get(url, headers=headers)
+    if _recording(record) and response.is_success:
+        await asyncio.to_thread(get_archive().put, key, response.content, response.status_code,
+                                response.headers.get('Content-Type'), response.encoding)
+    return response
+
+# Sources without a raw HTTP body to keep (yfinance) are archived as the DataFrame they
+# return, under a stable key such as 'yfinance:history:AAPL'
+def get_frame(key, load, record=True):
+    import pandas as pd
+    if UPSTREAM_MODE == 'replay':
+        _, content = _replay_entry(key)
+        return pd.read_json(io.StringIO(content.decode()), orient='split', precise_float=True)
+    frame = load()
+    if _recording(record) and frame is not None and not frame.empty:
+        get_archive().put(key, _frame_json(frame).encode(), content_type='application/json')
+    return frame
+
+# to_json keeps at most 15 significant digits, so the values are written with repr()
+# instead and a replayed frame is bit-for-bit the one that was recorded
+def _frame_json(frame):
+    payload = json.loads(frame.to_json(orient='split', date_format='iso', date_unit='s'))
+    payload['data'] = [[None if value != value else value for value in row] for row in frame.to_dict(orient='split')['data']]
+    return json.dumps(payload)
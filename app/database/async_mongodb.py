@@ -0,0 +1,18 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+_client = None
+
+def get_async_db():
+    global _client
+    mongodb_uri = os.getenv('MONGODB_URI')
+    if not mongodb_uri:
+        raise ValueError("MONGODB_URI environment variable is not set")
+
+    # Motor binds to the running event loop on first use, so create the client lazily
+    if _client is None:
+        _client = AsyncIOMotorClient(mongodb_uri)
+    return _client[os.getenv('DB_NAME', 'stocksage')]
@@ -3,10 +3,14 @@ from mongoengine.connection import get_db
 from dotenv import load_dotenv
 import os
 import logging
+import threading
 
 load_dotenv()
 
-def initialize_db():
+_db_lock = threading.Lock()
+_db_initialized = False
+
+def initialize_db(verify=False):
     mongodb_uri = os.getenv('MONGODB_URI')
     if not mongodb_uri:
         raise ValueError("MONGODB_URI environment variable is not set")
@@ -15,21 +19,29 @@ def initialize_db():
     db_name = os.getenv('DB_NAME', 'stocksage')
     
     try:
-        # Connect to MongoDB with the specific database name
+        # Connect to MongoDB with the specific database name; the driver connects on first use
         connect(db=db_name, host=mongodb_uri)
-        
-        # Verify connection by getting the database
         db = get_db()
-        logging.info(f"Successfully connected to MongoDB. Database name: {db.name}")
-        
-        # List all collections
-        collections = db.list_collection_names()
-        logging.info(f"Existing collections: {collections}")
-        
+        logging.info(f"Configured MongoDB connection. Database name: {db.name}")
+
+        # Round trip to the server, only when asked for (e.g. from the CLI)
+        if verify:
+            collections = db.list_collection_names()
+            logging.info(f"Existing collections: {collections}")
+
     except Exception as e:
         logging.error(f"Failed to connect to MongoDB: {str(e)}")
         raise
 
-# Call this function when your application starts
+# Registers the connection the first time anything needs the database
+def ensure_db():
+    global _db_initialized
+    if _db_initialized:
+        return
+    with _db_lock:
+        if not _db_initialized:
+            initialize_db()
+            _db_initialized = True
+
 if __name__ == "__main__":
-    initialize_db()
\ No newline at end of file
+    initialize_db(verify=True)
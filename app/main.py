@@ -1,11 +1,25 @@
-from flask import Flask, jsonify, request, render_template_string
-from app.database.mongodb import initialize_db
-from app.scheduler.jobs import init_scheduler
-from app.data_retrieval.stock_data_manager import StockDataManager
-from app.assistant.assistant import StockAnalysisAssistant
+from flask import Flask, Blueprint, current_app, jsonify, request, render_template_string, Response, stream_with_context
+from app.database.mongodb import ensure_db
+from app.data_retrieval.stock_data_manager import parse_symbols, MAX_BATCH_SYMBOLS
+from app.data_retrieval.stock_api import STATEMENT_SOURCES
+from app.services import get_stock_data_manager, get_stock_assistant, get_job_queue, get_report_cache, get_quote_streamer
+from app.data_retrieval.quote_streamer import Subscription
+from app.data_processing import fundamentals, rollups
+from app.backtesting.data import load_prices
+from app.backtesting.strategies import STRATEGIES
+from app.backtesting.engine import run_backtest, summarize, DEFAULT_COST_BPS
+from app.models.history import (
+    UserAnalysis, UserInteraction, HISTORY_PAGE_SIZE, find_user_id, history_page, record_for_user, record_analysis,
+    record_interaction
+)
+from app.models.report import AnalysisReport
+from app.assistant.assistant import ASSISTANT_MODEL
+from app.utils.http_cache import conditional_view
+from app.utils.json_provider import OrjsonProvider, dumps_bytes
+from app.utils.compression import compress_response
 import logging
 from flask_cors import CORS
-import os
+import uuid
 import markdown2
 
 stock_analysis_template = """
@@ -47,61 +61,148 @@ stock_analysis_template = """
 </html>
 """
 
-app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}}, supports_credentials=True)
-logging.basicConfig(level=logging.DEBUG)
+api = Blueprint('api', __name__)
 
-initialize_db()
-init_scheduler()
+HISTORY_MODELS = {'analyses': UserAnalysis, 'interactions': UserInteraction}
 
-stock_data_manager = StockDataManager()
+@api.route('/api/stock_summary/<symbol>')
+@conditional_view('summary')
+def stock_summary(symbol):
+    return get_stock_data_manager().get_stock_summary(symbol)
 
-# Load the assistant ID from an environment variable or create a new one
-ASSISTANT_ID = os.getenv('STOCK_ASSISTANT_ID')
-if ASSISTANT_ID:
-    stock_assistant = StockAnalysisAssistant(stock_data_manager, assistant_id=ASSISTANT_ID)
-    logging.info(f"Loaded existing assistant with ID: {ASSISTANT_ID}")
-else:
-    stock_assistant = StockAnalysisAssistant(stock_data_manager)
-    ASSISTANT_ID = stock_assistant.assistant.id
-    logging.info(f"Created new assistant with ID: {ASSISTANT_ID}")
-    # You might want to save this ID for future use, e.g., to an environment variable
+def batch_symbols():
+    symbols = parse_symbols(request.args.get('symbols'))
+    if not symbols:
+        return None, (jsonify({"error": "Missing symbols parameter"}), 400)
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        return None, (jsonify({"error": f"At most {MAX_BATCH_SYMBOLS} symbols per request"}), 400)
+    return symbols, None
 
-@app.route('/api/stock_summary/<symbol>')
-def stock_summary(symbol):
-    return jsonify(stock_data_manager.get_stock_summary(symbol))
+@api.route('/api/stock_summary')
+@conditional_view('summary')
+def batch_stock_summary():
+    symbols, error = batch_symbols()
+    if error:
+        return error
+    return get_stock_data_manager().get_stock_summaries(symbols)
 
-@app.route('/api/<filing_type>_filing/<symbol>')
+@api.route('/api/<filing_type>_filing/<symbol>')
 def get_filing(filing_type, symbol):
-    return jsonify(stock_data_manager.get_filing_info(symbol, filing_type))
+    return jsonify(get_stock_data_manager().get_filing_info(symbol, filing_type))
 
-@app.route('/api/full_report/<filing_type>/<symbol>')
+@api.route('/api/full_report/<filing_type>/<symbol>')
+@conditional_view('report')
 def get_full_report(filing_type, symbol):
-    report = stock_data_manager.get_full_report(filing_type, symbol)
-    if isinstance(report, str):
-        return report, 200, {'Content-Type': 'text/plain'}
-    else:
-        return jsonify(report)
-
-@app.route('/api/<statement_type>/<symbol>')
-@app.route('/api/<statement_type>/<symbol>/<int:years>')
+    # Plain text when the report is found, an error dict otherwise
+    return get_stock_data_manager().get_full_report(filing_type, symbol)
+
+@api.route('/api/<statement_type>/<symbol>')
+@api.route('/api/<statement_type>/<symbol>/<int:years>')
+@conditional_view('statement')
 def get_financial_statement(statement_type, symbol, years=5):
-    return jsonify(stock_data_manager.get_financial_statement(symbol, statement_type, years))
+    return get_stock_data_manager().get_financial_statement(symbol, statement_type, years)
 
-@app.route('/api/key_metrics/<symbol>')
-@app.route('/api/key_metrics/<symbol>/<int:years>')
+# Only the statement names, so other single-segment /api paths still 404 or 405
+@api.route(f"/api/<any({', '.join(STATEMENT_SOURCES)}):statement_type>")
+@conditional_view('statement')
+def batch_financial_statement(statement_type):
+    symbols, error = batch_symbols()
+    if error:
+        return error
+    years = request.args.get('years', 5, type=int)
+    return get_stock_data_manager().get_financial_statements(symbols, statement_type, years)
+
+@api.route('/api/key_metrics/<symbol>')
+@api.route('/api/key_metrics/<symbol>/<int:years>')
+@conditional_view('key_metrics')
 def get_key_metrics(symbol, years=5):
     period = request.args.get('period')
-    return jsonify(stock_data_manager.get_key_metrics(symbol, years, period))
+    return get_stock_data_manager().get_key_metrics(symbol, years, period)
 
-@app.route('/api/analyze_stock/<symbol>')
+@api.route('/api/key_metrics')
+@conditional_view('key_metrics')
+def batch_key_metrics():
+    symbols, error = batch_symbols()
+    if error:
+        return error
+    years = request.args.get('years', 5, type=int)
+    period = request.args.get('period')
+    return get_stock_data_manager().get_key_metrics_batch(symbols, years, period)
+
+@api.route('/api/fundamentals/<symbol>')
+def get_fundamentals(symbol):
+    result = fundamentals.get_fundamentals(symbol, request.args.get('period', 'annual'), request.args.get('periods', type=int))
+    if "error" in result:
+        return jsonify(result), 404
+    return jsonify(result)
+
+# e.g. /api/backtest/AAPL?strategy=sma_crossover&fast=20&slow=50 over the stored daily bars
+@api.route('/api/backtest/<symbol>')
+def backtest(symbol):
+    strategy = request.args.get('strategy', 'sma_crossover')
+    if strategy not in STRATEGIES:
+        return jsonify({"error": f"Unknown strategy: {strategy}"}), 400
+    try:
+        params = {name: float(value) if '.' in value else int(value)
+                  for name, value in request.args.items() if name not in ('strategy', 'cost_bps')}
+    except ValueError:
+        return jsonify({"error": "Strategy parameters must be numbers"}), 400
+    data = load_prices([symbol])
+    if not data.symbols:
+        return jsonify({"error": f"No price history stored for {symbol}"}), 404
+    try:
+        positions = STRATEGIES[strategy](data, **params)
+    except TypeError as e:
+        return jsonify({"error": str(e)}), 400
+    if positions is None:
+        return jsonify({"error": f"Invalid parameters for {strategy}"}), 400
+    result = run_backtest(data, positions, request.args.get('cost_bps', DEFAULT_COST_BPS, type=float))
+    return jsonify({
+        "symbol": symbol,
+        "strategy": strategy,
+        "params": params,
+        "metrics": summarize(result['metrics']),
+        "dates": [str(date) for date in data.dates[1:]],
+        "equity": result['equity'][0],
+        "position": positions[0, :-1],
+    })
+
+@api.route('/api/ttm/<symbol>')
+def get_ttm(symbol):
+    result = rollups.get_ttm(symbol, include_series=request.args.get('series') == '1')
+    if "error" in result:
+        return jsonify(result), 404
+    return jsonify(result)
+
+# e.g. /api/screen?roe_min=0.15&debt_to_equity_max=1&sort=revenue_cagr_3y&limit=20
+@api.route('/api/screen')
+def screen_stocks():
+    filters = {}
+    for key in request.args:
+        name, _, bound = key.rpartition('_')
+        if bound in ('min', 'max') and name:
+            value = request.args.get(key, type=float)
+            if value is None:
+                return jsonify({"error": f"Invalid value for {key}"}), 400
+            minimum, maximum = filters.get(name, (None, None))
+            filters[name] = (value, maximum) if bound == 'min' else (minimum, value)
+    period = request.args.get('period', 'annual')
+    if period not in fundamentals.PERIODS:
+        return jsonify({"error": f"Invalid period: {period}"}), 400
+    result = fundamentals.screen(filters, period, sort=request.args.get('sort'), descending=request.args.get('order', 'desc') != 'asc',
+                                 limit=min(request.args.get('limit', 50, type=int), 500))
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+@api.route('/api/analyze_stock/<symbol>')
 def analyze_stock(symbol):
     try:
         logging.info(f"Received request for stock analysis of {symbol}")
-        analysis = stock_assistant.analyze_stock(symbol)
-        if analysis:
+        html_content = get_report_cache().get_report(symbol, force_refresh=request.args.get('refresh') == '1')
+        if html_content:
             logging.info(f"Successfully generated analysis for {symbol}")
-            html_content = markdown2.markdown(analysis)
+            record_analysis_for(request.args.get('user'), symbol, html_content)
             return render_template_string(stock_analysis_template, symbol=symbol, analysis=html_content)
         else:
             logging.warning(f"Failed to generate analysis for {symbol}")
@@ -110,8 +211,29 @@ def analyze_stock(symbol):
         logging.error(f"Unexpected error analyzing stock {symbol}: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/watchlist')
+# Analyses requested with ?user=<username> go to that user's history
+def record_analysis_for(username, symbol, html_content):
+    if not username:
+        return
+    report = AnalysisReport.objects(symbol=symbol).only('analysis_markdown').first()
+    summary = report.analysis_markdown if report and report.analysis_markdown else html_content
+    record_for_user(username, record_analysis, symbol, ASSISTANT_MODEL, summary)
+
+# Chat turns from a request that names its user ("user" in the body) go to that user's history
+def record_chat_for(data, conversation_id):
+    record_for_user(data.get('user'), record_interaction, 'chat',
+                    {'stock': data.get('stock'), 'message': data.get('message'), 'conversation_id': conversation_id})
+
+@api.route('/api/watchlist')
 def get_watchlist():
+    username = request.args.get('user')
+    if username:
+        # Served from the data the prefetcher keeps warm for watched symbols
+        watchlist = get_stock_data_manager().get_watchlist(username)
+        if isinstance(watchlist, dict) and "error" in watchlist:
+            return jsonify(watchlist), 404
+        return jsonify(watchlist)
+
     # Static watchlist
     watchlist = [
         {'symbol': 'AAPL', 'companyName': 'Apple Inc.'},
@@ -122,11 +244,34 @@ def get_watchlist():
     ]
     return jsonify(watchlist)
 
-@app.route('/api/chat', methods=['POST', 'OPTIONS'])
+@api.route('/api/users/<username>/<history>')
+def get_user_history(username, history):
+    model = HISTORY_MODELS.get(history)
+    if model is None:
+        return jsonify({"error": f"Unknown history: {history}"}), 404
+    user_id = find_user_id(username)
+    if user_id is None:
+        return jsonify({"error": f"User not found: {username}"}), 404
+    page = history_page(model, user_id, limit=request.args.get('limit', HISTORY_PAGE_SIZE, type=int), before=request.args.get('before'))
+    if "error" in page:
+        return jsonify(page), 400
+    return jsonify(page)
+
+# New conversations get an id to echo back on later turns, which keeps one assistant thread per
+# conversation. Clients that send their history without an id are replayed as before, so they
+# do not leave a new thread and session behind on every turn.
+def chat_conversation_id(data):
+    if data.get('conversation_id'):
+        return data['conversation_id']
+    if data.get('conversation_history'):
+        return None
+    return uuid.uuid4().hex
+
+@api.route('/api/chat', methods=['POST', 'OPTIONS'])
 def chat():
     if request.method == 'OPTIONS':
         # Preflight request. Reply successfully:
-        response = app.make_default_options_response()
+        response = current_app.make_default_options_response()
         response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
         return response
 
@@ -135,19 +280,114 @@ def chat():
         stock_symbol = data.get('stock')
         message = data.get('message')
         conversation_history = data.get('conversation_history', [])
+        conversation_id = chat_conversation_id(data)
 
         if not stock_symbol or not message:
             return jsonify({"error": "Missing stock symbol or message"}), 400
+        record_chat_for(data, conversation_id)
 
-        response = stock_assistant.process_stock_conversation(stock_symbol, message, conversation_history)
+        if data.get('stream') or request.accept_mimetypes.best == 'text/event-stream':
+            return stream_chat(stock_symbol, message, conversation_history, conversation_id)
+
+        response = get_stock_assistant().process_stock_conversation(stock_symbol, message, conversation_history, conversation_id)
         
         # Convert Markdown to HTML for easier rendering on the frontend
         html_response = markdown2.markdown(response)
         
-        return jsonify({"message": html_response})
+        return jsonify({"message": html_response, "conversation_id": conversation_id})
     except Exception as e:
         logging.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@api.route('/api/jobs', methods=['POST'])
+def submit_job():
+    data = request.json or {}
+    kind = data.get('kind')
+    params = data.get('params', {})
+    if kind not in get_job_queue().handlers:
+        return jsonify({"error": f"Unknown job kind: {kind}"}), 400
+    if kind == 'chat':
+        params['conversation_id'] = chat_conversation_id(params)
+
+    try:
+        job = get_job_queue().submit(kind, params)
+        return jsonify(job.to_status()), 202
+    except Exception as e:
+        logging.error(f"Error submitting {kind} job: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/jobs/<job_id>')
+def get_job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_status())
+
+@api.route('/api/jobs/<job_id>/result')
+def get_job_result(job_id):
+    job = get_job_queue().get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status == 'succeeded':
+        return jsonify(job.result)
+    if job.status == 'failed':
+        return jsonify({"error": job.error}), 500
+    return jsonify(job.to_status()), 202
+
+QUOTE_KEEPALIVE_SECONDS = 15
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {dumps_bytes(data).decode()}\n\n"
+
+@api.route('/api/quotes/stream')
+def quote_stream():
+    symbols, error = batch_symbols()
+    if error:
+        return error
+    streamer = get_quote_streamer()
+    subscription = streamer.subscribe(Subscription(symbols))
+
+    def generate():
+        try:
+            while True:
+                quote = subscription.get(timeout=QUOTE_KEEPALIVE_SECONDS)
+                # Comment lines keep proxies from closing an idle stream
+                yield sse_event(quote, event="quote") if quote else ": keepalive\n\n"
+        finally:
+            streamer.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def stream_chat(stock_symbol, message, conversation_history, conversation_id):
+    def generate():
+        chunks = []
+        try:
+            for delta in get_stock_assistant().stream_stock_conversation(stock_symbol, message, conversation_history, conversation_id):
+                chunks.append(delta)
+                yield sse_event({"delta": delta})
+            yield sse_event({"message": markdown2.markdown("".join(chunks)), "conversation_id": conversation_id}, event="done")
+        except Exception as e:
+            logging.error(f"Error in streaming chat: {str(e)}", exc_info=True)
+            yield sse_event({"error": str(e)}, event="error")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def create_app():
+    app = Flask(__name__)
+    CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}}, supports_credentials=True)
+    logging.basicConfig(level=logging.DEBUG)
+    # The connection is registered on the first request instead of at import;
+    # the scheduler runs in its own process (python -m app.scheduler)
+    app.before_request(ensure_db)
+    app.json = OrjsonProvider(app)
+    app.after_request(lambda response: compress_response(response, request))
+    app.register_blueprint(api)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=False)
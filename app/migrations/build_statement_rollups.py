@@ -0,0 +1,29 @@
+import logging
+from app.database.mongodb import ensure_db
+from app.models.stock import Stock
+from app.data_processing.rollups import update_rollup
+
+# Builds statement_rollups for every stored stock; afterwards they are kept current as
+# statements are saved. Safe to re-run:
+#
+#   python -m app.migrations.build_statement_rollups
+
+ROLLUP_SOURCES = {
+    'income_statement': 'income_statement',
+    'balance_sheet': 'balance_sheets',
+    'cash_flow_statement': 'cash_flow_statements',
+}
+
+def build_statement_rollups(force=False):
+    ensure_db()
+    built = 0
+    for doc in Stock._get_collection().find({}, {'symbol': 1, **{field: 1 for field in ROLLUP_SOURCES.values()}}):
+        for statement_type, field in ROLLUP_SOURCES.items():
+            if update_rollup(doc['symbol'], statement_type, doc.get(field), force=force):
+                built += 1
+    logging.info(f"Built {built} statement rollups")
+    return built
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_statement_rollups()
@@ -0,0 +1,91 @@
+import struct
+import hashlib
+import logging
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app.database.mongodb import ensure_db
+from app.models.user import User
+from app.models.history import UserAnalysis, UserInteraction, RECENT_HISTORY_SIZE
+
+# Copies the embedded analysis_history / interaction_history of every user that predates the
+# history collections into user_analyses / user_interactions, then trims the embedded lists
+# to the latest RECENT_HISTORY_SIZE entries. Safe to re-run:
+#
+#   python -m app.migrations.offload_user_history
+
+DUPLICATE_KEY = 11000
+
+def _entry_date(entry):
+    value = entry.get('date') or entry.get('timestamp')
+    return value if isinstance(value, datetime) else None
+
+def migrated_id(user_id, field, index, date):
+    # Deterministic, so a re-run after a partial failure skips entries already copied; the
+    # timestamp prefix keeps _id ordered by the entry's own date for pagination
+    seconds = int((date or user_id.generation_time).timestamp())
+    digest = hashlib.sha1(f"{user_id}:{field}:{index}".encode()).digest()[:8]
+    return ObjectId(struct.pack('>I', seconds) + digest)
+
+# Entries recorded through app.models.history carry entry_id and are already in the collections
+def analysis_docs(user):
+    docs = []
+    for index, entry in enumerate(user.get('analysis_history') or []):
+        if entry.get('entry_id'):
+            continue
+        date = _entry_date(entry)
+        docs.append(dict(entry, _id=migrated_id(user['_id'], 'analysis_history', index, date), user_id=user['_id'],
+                         date=date or user['_id'].generation_time))
+    return docs
+
+def interaction_docs(user):
+    docs = []
+    for index, entry in enumerate(user.get('interaction_history') or []):
+        if entry.get('entry_id'):
+            continue
+        date = _entry_date(entry)
+        docs.append({
+            '_id': migrated_id(user['_id'], 'interaction_history', index, date),
+            'user_id': user['_id'],
+            'date': date or user['_id'].generation_time,
+            'kind': entry.get('kind') or entry.get('type'),
+            'data': entry,
+        })
+    return docs
+
+def insert_new(collection, docs):
+    if not docs:
+        return 0
+    try:
+        return len(collection.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY for error in e.details['writeErrors']):
+            raise
+        return e.details['nInserted']
+
+def offload_user_history(batch_size=100):
+    ensure_db()
+    users = User._get_collection()
+    analyses = UserAnalysis._get_collection()
+    interactions = UserInteraction._get_collection()
+    migrated = copied = 0
+    cursor = users.find({'history_offloaded': {'$ne': True}}, {'analysis_history': 1, 'interaction_history': 1},
+                        batch_size=batch_size)
+    for user in cursor:
+        copied += insert_new(analyses, analysis_docs(user))
+        copied += insert_new(interactions, interaction_docs(user))
+        users.update_one({'_id': user['_id']}, [{'$set': {
+            'history_offloaded': True,
+            # Anything pushed while this user was being copied stays: only the oldest entries go
+            'analysis_history': {'$slice': [{'$ifNull': ['$analysis_history', []]}, -RECENT_HISTORY_SIZE]},
+            'interaction_history': {'$slice': [{'$ifNull': ['$interaction_history', []]}, -RECENT_HISTORY_SIZE]},
+        }}])
+        migrated += 1
+        if migrated % 1000 == 0:
+            logging.info(f"Offloaded history for {migrated} users")
+    logging.info(f"Offloaded history for {migrated} users ({copied} entries copied) at {datetime.now(timezone.utc).isoformat()}")
+    return {"users": migrated, "entries": copied}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    offload_user_history()
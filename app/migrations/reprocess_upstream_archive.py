@@ -0,0 +1,56 @@
+import re
+import logging
+import argparse
+from app.database.mongodb import ensure_db
+from app.data_retrieval import upstream
+from app.data_retrieval.stock_api import fetch_stock_data, fetch_statements, STATEMENT_SOURCES
+from app.data_retrieval.stock_data_manager import MAX_BATCH_SYMBOLS
+from app.models.stock import Stock
+from app.services import get_stock_data_manager
+
+# Re-derives stored stock data from the raw upstream archive (see app.data_retrieval.upstream)
+# after a parser, model or indicator change, without a single API call:
+#
+#   python -m app.migrations.reprocess_upstream_archive
+#   python -m app.migrations.reprocess_upstream_archive --symbols AAPL,MSFT
+
+PROFILE_KEY_RE = re.compile(r'/profile/([^/?]+)')
+
+def archived_symbols(archive=None):
+    symbols = set()
+    for key in (archive or upstream.get_archive()).keys():
+        match = PROFILE_KEY_RE.search(key)
+        if match:
+            symbols.add(match.group(1))
+    return sorted(symbols)
+
+def reprocess(symbols=None):
+    ensure_db()
+    upstream.set_mode('replay')
+    symbols = symbols or archived_symbols()
+    failed = []
+    for symbol in symbols:
+        # Archive misses are logged and reported by the fetchers like any upstream failure
+        ok = fetch_stock_data(symbol) is not None
+        for statement_type in STATEMENT_SOURCES:
+            ok = fetch_statements(symbol, statement_type, force_refresh=True) is not None and ok
+        if not ok:
+            failed.append(symbol)
+
+    # Indicators are only recomputed when a new bar arrives, so drop them to pick up indicator changes
+    Stock._get_collection().update_many({'symbol': {'$in': symbols}}, {'$unset': {'technical_indicators': ''}})
+    manager = get_stock_data_manager()
+    for start in range(0, len(symbols), MAX_BATCH_SYMBOLS):
+        manager.get_technical_indicators(symbols[start:start + MAX_BATCH_SYMBOLS])
+
+    logging.info(f"Reprocessed {len(symbols) - len(failed)} of {len(symbols)} symbols from the archive")
+    if failed:
+        logging.warning(f"Incomplete archive for {', '.join(failed)}")
+    return {"symbols": len(symbols), "failed": failed}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild stored stock data from archived upstream responses")
+    parser.add_argument('--symbols', help="Comma-separated symbols (default: every symbol with an archived profile)")
+    args = parser.parse_args()
+    reprocess([s.strip() for s in args.symbols.split(',') if s.strip()] if args.symbols else None)
@@ -0,0 +1,17 @@
+from mongoengine import Document, StringField, DateTimeField, IntField
+from datetime import datetime, timezone
+
+class ChatSession(Document):
+    conversation_id = StringField(required=True, unique=True)
+    thread_id = StringField(required=True)
+    stock_symbol = StringField()
+    created_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
+    last_active = DateTimeField(default=lambda: datetime.now(timezone.utc))
+    message_count = IntField(default=0)
+
+    meta = {
+        'indexes': [
+            'conversation_id',
+            'last_active'
+        ]
+    }
@@ -0,0 +1,119 @@
+import os
+import logging
+from mongoengine import Document, StringField, DateTimeField, FloatField, DictField, ObjectIdField
+from datetime import datetime, timezone
+from bson import ObjectId
+from dotenv import load_dotenv
+from app.models.user import User
+
+load_dotenv()
+
+# Entries kept inline on the User document; older ones are only in the history collections
+RECENT_HISTORY_SIZE = int(os.getenv('USER_RECENT_HISTORY', '20'))
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+ANALYSIS_HISTORY_TTL = int(os.getenv('ANALYSIS_HISTORY_TTL_DAYS', '365')) * 24 * 60 * 60
+INTERACTION_HISTORY_TTL = int(os.getenv('INTERACTION_HISTORY_TTL_DAYS', '90')) * 24 * 60 * 60
+# Analyses are stored as a summary; the full report stays in the report cache
+ANALYSIS_SUMMARY_LENGTH = 1000
+
+# Full per-user history lives here, append-only and expired by TTL; the User document only
+# keeps the latest RECENT_HISTORY_SIZE entries
+class UserAnalysis(Document):
+    user_id = ObjectIdField(required=True)
+    date = DateTimeField(default=lambda: datetime.now(timezone.utc))
+    stock_symbol = StringField(required=True)
+    model_used = StringField(required=True)
+    summary = StringField(required=True)
+    recommendation = StringField()
+    confidence_score = FloatField()
+
+    meta = {
+        'collection': 'user_analyses',
+        'indexes': [
+            # Pages are read newest first by _id, which increases with insertion time
+            ('user_id', '-_id'),
+            ('date', 'stock_symbol'),
+            {'fields': ['date'], 'expireAfterSeconds': ANALYSIS_HISTORY_TTL, 'name': 'date_ttl'}
+        ]
+    }
+
+class UserInteraction(Document):
+    user_id = ObjectIdField(required=True)
+    date = DateTimeField(default=lambda: datetime.now(timezone.utc))
+    kind = StringField()
+    data = DictField()
+
+    meta = {
+        'collection': 'user_interactions',
+        'indexes': [
+            ('user_id', '-_id'),
+            {'fields': ['date'], 'expireAfterSeconds': INTERACTION_HISTORY_TTL, 'name': 'date_ttl'}
+        ]
+    }
+
+def _push_recent(user_id, field, entry):
+    # One fixed-size update however long the account has existed
+    users = User._get_collection()
+    result = users.update_one({'_id': user_id, 'history_offloaded': True},
+                              {'$push': {field: {'$each': [entry], '$slice': -RECENT_HISTORY_SIZE}}})
+    if not result.matched_count:
+        # Older entries of this user have not been copied yet (app.migrations.offload_user_history), so keep them all
+        users.update_one({'_id': user_id}, {'$push': {field: entry}})
+
+def record_analysis(user_id, stock_symbol, model_used, summary, recommendation=None, confidence_score=None, date=None):
+    entry = UserAnalysis(user_id=user_id, stock_symbol=stock_symbol, model_used=model_used, summary=summary[:ANALYSIS_SUMMARY_LENGTH],
+                         recommendation=recommendation, confidence_score=confidence_score,
+                         date=date or datetime.now(timezone.utc))
+    entry.save()
+    recent = entry.to_mongo().to_dict()
+    recent['entry_id'] = recent.pop('_id')
+    recent.pop('user_id')
+    _push_recent(user_id, 'analysis_history', recent)
+    return entry
+
+def record_interaction(user_id, kind, data=None, date=None):
+    entry = UserInteraction(user_id=user_id, kind=kind, data=data or {}, date=date or datetime.now(timezone.utc))
+    entry.save()
+    _push_recent(user_id, 'interaction_history', dict(data or {}, kind=kind, date=entry.date, entry_id=entry.id))
+    return entry
+
+# For request handlers: an unknown user or a failed history write never fails the request
+def record_for_user(username, record, *args, **kwargs):
+    if not username:
+        return None
+    try:
+        user_id = find_user_id(username)
+        if user_id is None:
+            logging.warning(f"Not recording history for unknown user {username}")
+            return None
+        return record(user_id, *args, **kwargs)
+    except Exception as e:
+        logging.error(f"Error recording history for {username}: {str(e)}")
+        return None
+
+def history_page(model, user_id, limit=HISTORY_PAGE_SIZE, before=None):
+    # Keyset pagination: `before` is the `next` cursor of the previous page
+    query = {'user_id': user_id}
+    if before:
+        if not ObjectId.is_valid(before):
+            return {"error": f"Invalid cursor: {before}"}
+        query['_id'] = {'$lt': ObjectId(before)}
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+    docs = list(model._get_collection().find(query, {'user_id': 0}).sort('_id', -1).limit(limit + 1))
+    items = docs[:limit]
+    for item in items:
+        item['id'] = str(item.pop('_id'))
+    return {"items": items, "next": items[-1]['id'] if len(docs) > limit else None}
+
+def find_user_id(username):
+    user = User._get_collection().find_one({'username': username}, {'_id': 1})
+    return user['_id'] if user else None
+
+# Analyses per symbol since `since`, across all users
+def analysis_counts(since):
+    pipeline = [
+        {'$match': {'date': {'$gte': since}}},
+        {'$group': {'_id': '$stock_symbol', 'count': {'$sum': 1}}},
+    ]
+    return {doc['_id']: doc['count'] for doc in UserAnalysis._get_collection().aggregate(pipeline)}
@@ -0,0 +1,43 @@
+from mongoengine import Document, StringField, DateTimeField, DictField, DynamicField, IntField
+from datetime import datetime, timezone
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+class Job(Document):
+    job_id = StringField(required=True, unique=True)
+    kind = StringField(required=True)
+    params = DictField()
+    dedupe_key = StringField(required=True)
+    # Only set while the job is queued or running, so the unique index rejects duplicate in-flight jobs
+    active_key = StringField()
+    status = StringField(choices=JOB_STATUSES, default='queued')
+    result = DynamicField()
+    error = StringField()
+    attempts = IntField(default=0)
+    created_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
+    started_at = DateTimeField()
+    # Refreshed by the process running the job; see JobQueue.recover
+    heartbeat_at = DateTimeField()
+    finished_at = DateTimeField()
+
+    meta = {
+        'indexes': [
+            'job_id',
+            {'fields': ['active_key'], 'unique': True, 'sparse': True},
+            ('status', 'created_at'),
+            {'fields': ['finished_at'], 'expireAfterSeconds': 24 * 60 * 60}
+        ]
+    }
+
+    def to_status(self):
+        status = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+        if self.error:
+            status["error"] = self.error
+        return status
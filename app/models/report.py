@@ -0,0 +1,15 @@
+from mongoengine import Document, StringField, DateTimeField
+from datetime import datetime, timezone
+
+class AnalysisReport(Document):
+    symbol = StringField(required=True, unique=True)
+    input_hash = StringField(required=True)
+    analysis_markdown = StringField()
+    analysis_html = StringField(required=True)
+    generated_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
+
+    meta = {
+        'indexes': [
+            'symbol'
+        ]
+    }
@@ -0,0 +1,19 @@
+from mongoengine import Document, StringField, DateTimeField, DictField
+from datetime import datetime, timezone
+
+# Derived from the statements stored on Stock, one document per symbol and one dict per
+# statement type (see app/data_processing/rollups.py). Rebuilt for a statement type only
+# when a newer period arrives.
+class StatementRollup(Document):
+    symbol = StringField(required=True, unique=True)
+    income_statement = DictField()
+    balance_sheet = DictField()
+    cash_flow_statement = DictField()
+    updated_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
+
+    meta = {
+        'collection': 'statement_rollups',
+        'indexes': [
+            'symbol'
+        ]
+    }
@@ -1,5 +1,29 @@
 from mongoengine import Document, StringField, DateTimeField, FloatField, IntField, EmbeddedDocument, EmbeddedDocumentField, ListField, DictField, BooleanField
 from datetime import datetime, timezone
+import hashlib
+import json
+
+def _digest_default(value):
+    if isinstance(value, datetime):
+        # Stored datetimes come back naive; compare everything as naive UTC
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    if hasattr(value, 'to_mongo'):
+        return value.to_mongo().to_dict()
+    return str(value)
+
+def dataset_digest(value):
+    payload = json.dumps(value, sort_keys=True, separators=(',', ':'), default=_digest_default)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+# data_versions entry: 'etag' is a digest of the content, 'modified' moves only when that changes,
+# 'checked' is the last time the dataset was fetched from upstream
+def version_entry(value, previous=None, now=None):
+    now = now or datetime.now(timezone.utc)
+    etag = dataset_digest(value)
+    modified = previous['modified'] if previous and previous.get('etag') == etag else now
+    return {'etag': etag, 'modified': modified, 'checked': now}
 
 class HistoricalData(EmbeddedDocument):
     date = DateTimeField(required=True)
@@ -279,6 +303,10 @@ class Stock(Document):
     cash_flow_statements = ListField(EmbeddedDocumentField('CashFlowStatement'))
     key_metrics = ListField(EmbeddedDocumentField('KeyMetrics'))
     real_time_quote = EmbeddedDocumentField(RealTimeQuote)
+    # Latest indicator values computed from historical_data, with 'as_of' set to the last bar's date
+    technical_indicators = DictField()
+    # Per-dataset versions ('summary', 'income_statement', 'key_metrics', 'report_10-K', ...) used as HTTP validators
+    data_versions = DictField()
 
     meta = {
         'indexes': [
@@ -288,4 +316,7 @@ class Stock(Document):
             'industry',
             'last_updated'
         ]
-    }
\ No newline at end of file
+    }
+
+    def record_version(self, dataset, value):
+        self.data_versions[dataset] = version_entry(value, self.data_versions.get(dataset))
@@ -1,4 +1,4 @@
-from mongoengine import Document, StringField, DateTimeField, ListField, EmbeddedDocument, EmbeddedDocumentField, FloatField, DictField
+from mongoengine import Document, StringField, DateTimeField, ListField, EmbeddedDocument, EmbeddedDocumentField, FloatField, DictField, BooleanField, ObjectIdField
 from datetime import datetime
 
 class Preference(EmbeddedDocument):
@@ -21,6 +21,8 @@ class AnalysisHistory(EmbeddedDocument):
     summary = StringField(required=True)
     recommendation = StringField()
     confidence_score = FloatField()
+    # _id of the full record in user_analyses
+    entry_id = ObjectIdField()
 
 class Portfolio(EmbeddedDocument):
     symbol = StringField(required=True)
@@ -28,6 +30,13 @@ class Portfolio(EmbeddedDocument):
     average_buy_price = FloatField(required=True)
     current_value = FloatField()
     purchase_date = DateTimeField()
+    # Written by the portfolio valuation job (app/data_processing/portfolio.py)
+    last_price = FloatField()
+    unrealized_pnl = FloatField()
+    unrealized_pnl_pct = FloatField()
+    weight = FloatField()
+    volatility = FloatField()
+    beta = FloatField()
 
 class User(Document):
     username = StringField(required=True, unique=True)
@@ -37,10 +46,16 @@ class User(Document):
     last_login = DateTimeField()
     preferences = EmbeddedDocumentField(Preference)
     watchlist = ListField(EmbeddedDocumentField(WatchlistItem))
+    # Latest entries only, capped by app.models.history; the full history is in user_analyses
     analysis_history = ListField(EmbeddedDocumentField(AnalysisHistory))
     portfolio = ListField(EmbeddedDocumentField(Portfolio))
     risk_profile = DictField()
-    interaction_history = ListField(DictField())  # Store user interactions for personalization
+    portfolio_summary = DictField()
+    interaction_history = ListField(DictField())  # Recent user interactions for personalization; full log in user_interactions
+    # Whether the embedded histories are capped copies of the history collections. New users
+    # start that way; documents from before the collections lack the field until
+    # app.migrations.offload_user_history has copied them.
+    history_offloaded = BooleanField(default=True)
 
     meta = {
         'indexes': [
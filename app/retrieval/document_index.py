@@ -0,0 +1,102 @@
+import os
+import logging
+import threading
+from dotenv import load_dotenv
+from app.models.stock import Stock
+from app.retrieval.embeddings import TextEmbedder, chunk_text
+from app.retrieval.vector_index import IVFIndex
+
+load_dotenv()
+
+EMBEDDING_INDEX_DIR = os.getenv('EMBEDDING_INDEX_DIR', os.path.join('data', 'embeddings'))
+
+INCOME_SUMMARY_FIELDS = ['revenue', 'grossProfit', 'operatingIncome', 'ebitda', 'netIncome', 'eps', 'epsdiluted']
+BALANCE_SUMMARY_FIELDS = ['totalAssets', 'totalLiabilities', 'totalStockholdersEquity', 'cashAndCashEquivalents', 'totalDebt', 'netDebt']
+CASH_FLOW_SUMMARY_FIELDS = ['operatingCashFlow', 'capitalExpenditure', 'freeCashFlow', 'dividendsPaid', 'commonStockRepurchased']
+KEY_METRICS_SUMMARY_FIELDS = ['peRatio', 'pbRatio', 'priceToSalesRatio', 'enterpriseValueOverEBITDA', 'debtToEquity', 'currentRatio', 'roe', 'roic', 'dividendYield', 'freeCashFlowYield']
+
+def _format_value(value):
+    if isinstance(value, float):
+        for divisor, suffix in ((1e12, 'T'), (1e9, 'B'), (1e6, 'M')):
+            if abs(value) >= divisor:
+                return f"{value / divisor:.2f}{suffix}"
+        return f"{value:.4g}"
+    return str(value)
+
+def summarize_statement(symbol, label, statement, fields):
+    values = [f"{field} {_format_value(getattr(statement, field))}" for field in fields
+              if getattr(statement, field, None) is not None]
+    if not values:
+        return None
+    period = f"{statement.period} {getattr(statement, 'calendarYear', None) or statement.date.year}"
+    return f"{symbol} {label} for {period} (period ending {statement.date.date().isoformat()}): " + ", ".join(values) + "."
+
+def collect_passages(stock):
+    passages = []
+
+    for report in stock.sec_reports:
+        for i, chunk in enumerate(chunk_text(report.full_text)):
+            passages.append({
+                "symbol": stock.symbol,
+                "source": f"{report.filing_type} filing",
+                "url": report.url,
+                "chunk": i,
+                "text": chunk
+            })
+
+    sections = [
+        ("income statement", stock.income_statement, INCOME_SUMMARY_FIELDS),
+        ("balance sheet", stock.balance_sheets, BALANCE_SUMMARY_FIELDS),
+        ("cash flow statement", stock.cash_flow_statements, CASH_FLOW_SUMMARY_FIELDS),
+        ("key metrics", stock.key_metrics, KEY_METRICS_SUMMARY_FIELDS),
+    ]
+    for label, statements, fields in sections:
+        for statement in statements:
+            text = summarize_statement(stock.symbol, label, statement, fields)
+            if text:
+                passages.append({
+                    "symbol": stock.symbol,
+                    "source": label,
+                    "date": statement.date.date().isoformat(),
+                    "text": text
+                })
+
+    if stock.description:
+        passages.append({"symbol": stock.symbol, "source": "company profile", "text": stock.description})
+
+    return passages
+
+class DocumentIndex:
+    def __init__(self, path=EMBEDDING_INDEX_DIR, embedder=None):
+        self.path = path
+        self.embedder = embedder or TextEmbedder()
+        self.index = IVFIndex(path)
+        self._lock = threading.Lock()
+
+    def rebuild(self, symbols=None):
+        stocks = Stock.objects(symbol__in=symbols) if symbols else Stock.objects.all()
+        passages = []
+        for stock in stocks:
+            passages.extend(collect_passages(stock))
+
+        if not passages:
+            logging.warning("No passages found to index")
+            return 0
+
+        vectors = self.embedder.embed([p["text"] for p in passages])
+        with self._lock:
+            self.index = IVFIndex.build(self.path, vectors, passages)
+        return len(passages)
+
+    def _ensure_loaded(self):
+        # Pick up indexes rebuilt by another process (e.g. the scheduler)
+        with self._lock:
+            if self.index.is_stale():
+                self.index = IVFIndex(self.path).load()
+            return self.index
+
+    def search(self, query, symbol=None, k=5):
+        index = self._ensure_loaded()
+        if len(index) == 0:
+            return []
+        return index.search(self.embedder.embed_query(query), k=k, symbol=symbol)
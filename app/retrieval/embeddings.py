@@ -0,0 +1,80 @@
+import os
+import re
+import logging
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
+EMBEDDING_MAX_TOKENS = 256
+
+def chunk_text(text, max_words=200, overlap=40):
+    words = re.split(r'\s+', text.strip())
+    words = [w for w in words if w]
+    if not words:
+        return []
+    if len(words) <= max_words:
+        return [' '.join(words)]
+
+    chunks = []
+    step = max_words - overlap
+    for start in range(0, len(words), step):
+        chunks.append(' '.join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
+
+class TextEmbedder:
+    def __init__(self, model_name=EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._tokenizer = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # transformers and torch are only needed once something is actually embedded
+        with self._lock:
+            if self._model is None:
+                import torch
+                from transformers import AutoTokenizer, AutoModel
+                torch.set_grad_enabled(False)
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                self._model = AutoModel.from_pretrained(self.model_name)
+                self._model.eval()
+                logging.info(f"Loaded embedding model {self.model_name}")
+
+    @property
+    def dimension(self):
+        self._load()
+        return self._model.config.hidden_size
+
+    def embed(self, texts):
+        self._load()
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            encoded = self._tokenizer(batch, padding=True, truncation=True,
+                                      max_length=EMBEDDING_MAX_TOKENS, return_tensors='pt')
+            output = self._model(**encoded)
+
+            # Mean pooling over the non-padding tokens
+            token_embeddings = output.last_hidden_state.numpy()
+            mask = encoded['attention_mask'].numpy()[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            vectors.append(pooled.astype(np.float32))
+
+        return normalize(np.vstack(vectors))
+
+    def embed_query(self, text):
+        return self.embed([text])[0]
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
@@ -0,0 +1,137 @@
+import os
+import json
+import shutil
+import logging
+import numpy as np
+
+ASSIGN_CHUNK_SIZE = 65536
+
+def _assign(vectors, centroids):
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE):
+        block = vectors[start:start + ASSIGN_CHUNK_SIZE]
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+def train_centroids(vectors, n_lists, iterations=10, sample_size=20000, seed=42):
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    else:
+        sample = np.asarray(vectors)
+
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_lists)
+        # Re-seed empty lists with random samples so every list stays usable
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.clip(norms, 1e-12, None)).astype(np.float32)
+    return centroids
+
+# Inverted-file index over normalized vectors, stored as memory-mapped .npy files.
+# Vectors are sorted by list so that probing a list reads one contiguous slice.
+class IVFIndex:
+    def __init__(self, path):
+        self.path = path
+        self.centroids = None
+        self.offsets = None
+        self.vectors = None
+        self.passages = []
+        self.symbols = None
+        self.loaded_mtime = None
+
+    @staticmethod
+    def build(path, vectors, passages, n_lists=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) != len(passages):
+            raise ValueError("vectors and passages must have the same length")
+        if len(vectors) == 0:
+            raise ValueError("Cannot build an index without vectors")
+
+        if n_lists is None:
+            n_lists = int(np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, 1024, len(vectors)))
+
+        centroids = train_centroids(vectors, n_lists)
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))]).astype(np.int64)
+
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        stored = np.lib.format.open_memmap(os.path.join(tmp_path, 'vectors.npy'), mode='w+',
+                                           dtype=np.float32, shape=vectors.shape)
+        stored[:] = vectors[order]
+        stored.flush()
+        del stored
+        np.save(os.path.join(tmp_path, 'centroids.npy'), centroids)
+        np.save(os.path.join(tmp_path, 'offsets.npy'), offsets)
+        with open(os.path.join(tmp_path, 'passages.jsonl'), 'w') as f:
+            for i in order:
+                f.write(json.dumps(passages[i]) + '\n')
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({"count": len(vectors), "dimension": vectors.shape[1], "n_lists": n_lists}, f)
+
+        # Swap the new index in; readers holding the old memmap keep a valid mapping
+        old_path = f"{path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+        logging.info(f"Built vector index at {path} with {len(vectors)} vectors in {n_lists} lists")
+        return IVFIndex(path).load()
+
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def exists(self):
+        return os.path.exists(self._meta_path())
+
+    def is_stale(self):
+        return self.exists() and os.path.getmtime(self._meta_path()) != self.loaded_mtime
+
+    def load(self):
+        self.loaded_mtime = os.path.getmtime(self._meta_path())
+        self.centroids = np.load(os.path.join(self.path, 'centroids.npy'))
+        self.offsets = np.load(os.path.join(self.path, 'offsets.npy'))
+        self.vectors = np.load(os.path.join(self.path, 'vectors.npy'), mmap_mode='r')
+        with open(os.path.join(self.path, 'passages.jsonl')) as f:
+            self.passages = [json.loads(line) for line in f]
+        self.symbols = np.array([p.get('symbol') or '' for p in self.passages])
+        return self
+
+    def __len__(self):
+        return len(self.passages)
+
+    def search(self, query, k=5, n_probe=8, symbol=None):
+        if self.vectors is None or len(self.passages) == 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        n_probe = min(n_probe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        candidates = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+
+        if symbol:
+            candidates = candidates[self.symbols[candidates] == symbol]
+            if len(candidates) < k:
+                # Per-symbol slices are small, so scanning all of them is still cheap
+                candidates = np.flatnonzero(self.symbols == symbol)
+        if len(candidates) == 0:
+            return []
+
+        scores = self.vectors[candidates] @ query
+        top = min(k, len(candidates))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [dict(self.passages[candidates[i]], score=float(scores[i])) for i in best]
@@ -0,0 +1,6 @@
+import logging
+from app.scheduler.jobs import run_scheduler
+
+# python -m app.scheduler
+logging.basicConfig(level=logging.INFO)
+run_scheduler()
@@ -1,8 +1,25 @@
+import os
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+from app.database.mongodb import ensure_db
 from app.data_retrieval.stock_api import fetch_stock_data
 from app.models.stock import Stock
+from app.retrieval.document_index import DocumentIndex
+from app.assistant.sessions import ChatSessionManager
+from app.assistant.assistant import default_client
+from app.data_processing.portfolio import value_portfolios
+from app.data_retrieval.prefetcher import prefetch
+from app.data_retrieval.stock_data_manager import MAX_BATCH_SYMBOLS, SUMMARY_MAX_AGE
+from app.services import get_stock_data_manager
+from datetime import datetime, timedelta
 import logging
 
+# US market open, America/New_York
+MARKET_OPEN = datetime(2000, 1, 3, 9, 30)
+# The last prefetch pass runs this long before the open, so the summaries it refreshes
+# (fresh for SUMMARY_MAX_AGE) are still warm for the first loads of the day
+PREFETCH_LEAD = timedelta(minutes=int(os.getenv('PREFETCH_LEAD_MINUTES', '10')))
+
 def update_all_stocks():
     stocks = Stock.objects.all()
     for stock in stocks:
@@ -11,6 +28,8 @@ def update_all_stocks():
             logging.info(f"Updated data for {stock.symbol}")
         except Exception as e:
             logging.error(f"Failed to update {stock.symbol}: {str(e)}")
+    recompute_all_indicators()
+    value_all_portfolios()
 
 def update_specific_stock(symbol):
     try:
@@ -19,7 +38,74 @@ def update_specific_stock(symbol):
     except Exception as e:
         logging.error(f"Failed to update {symbol}: {str(e)}")
 
+def rebuild_document_index():
+    try:
+        count = DocumentIndex().rebuild()
+        logging.info(f"Rebuilt document index with {count} passages")
+    except Exception as e:
+        logging.error(f"Failed to rebuild document index: {str(e)}")
+
+def expire_chat_sessions():
+    try:
+        ChatSessionManager(default_client()).expire_idle()
+    except Exception as e:
+        logging.error(f"Failed to expire chat sessions: {str(e)}")
+
+# Only symbols with new bars are recomputed; each batch is spread across the process pool
+def recompute_all_indicators():
+    try:
+        manager = get_stock_data_manager()
+        symbols = Stock._get_collection().distinct('symbol')
+        for start in range(0, len(symbols), MAX_BATCH_SYMBOLS):
+            manager.get_technical_indicators(symbols[start:start + MAX_BATCH_SYMBOLS])
+    except Exception as e:
+        logging.error(f"Failed to recompute technical indicators: {str(e)}")
+
+def value_all_portfolios():
+    try:
+        value_portfolios()
+    except Exception as e:
+        logging.error(f"Failed to value portfolios: {str(e)}")
+
+def prefetch_demanded_stocks():
+    try:
+        result = prefetch(get_stock_data_manager())
+        logging.info(f"Prefetched {result['symbols']} symbols, {len(result['failed'])} failed")
+    except Exception as e:
+        logging.error(f"Failed to prefetch stocks: {str(e)}")
+
+# Warm watched and held symbols ahead of the open: the first pass does the slow work (metrics,
+# indicators), the last one re-reads it cheaply and refreshes the summaries that went stale since
+def prefetch_times():
+    first = MARKET_OPEN.replace(hour=int(os.getenv('PREFETCH_HOUR', '8')), minute=int(os.getenv('PREFETCH_MINUTE', '30')))
+    last = MARKET_OPEN - PREFETCH_LEAD
+    if PREFETCH_LEAD >= SUMMARY_MAX_AGE:
+        logging.warning("PREFETCH_LEAD_MINUTES is not under SUMMARY_MAX_AGE; prefetched summaries are stale at the open")
+    return sorted({first, last}) if first < last else [last]
+
+def add_jobs(scheduler):
+    scheduler.add_job(update_all_stocks, 'interval', minutes=60)  # Update every 5 minutes
+    scheduler.add_job(rebuild_document_index, 'cron', hour=2)
+    scheduler.add_job(expire_chat_sessions, 'interval', minutes=10)
+    for at in prefetch_times():
+        scheduler.add_job(prefetch_demanded_stocks, 'cron', day_of_week='mon-fri', hour=at.hour, minute=at.minute,
+                          timezone='America/New_York')
+    scheduler.add_job(value_all_portfolios, 'interval', minutes=int(os.getenv('PORTFOLIO_VALUATION_MINUTES', '5')))
+
 def init_scheduler():
+    ensure_db()
     scheduler = BackgroundScheduler()
-    scheduler.add_job(update_all_stocks, 'interval', minutes=60)  # Update every 5 minutes
-    scheduler.start()
\ No newline at end of file
+    add_jobs(scheduler)
+    scheduler.start()
+    return scheduler
+
+# Dedicated scheduler process; run exactly one per deployment
+def run_scheduler():
+    ensure_db()
+    scheduler = BlockingScheduler()
+    add_jobs(scheduler)
+    logging.info("Starting scheduler")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logging.info("Scheduler stopped")
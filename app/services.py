@@ -0,0 +1,84 @@
+import os
+import logging
+import threading
+import markdown2
+from app.database.mongodb import ensure_db
+from app.data_retrieval.stock_data_manager import StockDataManager
+from app.assistant.assistant import StockAnalysisAssistant
+from app.assistant.report_cache import ReportCache
+from app.retrieval.document_index import DocumentIndex
+from app.tasks.queue import JobQueue
+from app.data_retrieval.quote_streamer import QuoteStreamer
+
+# Shared components are built on first use rather than at import, so importing the app
+# (tests, CLI tools, every server worker) does not connect to Mongo or call OpenAI.
+_lock = threading.RLock()
+_instances = {}
+
+def _get(name, factory):
+    instance = _instances.get(name)
+    if instance is None:
+        # Re-entrant: building the report cache builds the assistant and the job queue
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = factory()
+    return instance
+
+def get_stock_data_manager():
+    return _get('stock_data_manager', StockDataManager)
+
+def get_document_index():
+    return _get('document_index', DocumentIndex)
+
+def _create_stock_assistant():
+    # Load the assistant ID from an environment variable or create a new one
+    assistant_id = os.getenv('STOCK_ASSISTANT_ID')
+    if assistant_id:
+        assistant = StockAnalysisAssistant(get_stock_data_manager(), assistant_id=assistant_id, document_index=get_document_index())
+        logging.info(f"Loaded existing assistant with ID: {assistant_id}")
+    else:
+        assistant = StockAnalysisAssistant(get_stock_data_manager(), document_index=get_document_index())
+        logging.info(f"Created new assistant with ID: {assistant.assistant.id}")
+        # You might want to save this ID for future use, e.g., to an environment variable
+    return assistant
+
+def get_stock_assistant():
+    return _get('stock_assistant', _create_stock_assistant)
+
+def get_assistant_id():
+    return os.getenv('STOCK_ASSISTANT_ID') or get_stock_assistant().assistant.id
+
+def run_analyze_stock_job(symbol, force_refresh=False):
+    html_content = get_report_cache().get_report(symbol, force_refresh=force_refresh)
+    if not html_content:
+        raise Exception(f"Failed to generate analysis for {symbol}")
+    return {"symbol": symbol, "analysis": html_content}
+
+def run_chat_job(stock, message, conversation_history=None, conversation_id=None):
+    response = get_stock_assistant().process_stock_conversation(stock, message, conversation_history or [], conversation_id)
+    return {"message": markdown2.markdown(response), "conversation_id": conversation_id}
+
+def run_full_report_job(filing_type, symbol):
+    report = get_stock_data_manager().get_full_report(filing_type, symbol)
+    if isinstance(report, dict) and "error" in report:
+        raise Exception(report["error"])
+    return {"symbol": symbol, "filing_type": filing_type, "text": report}
+
+def _create_job_queue():
+    ensure_db()
+    job_queue = JobQueue()
+    job_queue.register('analyze_stock', run_analyze_stock_job)
+    job_queue.register('chat', run_chat_job)
+    job_queue.register('full_report', run_full_report_job)
+    job_queue.recover()
+    return job_queue
+
+def get_job_queue():
+    return _get('job_queue', _create_job_queue)
+
+def get_report_cache():
+    return _get('report_cache', lambda: ReportCache(get_stock_assistant(), get_job_queue()))
+
+def get_quote_streamer():
+    return _get('quote_streamer', QuoteStreamer)
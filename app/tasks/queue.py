@@ -0,0 +1,123 @@
+import os
+import json
+import uuid
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from mongoengine.errors import NotUniqueError
+from mongoengine.queryset.visitor import Q
+from app.models.job import Job
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_STALE_MINUTES = int(os.getenv('JOB_STALE_MINUTES', '30'))
+# Running jobs are touched this often; one whose heartbeat is JOB_STALE_MINUTES old has lost its process
+JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', '60'))
+SUBMIT_ATTEMPTS = 3
+
+def job_dedupe_key(kind, params):
+    payload = json.dumps({"kind": kind, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class JobQueue:
+    def __init__(self, max_workers=JOB_WORKERS):
+        self.handlers = {}
+        # The pool bounds concurrency; the queue itself lives in Mongo and survives restarts
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+        self._running = set()
+        self._lock = threading.Lock()
+        self._heartbeat = None
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def submit(self, kind, params):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        dedupe_key = job_dedupe_key(kind, params)
+        existing = Job.objects(active_key=dedupe_key).first()
+        if existing:
+            logging.info(f"Reusing in-flight {kind} job {existing.job_id}")
+            return existing
+
+        job = Job(job_id=uuid.uuid4().hex, kind=kind, params=params, dedupe_key=dedupe_key, active_key=dedupe_key)
+        for _ in range(SUBMIT_ATTEMPTS):
+            try:
+                job.save()
+                break
+            except NotUniqueError:
+                # An identical job was submitted at the same moment; it may also have finished since
+                existing = Job.objects(active_key=dedupe_key).first()
+                if existing:
+                    return existing
+        else:
+            # Identical jobs keep finishing as fast as they are submitted; the latest one answers this
+            return Job.objects(dedupe_key=dedupe_key).order_by('-created_at').first()
+
+        self._executor.submit(self._run, job.job_id)
+        return job
+
+    def get(self, job_id):
+        return Job.objects(job_id=job_id).first()
+
+    def _run(self, job_id):
+        now = datetime.now(timezone.utc)
+        # Atomic claim: with several web processes sharing the queue, only one runs a job
+        job = Job.objects(job_id=job_id, status='queued').modify(
+            set__status='running', set__started_at=now, set__heartbeat_at=now, inc__attempts=1, new=True)
+        if job is None:
+            return
+
+        self._track(job.job_id)
+        try:
+            result = self.handlers[job.kind](**job.params)
+            Job.objects(id=job.id).update_one(
+                set__status='succeeded', set__result=result,
+                set__finished_at=datetime.now(timezone.utc), unset__active_key=True)
+            logging.info(f"Job {job.job_id} ({job.kind}) succeeded")
+        except Exception as e:
+            logging.error(f"Job {job.job_id} ({job.kind}) failed: {str(e)}", exc_info=True)
+            Job.objects(id=job.id).update_one(
+                set__status='failed', set__error=str(e),
+                set__finished_at=datetime.now(timezone.utc), unset__active_key=True)
+        finally:
+            with self._lock:
+                self._running.discard(job.job_id)
+
+    def _track(self, job_id):
+        with self._lock:
+            self._running.add(job_id)
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+                self._heartbeat.start()
+
+    # Keeps the jobs this process is running from looking abandoned to recover()
+    def _beat(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                Job.objects(job_id__in=running, status='running').update(set__heartbeat_at=datetime.now(timezone.utc))
+            except Exception as e:
+                logging.error(f"Failed to record job heartbeat: {str(e)}")
+
+    def recover(self):
+        # Jobs whose process stopped sending heartbeats (it died) are put back in the queue;
+        # long jobs in a live process keep theirs fresh and are left alone
+        stale = datetime.now(timezone.utc) - timedelta(minutes=JOB_STALE_MINUTES)
+        Job.objects(Q(status='running') & (Q(heartbeat_at__lt=stale) | Q(heartbeat_at=None, started_at__lt=stale))) \
+            .update(set__status='queued')
+
+        pending = Job.objects(status='queued').order_by('created_at').only('job_id')
+        for job in pending:
+            self._executor.submit(self._run, job.job_id)
+        return pending.count()
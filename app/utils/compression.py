@@ -0,0 +1,46 @@
+import os
+import gzip
+from dotenv import load_dotenv
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+load_dotenv()
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/html', 'text/css', 'text/csv', 'application/javascript'}
+
+def choose_encoding(accept_encodings):
+    # Brotli when the client takes it and the module is installed, otherwise gzip
+    candidates = ['br', 'gzip'] if brotli else ['gzip']
+    best = max(candidates, key=lambda encoding: accept_encodings[encoding])
+    return best if accept_encodings[best] > 0 else None
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def is_compressible(response):
+    # Streams (SSE chat) must reach the client chunk by chunk, so they are never buffered here
+    return (response.mimetype in COMPRESSIBLE_MIMETYPES
+            and response.status_code == 200
+            and 'Content-Encoding' not in response.headers)
+
+def compress_response(response, request):
+    if response.mimetype in COMPRESSIBLE_MIMETYPES:
+        response.vary.add('Accept-Encoding')
+    if not is_compressible(response) or response.is_streamed or response.direct_passthrough:
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if not encoding or response.content_length is None or response.content_length < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
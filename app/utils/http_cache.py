@@ -0,0 +1,121 @@
+import os
+import hashlib
+import functools
+from datetime import timezone, timedelta
+from flask import request, jsonify, make_response, Response
+from dotenv import load_dotenv
+from app.data_retrieval.stock_data_manager import SUMMARY_MAX_AGE, KEY_METRICS_MAX_AGE, is_stale, parse_symbols
+from app.data_retrieval.sec_scraper import FILING_TYPES
+from app.data_retrieval.stock_api import STATEMENT_SOURCES
+from app.models.stock import Stock
+
+load_dotenv()
+
+# Cache-Control max-age (seconds) handed to browsers and proxies, per kind of data
+CACHE_MAX_AGE = {
+    'summary': int(os.getenv('SUMMARY_CACHE_SECONDS', '60')),
+    'statement': int(os.getenv('STATEMENT_CACHE_SECONDS', '3600')),
+    'key_metrics': int(os.getenv('KEY_METRICS_CACHE_SECONDS', '3600')),
+    'report': int(os.getenv('REPORT_CACHE_SECONDS', '86400')),
+}
+
+# How long the server trusts a stored dataset without going upstream; a 304 is only
+# answered from stored versions inside this window. Stored filings never change.
+SERVER_MAX_AGE = {
+    'summary': SUMMARY_MAX_AGE,
+    'statement': timedelta(days=1),
+    'key_metrics': KEY_METRICS_MAX_AGE,
+    'report': None,
+}
+
+def dataset_name(kind, view_args):
+    # None for unknown statement or filing types, which are answered with an error anyway
+    if kind == 'statement':
+        return view_args['statement_type'] if view_args['statement_type'] in STATEMENT_SOURCES else None
+    if kind == 'report':
+        form_type = FILING_TYPES.get(view_args['filing_type'].lower())
+        return f"report_{form_type}" if form_type else None
+    return kind
+
+def request_symbols(view_args, args):
+    if 'symbol' in view_args:
+        return [view_args['symbol']]
+    return parse_symbols(args.get('symbols'))
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+# One validator for the whole response: None unless every symbol has a stored version
+def combine_versions(entries):
+    if not entries or any(entry is None for entry in entries):
+        return None
+    if len(entries) == 1:
+        etag = entries[0]['etag']
+    else:
+        etag = hashlib.sha1(':'.join(entry['etag'] for entry in entries).encode()).hexdigest()[:16]
+    return etag, max(_utc(entry['modified']) for entry in entries)
+
+def is_fresh(entries, kind):
+    max_age = SERVER_MAX_AGE[kind]
+    return max_age is None or not any(is_stale(entry.get('checked'), max_age) for entry in entries)
+
+def is_not_modified(req, etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if req.if_none_match:
+        return req.if_none_match.contains_weak(etag)
+    if req.if_modified_since:
+        return last_modified.replace(microsecond=0) <= req.if_modified_since
+    return False
+
+def apply_validators(response, kind, validators):
+    response.cache_control.public = True
+    response.cache_control.max_age = CACHE_MAX_AGE[kind]
+    if validators:
+        etag, last_modified = validators
+        # Weak: the same version is served gzip-, brotli- or un-encoded
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+    return response
+
+def is_error(data):
+    return isinstance(data, dict) and "error" in data
+
+def load_versions(symbols, dataset):
+    docs = Stock._get_collection().find({'symbol': {'$in': symbols}}, {'symbol': 1, f'data_versions.{dataset}': 1})
+    versions = {doc['symbol']: (doc.get('data_versions') or {}).get(dataset) for doc in docs}
+    return [versions.get(symbol) for symbol in symbols]
+
+def data_response(data):
+    # Views return ready-made responses (with a status) for bad requests
+    if isinstance(data, (Response, tuple)):
+        return data
+    if isinstance(data, str):
+        return Response(data, mimetype='text/plain')
+    return jsonify(data)
+
+# Wraps a view that returns plain data (dict, list or text). Requests whose validators match a
+# fresh stored version get a 304 before the view runs; other successful responses carry
+# ETag/Last-Modified from the stored versions plus a Cache-Control max-age for `kind`.
+def conditional_view(kind):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**view_args):
+            symbols = request_symbols(view_args, request.args)
+            dataset = dataset_name(kind, view_args)
+            if not symbols or dataset is None:
+                return data_response(view(**view_args))
+
+            if request.if_none_match or request.if_modified_since:
+                entries = load_versions(symbols, dataset)
+                validators = combine_versions(entries)
+                if validators and is_fresh(entries, kind) and is_not_modified(request, *validators):
+                    return apply_validators(make_response('', 304), kind, validators)
+
+            data = view(**view_args)
+            response = data_response(data)
+            if response is data or is_error(data) or (isinstance(data, dict) and any(is_error(value) for value in data.values())):
+                return response
+            # The view may have refreshed the data, so read the versions it left behind
+            return apply_validators(response, kind, combine_versions(load_versions(symbols, dataset)))
+        return wrapper
+    return decorator
@@ -0,0 +1,35 @@
+import orjson
+from flask.json.provider import JSONProvider
+
+# Naive datetimes from Mongo are UTC; numpy values from the analytics code serialize as-is
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _default(value):
+    # ObjectId, Decimal128, Markup and anything else orjson has no native encoding for
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    return str(value)
+
+def dumps_bytes(obj, indent=False):
+    option = (ORJSON_OPTIONS | orjson.OPT_INDENT_2) if indent else ORJSON_OPTIONS
+    return orjson.dumps(obj, default=_default, option=option)
+
+# Shared by the Flask and Quart providers, which only differ in their base class
+class OrjsonProviderMixin:
+    compact = None
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj, indent=bool(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # orjson produces bytes directly, skipping the str round trip of the default provider
+        return self._app.response_class(dumps_bytes(obj, indent), mimetype=self.mimetype)
+
+class OrjsonProvider(OrjsonProviderMixin, JSONProvider):
+    pass
@@ -0,0 +1,154 @@
+import os
+import atexit
+import asyncio
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# CPU-bound stages (indicator math, HTML-to-text, document parsing, backtest sweeps) run here
+# instead of in request or scheduler threads, where they would serialize on the GIL.
+# PROCESS_POOL_WORKERS=0 runs everything inline, e.g. for debugging.
+PROCESS_POOL_WORKERS = int(os.getenv('PROCESS_POOL_WORKERS', str(os.cpu_count() or 1)))
+# Workers come from a clean server process rather than a fork of a threaded web or scheduler
+# process holding sockets and Mongo clients
+START_METHOD = os.getenv('PROCESS_POOL_START_METHOD',
+                         'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+_lock = threading.Lock()
+_pool = None
+
+def new_process_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(START_METHOD))
+
+# Shared by the web app, scheduler jobs and batch endpoints; started on first use
+def get_process_pool():
+    global _pool
+    if PROCESS_POOL_WORKERS < 1:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = new_process_pool(PROCESS_POOL_WORKERS)
+            logging.info(f"Started process pool with {PROCESS_POOL_WORKERS} workers ({START_METHOD})")
+        return _pool
+
+def shutdown_process_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+atexit.register(shutdown_process_pool)
+
+def _reset_broken_pool(pool):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+
+def submit(fn, *args, **kwargs):
+    pool = get_process_pool()
+    if pool is None:
+        return _completed(fn, *args, **kwargs)
+    try:
+        return pool.submit(fn, *args, **kwargs)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); start a fresh pool once
+        _reset_broken_pool(pool)
+        return get_process_pool().submit(fn, *args, **kwargs)
+
+def _completed(fn, *args, **kwargs):
+    future = Future()
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def run_in_pool(fn, *args, **kwargs):
+    return submit(fn, *args, **kwargs).result()
+
+async def run_in_pool_async(fn, *args, **kwargs):
+    return await asyncio.wrap_future(submit(fn, *args, **kwargs))
+
+def map_in_pool(fn, *iterables, chunksize=1):
+    pool = get_process_pool()
+    if pool is None:
+        return list(map(fn, *iterables))
+    return list(pool.map(fn, *iterables, chunksize=chunksize))
+
+# Copies arrays into shared memory once; tasks receive the small, picklable `handles` and
+# map the same memory with attach_arrays() instead of unpickling a copy per task.
+#
+#   with SharedArrays({'close': close}) as shared:
+#       map_in_pool(work, repeat(shared.handles), chunks)
+class SharedArrays:
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.handles = {}
+        self._segments = []
+
+    def __enter__(self):
+        for name, array in self.arrays.items():
+            array = np.ascontiguousarray(array)
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._segments.append(segment)
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+            view[...] = array
+            _owned[segment.name] = view
+            self.handles[name] = (segment.name, array.shape, array.dtype.str)
+        return self
+
+    def __exit__(self, *exc):
+        for segment in self._segments:
+            _owned.pop(segment.name, None)
+            segment.unlink()
+            try:
+                segment.close()
+            except BufferError:
+                # An inline caller still holds a view; the mapping goes with it
+                pass
+        self._segments = []
+
+# Worker side: segments stay mapped across tasks that share them; the oldest are released
+# once a worker has seen more than MAX_ATTACHED of them
+MAX_ATTACHED = 16
+_attached = OrderedDict()
+# Segments created by this process, so inline runs (no pool) read them directly
+_owned = {}
+
+def _attach(name):
+    segment = _attached.get(name)
+    if segment is None:
+        # Workers share the parent's resource tracker, so attaching registers nothing new;
+        # the creating SharedArrays unlinks the segment
+        segment = shared_memory.SharedMemory(name=name)
+        _attached[name] = segment
+        while len(_attached) > MAX_ATTACHED:
+            _, old = _attached.popitem(last=False)
+            try:
+                old.close()
+            except BufferError:
+                pass
+    else:
+        _attached.move_to_end(name)
+    return segment
+
+def attach_arrays(handles):
+    arrays = {}
+    for key, (name, shape, dtype) in handles.items():
+        if name in _owned:
+            array = _owned[name].view()
+        else:
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_attach(name).buf)
+        array.flags.writeable = False
+        arrays[key] = array
+    return arrays
@@ -0,0 +1,70 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+class TTLCache:
+    def __init__(self, ttl_seconds, maxsize=1024):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < now:
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key, default=None):
+        with self._lock:
+            hit, value = self._get_locked(key, time.monotonic())
+        return value if hit else default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def get_or_compute(self, key, compute, should_cache=None):
+        # Concurrent callers asking for the same missing key share a single computation
+        with self._lock:
+            hit, value = self._get_locked(key, time.monotonic())
+            if hit:
+                return value
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+            if should_cache is None or should_cache(value):
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
@@ -0,0 +1,200 @@
+import argparse
+import fnmatch
+import functools
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+# Times the analytics hot paths (every indicator, the per-symbol indicator set, the batch
+# indicator path and summary assembly) on deterministic synthetic OHLCV, from 250 to 100k
+# bars per series and from 1 to 5,000 symbols, and compares against a stored baseline so
+# optimizations show up as numbers and regressions fail review:
+#
+#   python benchmarks/analytics_benchmark.py                      # report and compare with the baseline
+#   python benchmarks/analytics_benchmark.py --save               # record a new baseline
+#   python benchmarks/analytics_benchmark.py --fail-over 25       # exit 1 if any case is 25% slower
+#   python benchmarks/analytics_benchmark.py 'calculate_rsi*' 'calculate_indicators_batch*'
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'analytics_baseline.json')
+sys.path.insert(0, ROOT)
+
+from app.backtesting.data import synthetic_prices
+from app.data_processing import technical_indicators as ti
+from app.data_processing.stock_analysis import (
+    calculate_moving_average, calculate_rsi, calculate_indicators, calculate_indicators_batch, BAR_FIELDS,
+    PARALLEL_MIN_SYMBOLS
+)
+from app.data_retrieval.stock_data_manager import build_stock_summary, SUMMARY_FIELDS, QUOTE_SUMMARY_FIELDS
+from app.utils.process_pool import PROCESS_POOL_WORKERS
+
+SERIES_BARS = [250, 1_000, 10_000, 100_000]
+BATCH_SYMBOLS = [1, 10, 100, 1_000, 5_000]
+# Bars per symbol in the batch cases: about a year of daily history, as stored
+BATCH_BARS = 250
+SUMMARY_SYMBOLS = [1, 100, 1_000, 5_000]
+
+INDICATORS = {
+    'calculate_moving_average': lambda s: calculate_moving_average(s['close'], 200),
+    'calculate_rsi': lambda s: calculate_rsi(s['close']),
+    'calculate_ema': lambda s: ti.calculate_ema(s['close'], 20),
+    'calculate_macd': lambda s: ti.calculate_macd(s['close']),
+    'calculate_bollinger_bands': lambda s: ti.calculate_bollinger_bands(s['close']),
+    'calculate_stochastic_oscillator': lambda s: ti.calculate_stochastic_oscillator(s['close'], s['low'], s['high']),
+    'calculate_atr': lambda s: ti.calculate_atr(s['high'], s['low'], s['close']),
+    'calculate_obv': lambda s: ti.calculate_obv(s['close'], s['volume']),
+    'calculate_indicators': lambda s: calculate_indicators(s['close'], s['high'], s['low'], s['volume']),
+    # get_stock_summary hands the indicators lists built from the stored bars
+    'calculate_indicators_lists': lambda s: calculate_indicators(*(s[f'{field}_list'] for field in BAR_FIELDS)),
+}
+
+@functools.lru_cache(maxsize=1)
+def series(bars, seed):
+    prices = synthetic_prices(1, bars, seed=seed)
+    values = {field: prices[field][0] for field in BAR_FIELDS}
+    values.update({f'{field}_list': values[field].tolist() for field in BAR_FIELDS})
+    return values
+
+def fundamentals_inputs(symbols, seed):
+    rng = np.random.default_rng(seed)
+    columns = [rng.uniform(low, high, symbols).tolist() for low, high in
+               [(5, 60), (-20, 40), (0, 5e10), (-1e9, 2e10), (-1e9, 1e10), (0, 1e9), (1e9, 1e11)]]
+    histories = rng.uniform(0.5, 3.0, (symbols, 6)).tolist()
+    return list(zip(*columns, histories))
+
+def run_fundamentals(inputs):
+    for pe, growth, debt, ebitda, income, dividends, equity, history in inputs:
+        ti.calculate_peg_ratio(pe, growth)
+        ti.calculate_debt_to_ebitda(debt, ebitda)
+        ti.calculate_roic(income, dividends, debt, equity)
+        ti.calculate_dividend_growth_rate(history, len(history) - 1)
+
+# Bar dicts, as get_technical_indicators reads them from Mongo
+def bar_lists(symbols, bars, seed):
+    prices = synthetic_prices(symbols, bars, seed=seed)
+    columns = [prices[field].tolist() for field in BAR_FIELDS]
+    return [[dict(zip(BAR_FIELDS, values)) for values in zip(*(column[row] for column in columns))]
+            for row in range(symbols)]
+
+# Shaped like the documents load_stock_docs() reads for /api/stock_summary
+def summary_docs(symbols, seed):
+    prices = synthetic_prices(symbols, 2, seed=seed)
+    now = datetime(2024, 6, 3, 20, 0)
+    docs = []
+    for i, symbol in enumerate(prices.symbols):
+        doc = {field: f'{field} of {symbol}' for field in SUMMARY_FIELDS}
+        doc.update(symbol=symbol, isActivelyTrading=True, ipoDate=now - timedelta(days=3650 + i), last_updated=now)
+        quote = {field: float(prices['close'][i, -1]) * (1 + n / 100) for n, field in enumerate(QUOTE_SUMMARY_FIELDS)}
+        quote.update(volume=int(prices['volume'][i, -1]), avgVolume=int(prices['volume'][i, 0]),
+                     earningsAnnouncement=now + timedelta(days=30), timestamp=now)
+        doc['real_time_quote'] = quote
+        docs.append(doc)
+    return docs
+
+def build_summaries(docs):
+    return [build_stock_summary(doc) for doc in docs]
+
+# (name, setup) pairs; setup builds the inputs and returns the callable to time, so a
+# filtered run only pays for the cases it selects
+def case_table(seed):
+    table = []
+    for bars in SERIES_BARS:
+        for name, fn in INDICATORS.items():
+            table.append((f'{name}[bars={bars}]', lambda fn=fn, bars=bars: functools.partial(fn, series(bars, seed))))
+    for symbols in BATCH_SYMBOLS:
+        table.append((f'fundamentals[symbols={symbols}]',
+                      lambda symbols=symbols: functools.partial(run_fundamentals, fundamentals_inputs(symbols, seed))))
+    for symbols in BATCH_SYMBOLS:
+        table.append((f'calculate_indicators_batch[symbols={symbols},bars={BATCH_BARS}]',
+                      lambda symbols=symbols: functools.partial(calculate_indicators_batch, bar_lists(symbols, BATCH_BARS, seed))))
+    for symbols in SUMMARY_SYMBOLS:
+        table.append((f'build_stock_summary[symbols={symbols}]',
+                      lambda symbols=symbols: functools.partial(build_summaries, summary_docs(symbols, seed))))
+    return table
+
+# Repeats a case until it has run for `min_time` (at least once, at most `max_rounds` times)
+def measure(fn, min_time, max_rounds):
+    timings = []
+    started = time.perf_counter()
+    while not timings or (len(timings) < max_rounds and time.perf_counter() - started < min_time):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        'rounds': len(timings),
+        'min_ms': min(timings) * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+    }
+
+# One-off costs stay out of the first case that would hit them: the indicators import pandas
+# on use, and the process pool starts its workers on first submit
+def warm_up(seed, batch):
+    import pandas
+    if batch and PROCESS_POOL_WORKERS >= 1:
+        calculate_indicators_batch(bar_lists(PARALLEL_MIN_SYMBOLS, BATCH_BARS, seed))
+
+# Case names contain brackets, which fnmatch would read as a character class, so brackets in a
+# pattern match themselves and only * and ? are wildcards
+def selected(name, patterns):
+    return not patterns or any(fnmatch.fnmatchcase(name, pattern.replace('[', '[[]')) for pattern in patterns)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analytics hot paths on synthetic OHLCV")
+    parser.add_argument('patterns', nargs='*', help="Case names or * / ? patterns to run (default: all)")
+    parser.add_argument('--list', action='store_true', help="List the case names and exit")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--min-time', type=float, default=0.5, help="Seconds to spend repeating each case")
+    parser.add_argument('--max-rounds', type=int, default=200)
+    parser.add_argument('--save', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--output', help="Also write the results to this JSON file")
+    parser.add_argument('--fail-over', type=float, default=None,
+                        help="Exit 1 if a case's median is more than this many percent over the baseline")
+    args = parser.parse_args()
+
+    table = [(name, setup) for name, setup in case_table(args.seed) if selected(name, args.patterns)]
+    if args.list:
+        print('\n'.join(name for name, _ in table))
+        return
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    print(f"process pool workers: {PROCESS_POOL_WORKERS}, cpus: {os.cpu_count()}")
+    warm_up(args.seed, any(name.startswith('calculate_indicators_batch') for name, _ in table))
+
+    results = {}
+    regressions = []
+    for name, setup in table:
+        result = measure(setup(), args.min_time, args.max_rounds)
+        results[name] = result
+        line = f"{name:<56} {result['median_ms']:>11.3f} ms  (min {result['min_ms']:.3f}, {result['rounds']} rounds)"
+        if name in baseline:
+            change = (result['median_ms'] - baseline[name]) / baseline[name] * 100
+            line += f"  baseline {baseline[name]:.3f} ms, {change:+.0f}%"
+            if args.fail_over is not None and change > args.fail_over:
+                regressions.append(name)
+        print(line)
+
+    if regressions:
+        print(f"{len(regressions)} cases over the baseline: {', '.join(regressions)}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(dict(baseline, **{name: round(result['median_ms'], 4) for name, result in results.items()}),
+                      f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {os.path.relpath(BASELINE_PATH, ROOT)}")
+
+    if args.fail_over is not None and regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
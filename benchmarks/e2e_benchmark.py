@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+# Runs the app end to end against benchmarks/fake_upstream.py instead of FMP, EDGAR and
+# OpenAI, so every run sees the same data and the same upstream latency, and reports p50/p99
+# latency and throughput per scenario. Needs MONGODB_URI; everything goes to a scratch
+# database (DB_NAME, default stocksage_bench) that is dropped first.
+#
+#   python benchmarks/e2e_benchmark.py                         # Flask app, report only
+#   python benchmarks/e2e_benchmark.py --server asgi --save    # record a baseline
+#   python benchmarks/e2e_benchmark.py --fail-over 20          # exit 1 if any p50/p99 is 20% worse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_test import percentile, run_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'e2e_baseline.json')
+DEFAULT_SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META', 'TSLA', 'JPM', 'V', 'XOM']
+
+def app_env(upstream_url, db_name):
+    return dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        FMP_BASE_URL=f'{upstream_url}/api/v3',
+        FMP_API_KEY='bench',
+        SEC_BASE_URL=upstream_url,
+        OPENAI_BASE_URL=f'{upstream_url}/v1',
+        OPENAI_API_KEY='bench',
+        STOCK_ASSISTANT_ID='',
+        HISTORY_SOURCE='fmp',
+        # Nothing is archived, so runs do not grow data/upstream_archive
+        UPSTREAM_MODE='live',
+        DB_NAME=db_name,
+    )
+
+def start_process(command, env, ready_url, timeout=60):
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(command)} exited with {process.returncode}")
+        try:
+            httpx.get(ready_url, timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{' '.join(command)} did not come up within {timeout}s")
+
+def upstream_command(args):
+    return [sys.executable, os.path.join(ROOT, 'benchmarks', 'fake_upstream.py'), '--port', str(args.upstream_port),
+            '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+            '--error-rate', str(args.error_rate), '--chunk-delay-ms', str(args.chunk_delay_ms)]
+
+def app_command(args):
+    if args.server == 'asgi':
+        return [sys.executable, '-m', 'hypercorn', 'app.asgi:application', '--bind', f'127.0.0.1:{args.app_port}']
+    return [sys.executable, '-m', 'flask', '--app', 'app.main:app', 'run', '--port', str(args.app_port),
+            '--no-reload', '--no-debugger', '--with-threads']
+
+def scenarios(symbols, chat_requests):
+    return [
+        # name, method, paths, body, requests per symbol (None: once per path)
+        ('stock_summary_cold', 'GET', [f'/api/stock_summary/{symbol}' for symbol in symbols], None, None),
+        ('stock_summary', 'GET', [f'/api/stock_summary/{symbol}' for symbol in symbols], None, 20),
+        ('income_statement', 'GET', [f'/api/income_statement/{symbol}' for symbol in symbols], None, 10),
+        ('balance_sheet', 'GET', [f'/api/balance_sheet/{symbol}' for symbol in symbols], None, 10),
+        ('cash_flow_statement', 'GET', [f'/api/cash_flow_statement/{symbol}' for symbol in symbols], None, 10),
+        ('key_metrics', 'GET', [f'/api/key_metrics/{symbol}' for symbol in symbols], None, 10),
+        ('chat', 'POST', ['/api/chat'], {'stock': symbols[0], 'message': 'How is it doing?'}, chat_requests),
+    ]
+
+def run_http_scenarios(args, base_url, symbols):
+    results = {}
+    for name, method, paths, body, per_path in scenarios(symbols, args.chat_requests):
+        total = len(paths) * (per_path or 1)
+        result = asyncio.run(run_load(base_url, paths, method, body, min(args.concurrency, total), total, args.timeout))
+        results[name] = result
+    return results
+
+# Runs the hourly refresh in this process so the upstream fetches can be timed per symbol
+def run_update_all_stocks(env):
+    os.environ.update(env)
+    from app.database.mongodb import ensure_db
+    from app.scheduler import jobs
+    ensure_db()
+
+    latencies = []
+    fetch_stock_data = jobs.fetch_stock_data
+
+    def timed_fetch(symbol, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fetch_stock_data(symbol, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    jobs.fetch_stock_data = timed_fetch
+    try:
+        started = time.perf_counter()
+        jobs.update_all_stocks()
+        elapsed = time.perf_counter() - started
+    finally:
+        jobs.fetch_stock_data = fetch_stock_data
+
+    return {
+        "url": "update_all_stocks",
+        "requests": len(latencies),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": 0,
+    }
+
+def drop_database(db_name):
+    from pymongo import MongoClient
+    client = MongoClient(os.environ['MONGODB_URI'])
+    client.drop_database(db_name)
+    client.close()
+
+def compare(results, baseline, fail_over):
+    regressions = []
+    for name, result in results.items():
+        line = (f"{name:<22} {result['requests']:>6} req {result['throughput_rps']:>9.1f}/s "
+                f"p50 {result['p50_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms  errors {result['errors']}")
+        previous = baseline.get(name)
+        if previous:
+            changes = [(key, (result[key] - previous[key]) / previous[key] * 100)
+                       for key in ('p50_ms', 'p99_ms') if previous.get(key)]
+            line += "  (" + ", ".join(f"{key[:3]} {change:+.0f}%" for key, change in changes) + ")"
+            if fail_over is not None and any(change > fail_over for _, change in changes):
+                regressions.append(name)
+        print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency and throughput against a fake upstream")
+    parser.add_argument('--server', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--symbols', default=','.join(DEFAULT_SYMBOLS))
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--chat-requests', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--app-port', type=int, default=5100)
+    parser.add_argument('--upstream-port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=50, help="Fake upstream latency per response")
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--chunk-delay-ms', type=float, default=5, help="Delay between streamed chat chunks")
+    parser.add_argument('--db-name', default='stocksage_bench')
+    parser.add_argument('--output', help="Also write the results to this JSON file")
+    parser.add_argument('--save', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--fail-over', type=float, default=None,
+                        help="Exit 1 if a scenario's p50 or p99 is more than this many percent over the baseline")
+    args = parser.parse_args()
+
+    if not os.getenv('MONGODB_URI'):
+        parser.error("MONGODB_URI must point at a MongoDB server")
+    symbols = args.symbols.split(',')
+    upstream_url = f'http://127.0.0.1:{args.upstream_port}'
+    base_url = f'http://127.0.0.1:{args.app_port}'
+    env = app_env(upstream_url, args.db_name)
+    drop_database(args.db_name)
+
+    processes = []
+    try:
+        processes.append(start_process(upstream_command(args), env, f'{upstream_url}/__stats'))
+        processes.append(start_process(app_command(args), env, f'{base_url}/api/watchlist'))
+        results = run_http_scenarios(args, base_url, symbols)
+        results['update_all_stocks'] = run_update_all_stocks(env)
+        upstream_stats = httpx.get(f'{upstream_url}/__stats').json()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f).get(args.server, {})
+
+    print(f"{args.server} server, {len(symbols)} symbols, upstream latency {args.latency_ms:.0f} ms")
+    regressions = compare(results, baseline, args.fail_over)
+    print("upstream calls: " + ", ".join(f"{name} {count}" for name, count in sorted(upstream_stats.items())))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'server': args.server, 'results': results, 'upstream': upstream_stats}, f, indent=2)
+    if args.save:
+        saved = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as f:
+                saved = json.load(f)
+        saved[args.server] = {name: {key: round(result[key], 2) for key in ('throughput_rps', 'p50_ms', 'p99_ms')}
+                              for name, result in results.items()}
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(saved, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {os.path.relpath(BASELINE_PATH, ROOT)}")
+
+    if args.fail_over is not None and regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
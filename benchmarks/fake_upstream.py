@@ -0,0 +1,345 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import hashlib
+from collections import Counter
+from datetime import date, timedelta
+from urllib.parse import quote
+from quart import Quart, request, Response
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.stock import Stock, FinancialStatement, BalanceSheet, CashFlowStatement, KeyMetrics, RealTimeQuote
+from app.data_retrieval.fmp_parser import KEY_METRICS_ALIASES
+
+# Local stand-in for FMP, EDGAR and the OpenAI Assistants API, with deterministic data per
+# symbol and configurable latency and failure rates, so the app can be load-tested without
+# spending API quota:
+#
+#   python benchmarks/fake_upstream.py --port 9100 --latency-ms 40 --jitter-ms 20 --error-rate 0.01
+#
+#   FMP_BASE_URL=http://localhost:9100/api/v3 SEC_BASE_URL=http://localhost:9100 \
+#   OPENAI_BASE_URL=http://localhost:9100/v1 OPENAI_API_KEY=fake HISTORY_SOURCE=fmp python run.py
+#
+# GET /__stats returns request counts per route; POST /__config changes the knobs at runtime.
+
+DEFAULT_CONFIG = {
+    'latency_ms': 0.0,
+    'jitter_ms': 0.0,
+    'error_rate': 0.0,
+    'error_status': 500,
+    'seed': 42,
+    'filing_kb': 200,
+    # Assistant runs ask for one get_stock_data call before answering
+    'tool_calls': True,
+    'reply_chunks': 20,
+    'chunk_delay_ms': 5.0,
+}
+
+STATEMENT_MODELS = {
+    'income-statement': FinancialStatement,
+    'balance-sheet-statement': BalanceSheet,
+    'cash-flow-statement': CashFlowStatement,
+}
+STATEMENT_META_FIELDS = {'date', 'symbol', 'reportedCurrency', 'cik', 'fillingDate', 'acceptedDate', 'calendarYear', 'period'}
+PROFILE_TEXT = {
+    'companyName': '{symbol} Holdings Inc.', 'currency': 'USD', 'exchange': 'NASDAQ Global Select',
+    'exchangeShortName': 'NASDAQ', 'industry': 'Consumer Electronics', 'sector': 'Technology',
+    'website': 'https://example.com', 'ceo': 'Jane Doe', 'country': 'US', 'ipoDate': '1999-01-01',
+    'description': '{symbol} designs, manufactures and markets things.', 'range': '100.0-200.0',
+}
+
+def rng_for(seed, *parts):
+    return random.Random(hashlib.sha256(':'.join(map(str, (seed,) + parts)).encode()).digest())
+
+def cik_for(symbol):
+    return str(int(hashlib.sha256(symbol.encode()).hexdigest(), 16) % 10**10).zfill(10)
+
+def quarter_ends(count, step_months):
+    # Most recent first, ending at the last quarter end before today
+    today = date.today()
+    month = ((today.month - 1) // 3) * 3
+    year = today.year if month else today.year - 1
+    month = month or 12
+    ends = []
+    for _ in range(count):
+        next_month = date(year + month // 12, month % 12 + 1, 1)
+        ends.append(next_month - timedelta(days=1))
+        month -= step_months
+        while month <= 0:
+            month += 12
+            year -= 1
+    return ends
+
+def statement_records(seed, endpoint, symbol, period, limit):
+    model = KeyMetrics if endpoint == 'key-metrics' else STATEMENT_MODELS[endpoint]
+    aliases = KEY_METRICS_ALIASES if model is KeyMetrics else {}
+    records = []
+    for i, end in enumerate(quarter_ends(limit, 12 if period == 'annual' else 3)):
+        rng = rng_for(seed, endpoint, symbol, period, end)
+        record = {
+            'date': end.isoformat(),
+            'symbol': symbol,
+            'reportedCurrency': 'USD',
+            'cik': cik_for(symbol),
+            'fillingDate': (end + timedelta(days=30)).isoformat(),
+            'acceptedDate': f"{(end + timedelta(days=30)).isoformat()} 18:04:43",
+            'calendarYear': str(end.year),
+            'period': 'FY' if period == 'annual' else f"Q{(end.month - 1) // 3 + 1}",
+        }
+        for name in model._fields:
+            if name in STATEMENT_META_FIELDS or name == 'id':
+                continue
+            record[aliases.get(name, name)] = round(rng.uniform(-1e9, 5e10), 2) if 'ratio' not in name.lower() else round(rng.uniform(0, 1), 4)
+        records.append(record)
+    return records
+
+def profile_record(seed, symbol):
+    rng = rng_for(seed, 'profile', symbol)
+    record = {'symbol': symbol, 'cik': cik_for(symbol)}
+    for name, field in Stock._fields.items():
+        kind = type(field).__name__
+        if name in record or name in ('id', 'last_updated') or kind not in ('FloatField', 'IntField', 'StringField', 'BooleanField'):
+            continue
+        if name in PROFILE_TEXT:
+            record[name] = PROFILE_TEXT[name].format(symbol=symbol)
+        elif kind == 'FloatField':
+            record[name] = round(rng.uniform(1, 500), 2)
+        elif kind == 'IntField':
+            record[name] = rng.randint(10**5, 10**8)
+        elif kind == 'BooleanField':
+            record[name] = name == 'isActivelyTrading'
+        else:
+            record[name] = f"{name}-{symbol}"
+    record['fullTimeEmployees'] = str(rng.randint(100, 200000))
+    return record
+
+def quote_record(seed, symbol):
+    rng = rng_for(seed, 'quote', symbol, int(time.time()) // 60)
+    record = {'symbol': symbol, 'name': f"{symbol} Holdings Inc."}
+    for name, field in RealTimeQuote._fields.items():
+        kind = type(field).__name__
+        if kind == 'FloatField':
+            record[name] = round(rng.uniform(1, 500), 2)
+        elif kind == 'IntField':
+            record[name] = rng.randint(10**5, 10**8)
+    record['earningsAnnouncement'] = f"{date.today() + timedelta(days=30)}T20:00:00.000+0000"
+    record['timestamp'] = int(time.time())
+    return record
+
+def price_history(seed, symbol, start, end):
+    rng = rng_for(seed, 'history', symbol)
+    bars = []
+    close = rng.uniform(20, 400)
+    day = end - timedelta(days=730)
+    while day <= end:
+        if day.weekday() < 5:
+            close = max(1.0, close * (1 + rng.gauss(0.0003, 0.02)))
+            if day >= start:
+                high = close * (1 + abs(rng.gauss(0, 0.01)))
+                low = close * (1 - abs(rng.gauss(0, 0.01)))
+                bars.append({'date': day.isoformat(), 'open': round((high + low) / 2, 4), 'high': round(high, 4),
+                             'low': round(low, 4), 'close': round(close, 4), 'volume': rng.randint(10**6, 10**8)})
+        day += timedelta(days=1)
+    return list(reversed(bars))
+
+def filing_document(seed, symbol, form_type, size_kb):
+    rng = rng_for(seed, 'filing', symbol, form_type)
+    words = ['revenue', 'segment', 'liquidity', 'risk', 'growth', 'margin', 'customers', 'supply', 'guidance', 'capital']
+    paragraphs, size = [], 0
+    while size < size_kb * 1024:
+        text = ' '.join(rng.choice(words) for _ in range(120))
+        paragraphs.append(f"<p>{symbol} {form_type}: {text}.</p>")
+        size += len(paragraphs[-1])
+    return f"<html><body><h1>{symbol} {form_type}</h1><table><tr><td>Item 1</td></tr></table>{''.join(paragraphs)}</body></html>"
+
+def create_app(config=None):
+    app = Quart(__name__)
+    app.config['UPSTREAM'] = dict(DEFAULT_CONFIG, **(config or {}))
+    stats = Counter()
+    assistants, threads = {}, {}
+    conf = lambda: app.config['UPSTREAM']
+
+    @app.before_request
+    async def inject_latency_and_errors():
+        if request.path.startswith('/__'):
+            return None
+        stats[request.endpoint or request.path] += 1
+        delay = conf()['latency_ms'] + random.uniform(-1, 1) * conf()['jitter_ms']
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if conf()['error_rate'] and random.random() < conf()['error_rate']:
+            stats['__errors'] += 1
+            return Response(json.dumps({'error': 'injected failure'}), status=conf()['error_status'], mimetype='application/json')
+        return None
+
+    def json_response(value, status=200):
+        return Response(json.dumps(value), status=status, mimetype='application/json')
+
+    @app.route('/__stats')
+    async def get_stats():
+        return json_response(dict(stats))
+
+    @app.route('/__config', methods=['POST'])
+    async def set_config():
+        conf().update(await request.get_json())
+        stats.clear()
+        return json_response(conf())
+
+    # FMP
+
+    @app.route('/api/v3/profile/<symbol>')
+    async def profile(symbol):
+        return json_response([profile_record(conf()['seed'], symbol)])
+
+    @app.route('/api/v3/quote/<symbols>')
+    async def quotes(symbols):
+        return json_response([quote_record(conf()['seed'], symbol) for symbol in symbols.split(',') if symbol])
+
+    @app.route('/api/v3/<any("income-statement","balance-sheet-statement","cash-flow-statement","key-metrics"):endpoint>/<symbol>')
+    async def statements(endpoint, symbol):
+        period = request.args.get('period', 'annual')
+        limit = int(request.args.get('limit', 5))
+        return json_response(statement_records(conf()['seed'], endpoint, symbol, period, limit))
+
+    @app.route('/api/v3/historical-price-full/<symbol>')
+    async def historical(symbol):
+        end = date.fromisoformat(request.args['to']) if 'to' in request.args else date.today()
+        start = date.fromisoformat(request.args['from']) if 'from' in request.args else end - timedelta(days=365)
+        return json_response({'symbol': symbol, 'historical': price_history(conf()['seed'], symbol, start, end)})
+
+    # EDGAR
+
+    @app.route('/cgi-bin/browse-edgar')
+    async def browse_edgar():
+        cik, form_type = request.args.get('CIK', ''), request.args.get('type')
+        if not form_type:
+            return Response(f'<html><body><a href="/cgi-bin/browse-edgar?action=getcompany&CIK={cik_for(cik)}">{cik}</a></body></html>',
+                            mimetype='text/html')
+        accession = f"{cik}-24-000001"
+        return Response(
+            '<html><body><table class="tableFile2">'
+            f'<tr><td>{form_type}</td><td><a href="/Archives/edgar/data/{cik}/{accession}-index.htm?type={quote(form_type)}">Documents</a></td>'
+            f'<td>{(date.today() - timedelta(days=40)).isoformat()}</td></tr></table></body></html>', mimetype='text/html')
+
+    @app.route('/Archives/edgar/data/<cik>/<accession>-index.htm')
+    async def filing_index(cik, accession):
+        form_type = request.args.get('type', '10-K')
+        return Response(
+            '<html><body><table class="tableFile">'
+            f'<tr><td>1</td><td>{form_type}</td><td><a href="/ix?doc=/Archives/edgar/data/{cik}/{accession}.htm">{accession}.htm</a></td></tr>'
+            '</table></body></html>', mimetype='text/html')
+
+    @app.route('/Archives/edgar/data/<cik>/<accession>.htm')
+    async def filing(cik, accession):
+        return Response(filing_document(conf()['seed'], cik, '10-K', conf()['filing_kb']), mimetype='text/html')
+
+    # OpenAI Assistants API (only what the app calls)
+
+    def assistant_object(assistant_id, body):
+        return dict({'id': assistant_id, 'object': 'assistant', 'created_at': int(time.time()), 'name': None,
+                     'description': None, 'model': 'gpt-4o-mini', 'instructions': None, 'tools': [], 'metadata': {}},
+                    **body)
+
+    @app.route('/v1/assistants', methods=['POST'])
+    async def create_assistant():
+        assistant_id = f"asst_{len(assistants) + 1}"
+        assistants[assistant_id] = assistant_object(assistant_id, await request.get_json())
+        return json_response(assistants[assistant_id])
+
+    @app.route('/v1/assistants/<assistant_id>', methods=['GET', 'POST'])
+    async def assistant(assistant_id):
+        current = assistants.setdefault(assistant_id, assistant_object(assistant_id, {}))
+        if request.method == 'POST':
+            current.update(await request.get_json())
+        return json_response(current)
+
+    @app.route('/v1/threads', methods=['POST'])
+    async def create_thread():
+        thread_id = f"thread_{len(threads) + 1}"
+        threads[thread_id] = (await request.get_json(silent=True) or {}).get('messages') or []
+        return json_response({'id': thread_id, 'object': 'thread', 'created_at': int(time.time()), 'metadata': {}, 'tool_resources': None})
+
+    @app.route('/v1/threads/<thread_id>', methods=['DELETE'])
+    async def delete_thread(thread_id):
+        threads.pop(thread_id, None)
+        return json_response({'id': thread_id, 'object': 'thread.deleted', 'deleted': True})
+
+    @app.route('/v1/threads/<thread_id>/messages', methods=['POST'])
+    async def create_message(thread_id):
+        body = await request.get_json()
+        threads.setdefault(thread_id, []).append(body)
+        return json_response({'id': f"msg_{len(threads[thread_id])}", 'object': 'thread.message', 'thread_id': thread_id,
+                              'role': body.get('role', 'user'), 'created_at': int(time.time()), 'status': 'completed',
+                              'content': [{'type': 'text', 'text': {'value': body.get('content', ''), 'annotations': []}}]})
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def run_object(thread_id, run_id, status, **extra):
+        return dict({'id': run_id, 'object': 'thread.run', 'thread_id': thread_id, 'assistant_id': 'asst_1',
+                     'status': status, 'created_at': int(time.time()), 'model': 'gpt-4o-mini', 'tools': []}, **extra)
+
+    def stream(events):
+        async def body():
+            for event in events:
+                if event is None:
+                    await asyncio.sleep(conf()['chunk_delay_ms'] / 1000)
+                else:
+                    yield sse(*event).encode()
+            yield b"event: done\ndata: [DONE]\n\n"
+        return Response(body(), mimetype='text/event-stream')
+
+    def reply_events(thread_id, run_id):
+        events = [('thread.run.in_progress', run_object(thread_id, run_id, 'in_progress'))]
+        for i in range(conf()['reply_chunks']):
+            events.append(None)
+            events.append(('thread.message.delta', {'id': f"msg_{run_id}", 'object': 'thread.message.delta', 'delta': {
+                'content': [{'index': 0, 'type': 'text', 'text': {'value': f"Chunk {i} of the analysis. ", 'annotations': []}}]}}))
+        events.append(('thread.run.completed', run_object(thread_id, run_id, 'completed')))
+        return events
+
+    @app.route('/v1/threads/<thread_id>/runs', methods=['POST'])
+    async def create_run(thread_id):
+        run_id = f"run_{random.getrandbits(32):08x}"
+        events = [('thread.run.created', run_object(thread_id, run_id, 'queued'))]
+        if conf()['tool_calls']:
+            tool_call = {'id': f"call_{run_id}", 'type': 'function',
+                         'function': {'name': 'get_stock_data', 'arguments': json.dumps({'data_type': 'summary'})}}
+            events.append(('thread.run.requires_action', run_object(thread_id, run_id, 'requires_action', required_action={
+                'type': 'submit_tool_outputs', 'submit_tool_outputs': {'tool_calls': [tool_call]}})))
+        else:
+            events.extend(reply_events(thread_id, run_id))
+        return stream(events)
+
+    @app.route('/v1/threads/<thread_id>/runs/<run_id>/submit_tool_outputs', methods=['POST'])
+    async def submit_tool_outputs(thread_id, run_id):
+        await request.get_json()
+        return stream(reply_events(thread_id, run_id))
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake FMP, EDGAR and OpenAI Assistants endpoints")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=DEFAULT_CONFIG['latency_ms'], help="Added to every response")
+    parser.add_argument('--jitter-ms', type=float, default=DEFAULT_CONFIG['jitter_ms'], help="Uniform +/- around --latency-ms")
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_CONFIG['error_rate'], help="Fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=DEFAULT_CONFIG['error_status'])
+    parser.add_argument('--seed', type=int, default=DEFAULT_CONFIG['seed'])
+    parser.add_argument('--filing-kb', type=int, default=DEFAULT_CONFIG['filing_kb'], help="Size of served filing documents")
+    parser.add_argument('--no-tool-calls', dest='tool_calls', action='store_false', help="Answer runs without a tool round trip")
+    parser.add_argument('--reply-chunks', type=int, default=DEFAULT_CONFIG['reply_chunks'])
+    parser.add_argument('--chunk-delay-ms', type=float, default=DEFAULT_CONFIG['chunk_delay_ms'])
+    args = parser.parse_args()
+
+    config = {name: value for name, value in vars(args).items() if name in DEFAULT_CONFIG}
+    create_app(config).run(host=args.host, port=args.port, use_reloader=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Measures the cold import cost of the entry-point modules with `python -X importtime`,
+# lists the heaviest third-party packages each one pulls in, and compares against a stored
+# baseline so startup regressions show up in review:
+#
+#   python benchmarks/import_time.py                  # report and compare with the baseline
+#   python benchmarks/import_time.py --save           # record a new baseline
+#   python benchmarks/import_time.py --fail-over 25   # exit 1 if any module is 25% slower
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'import_time_baseline.json')
+
+MODULES = [
+    'app.models.stock',
+    'app.data_retrieval.stock_data_manager',
+    'app.data_processing.stock_analysis',
+    'app.services',
+    'app.scheduler.jobs',
+    'app.main',
+]
+
+# Loaded only on the code paths that need them; importing any of MODULES must not pull these in
+HEAVY_PACKAGES = ['pandas', 'yfinance', 'bs4', 'html2text', 'openai', 'torch', 'transformers']
+
+def parse_importtime(stderr):
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings.setdefault(name.strip(), int(cumulative))
+    return timings
+
+def measure(module, repeat):
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=ROOT, capture_output=True, text=True,
+                                env=dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='1'))
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr.splitlines()[-1]}")
+        timings = parse_importtime(result.stderr)
+        if best is None or timings[module] < best[module]:
+            best = timings
+    return best
+
+def top_level_packages(timings, limit):
+    packages = {}
+    for name, cumulative in timings.items():
+        root = name.split('.')[0]
+        if root == 'app' or root.startswith('_') or root in sys.stdlib_module_names:
+            continue
+        packages[root] = max(packages.get(root, 0), cumulative)
+    return sorted(packages.items(), key=lambda item: -item[1])[:limit]
+
+def main():
+    parser = argparse.ArgumentParser(description="Track the import-time cost of the app's entry points")
+    parser.add_argument('modules', nargs='*', help=f"Modules to measure (default: {', '.join(MODULES)})")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per module; the fastest run is kept")
+    parser.add_argument('--top', type=int, default=5, help="Heaviest packages to list per module")
+    parser.add_argument('--save', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--fail-over', type=float, default=None,
+                        help="Exit 1 if a module is more than this many percent slower than the baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    for module in args.modules or MODULES:
+        timings = measure(module, args.repeat)
+        total_ms = timings[module] / 1000
+        results[module] = round(total_ms, 1)
+        heavy = [name for name in HEAVY_PACKAGES if name in timings]
+
+        line = f"{module:<42} {total_ms:>8.1f} ms"
+        if module in baseline:
+            change = (total_ms - baseline[module]) / baseline[module] * 100
+            line += f"  (baseline {baseline[module]:.1f} ms, {change:+.0f}%)"
+            if args.fail_over is not None and change > args.fail_over:
+                regressions.append(module)
+        print(line)
+        print("    " + ", ".join(f"{name} {us / 1000:.0f} ms" for name, us in top_level_packages(timings, args.top)))
+        if heavy:
+            print(f"    loads heavy packages: {', '.join(heavy)}")
+            regressions.append(module)
+
+    if args.save:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(dict(baseline, **results), f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {os.path.relpath(BASELINE_PATH, ROOT)}")
+
+    if args.fail_over is not None and regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
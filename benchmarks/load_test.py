@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+
+# Fires a fixed number of requests at one or more servers with bounded concurrency and
+# reports throughput and latency percentiles, e.g. to compare the sync Flask server with
+# the ASGI app:
+#
+#   python run.py                                           # sync, port 5000
+#   hypercorn app.asgi:application --bind 0.0.0.0:8000      # async, port 8000
+#   python benchmarks/load_test.py http://localhost:5000 http://localhost:8000 \
+#       --path /api/stock_summary/AAPL --concurrency 200 --requests 2000
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+async def run_load(base_url, paths, method, body, concurrency, total_requests, timeout):
+    latencies = []
+    errors = 0
+    status_counts = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one(i):
+            nonlocal errors
+            path = paths[i % len(paths)]
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(total_requests)])
+        elapsed = time.perf_counter() - started
+
+    return {
+        "url": base_url,
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "throughput_rps": total_requests / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": errors,
+        "status_counts": status_counts,
+    }
+
+def print_report(results):
+    columns = ["url", "throughput_rps", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "errors"]
+    print("  ".join(f"{c:>16}" for c in columns))
+    for result in results:
+        row = []
+        for c in columns:
+            value = result[c]
+            row.append(f"{value:>16.1f}" if isinstance(value, float) else f"{str(value):>16}")
+        print("  ".join(row))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare request throughput and latency across servers")
+    parser.add_argument("urls", nargs="+", help="Base URLs of the servers to test")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="Request path; repeat to rotate through several (default /api/stock_summary/AAPL)")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--json", dest="body", default=None, help="JSON body for POST requests")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    body = json.loads(args.body) if args.body else None
+
+    paths = args.paths or ["/api/stock_summary/AAPL"]
+    results = []
+    for url in args.urls:
+        results.append(asyncio.run(run_load(url, paths, args.method, body, args.concurrency, args.requests, args.timeout)))
+    print_report(results)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,10 @@
+import os
 from app.main import app
+from app.scheduler.jobs import init_scheduler
 
 if __name__ == "__main__":
+    # Development convenience; deployments run `python -m app.scheduler` once instead.
+    # Only the reloader's child process starts it, so there is a single scheduler.
+    if os.getenv('RUN_SCHEDULER') == '1' and os.getenv('WERKZEUG_RUN_MAIN') == 'true':
+        init_scheduler()
     app.run(debug=True)
\ No newline at end of file
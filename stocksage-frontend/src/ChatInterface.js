@@ -89,11 +89,13 @@ const ChatInterface = ({ selectedStock }) => {
     const [messages, setMessages] = useState([]);
     const [input, setInput] = useState('');
     const [isLoading, setIsLoading] = useState(false);
+    const [conversationId, setConversationId] = useState(null);
     const messagesEndRef = useRef(null);
   
     useEffect(() => {
       if (selectedStock) {
         setMessages([]);
+        setConversationId(null);
       }
     }, [selectedStock]);
   
@@ -118,7 +120,9 @@ const ChatInterface = ({ selectedStock }) => {
         const response = await axios.post('/api/chat', {
           message: input,
           stock: selectedStock,
-          conversation_history: messages.map(msg => ({
+          conversation_id: conversationId,
+          // The server keeps the thread, so history is only needed to seed a new conversation
+          conversation_history: conversationId ? [] : messages.map(msg => ({
             role: msg.type === 'user' ? 'user' : 'assistant',
             content: msg.content
           }))
@@ -130,6 +134,7 @@ const ChatInterface = ({ selectedStock }) => {
         
         console.log("Response from server:", response.data);
   
+        setConversationId(response.data.conversation_id);
         const assistantMessage = { type: 'assistant', content: response.data.message };
         setMessages(prev => [...prev, assistantMessage]);
       } catch (error) {
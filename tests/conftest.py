@@ -0,0 +1,22 @@
+import os
+import pytest
+from mongoengine import connect, disconnect
+from mongoengine.connection import get_db
+from app.database import mongodb
+
+# Tests that touch MongoDB run against a scratch database on MONGODB_URI (TEST_DB_NAME,
+# default stocksage_test), dropped around every test, and are skipped without a server
+@pytest.fixture
+def db(monkeypatch):
+    uri = os.getenv('MONGODB_URI')
+    if not uri:
+        pytest.skip("MONGODB_URI must point at a MongoDB server")
+    disconnect()
+    connect(db=os.getenv('TEST_DB_NAME', 'stocksage_test'), host=uri)
+    # ensure_db() would otherwise connect again to the configured database
+    monkeypatch.setattr(mongodb, '_db_initialized', True)
+    database = get_db()
+    database.client.drop_database(database.name)
+    yield database
+    database.client.drop_database(database.name)
+    disconnect()
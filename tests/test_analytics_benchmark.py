@@ -0,0 +1,22 @@
+import json
+import pytest
+from benchmarks.analytics_benchmark import BASELINE_PATH, case_table, measure, selected
+
+def test_patterns_match_bracketed_names_literally():
+    name = 'calculate_rsi[bars=1000]'
+    assert selected(name, [])
+    assert selected(name, ['calculate_rsi[bars=1000]']) and selected(name, ['calculate_rsi*'])
+    assert selected(name, ['calculate_rsi[bars=1???]'])
+    assert not selected(name, ['calculate_rsi[bars=100]']) and not selected('calculate_rsi[bars=1]', ['calculate_rsi[bars=100]'])
+
+def test_case_names_are_unique_and_in_the_baseline():
+    names = [name for name, _ in case_table(42)]
+    assert len(names) == len(set(names))
+    with open(BASELINE_PATH) as f:
+        assert set(json.load(f)) <= set(names)
+
+@pytest.mark.parametrize('name, setup', [(name, setup) for name, setup in case_table(42)
+                                         if name.endswith(('[bars=250]', '[symbols=1]', '[symbols=1,bars=250]'))])
+def test_smallest_cases_run(name, setup):
+    result = measure(setup(), min_time=0, max_rounds=1)
+    assert result['rounds'] == 1 and result['min_ms'] == result['median_ms'] >= 0
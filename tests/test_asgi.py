@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from app import asgi
+from app.models.stock import version_entry
+
+def scope(path, method='GET'):
+    return {'type': 'http', 'path': path, 'method': method}
+
+@pytest.mark.parametrize('path, method, is_async', [
+    ('/api/stock_summary/AAPL', 'GET', True),
+    ('/api/income_statement/AAPL/3', 'GET', True),
+    ('/api/key_metrics/AAPL', 'GET', True),
+    ('/api/10k_filing/AAPL', 'GET', True),
+    ('/api/chat', 'POST', True),
+    # Batch, analytics and account routes stay on Flask
+    ('/api/stock_summary', 'GET', False),
+    ('/api/income_statement', 'GET', False),
+    ('/api/fundamentals/AAPL', 'GET', False),
+    ('/api/chat', 'GET', False),
+    ('/nope', 'GET', False),
+])
+def test_requests_are_routed_to_the_async_views(path, method, is_async):
+    assert asgi.is_async_route(scope(path, method)) is is_async
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+class FakeStocks:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        return FakeCursor([doc for doc in self.docs if doc['symbol'] in query['symbol']['$in']])
+
+class FakeAsyncManager:
+    def __init__(self, docs):
+        self.stocks = FakeStocks(docs)
+        self.calls = []
+
+    async def get_stock_summary(self, symbol):
+        self.calls.append(symbol)
+        return {'symbol': symbol, 'price': 187.5}
+
+def test_async_summary_answers_revalidation_without_the_view(monkeypatch):
+    entry = version_entry({'symbol': 'AAPL'}, now=datetime.now(timezone.utc))
+    manager = FakeAsyncManager([{'symbol': 'AAPL', 'data_versions': {'summary': entry}}])
+    monkeypatch.setattr(asgi, 'async_data_manager', manager)
+
+    async def run():
+        client = asgi.async_app.test_client()
+        first = await client.get('/api/stock_summary/AAPL')
+        second = await client.get('/api/stock_summary/AAPL', headers={'If-None-Match': first.headers['ETag']})
+        return first, await first.get_json(), second
+
+    first, body, second = asyncio.run(run())
+    assert first.status_code == 200 and body == {'symbol': 'AAPL', 'price': 187.5}
+    assert first.headers['ETag'] == f'W/"{entry["etag"]}"'
+    assert second.status_code == 304 and manager.calls == ['AAPL']
@@ -0,0 +1,203 @@
+import asyncio
+import json
+from types import SimpleNamespace as ns
+import pytest
+from app.assistant import assistant as assistant_module
+from app.assistant import async_assistant as async_assistant_module
+from app.assistant.assistant import StockAnalysisAssistant
+from app.assistant.async_assistant import AsyncStockAnalysisAssistant
+from app.utils.ttl_cache import TTLCache
+
+def text(value):
+    return ns(event='thread.message.delta', data=ns(delta=ns(content=[ns(type='text', text=ns(value=value))])))
+
+def requires_action(run_id, *tool_calls):
+    return ns(event='thread.run.requires_action',
+              data=ns(id=run_id, status='requires_action', required_action=ns(submit_tool_outputs=ns(tool_calls=list(tool_calls)))))
+
+def run_status(status):
+    return ns(event=f'thread.run.{status}', data=ns(id='run_1', status=status))
+
+def tool_call(call_id, name, arguments):
+    return ns(id=call_id, function=ns(name=name, arguments=arguments if isinstance(arguments, str) else json.dumps(arguments)))
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+
+    def __iter__(self):
+        return iter(self.events)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+
+# The slice of the openai client the assistant uses: each run or tool output submission
+# returns the next scripted stream of events
+class FakeRuns:
+    def __init__(self, scripts):
+        self.scripts = list(scripts)
+        self.streams = []
+        self.submitted = []
+
+    def _next(self):
+        self.streams.append(FakeStream(self.scripts.pop(0)))
+        return self.streams[-1]
+
+    def create(self, thread_id, assistant_id, instructions, stream):
+        return self._next()
+
+    def submit_tool_outputs(self, thread_id, run_id, tool_outputs, stream):
+        # The paused run's stream is released before its outputs go back
+        assert self.streams[-1].closed
+        self.submitted.append((run_id, tool_outputs))
+        return self._next()
+
+class AsyncFakeRuns(FakeRuns):
+    async def create(self, **kwargs):
+        return super().create(**kwargs)
+
+    async def submit_tool_outputs(self, **kwargs):
+        return super().submit_tool_outputs(**kwargs)
+
+class FakeThreads:
+    def __init__(self, runs):
+        self.runs = runs
+        self.created = []
+
+    def create(self, messages):
+        self.created.append(messages)
+        return ns(id=f'thread_{len(self.created)}')
+
+class AsyncFakeThreads(FakeThreads):
+    async def create(self, messages):
+        return super().create(messages)
+
+def fake_client(*scripts):
+    runs = FakeRuns(scripts)
+    return ns(beta=ns(threads=FakeThreads(runs), assistants=ns(create=lambda **kwargs: ns(id='asst_1'))))
+
+def fake_async_client(*scripts):
+    return ns(beta=ns(threads=AsyncFakeThreads(AsyncFakeRuns(scripts))))
+
+class FakeDataManager:
+    def __init__(self):
+        self.calls = []
+
+    def get_stock_summary(self, symbol):
+        self.calls.append(symbol)
+        return {'symbol': symbol, 'price': 187.5}
+
+class AsyncFakeDataManager(FakeDataManager):
+    async def get_stock_summary(self, symbol):
+        return super().get_stock_summary(symbol)
+
+@pytest.fixture(autouse=True)
+def tool_cache(monkeypatch):
+    cache = TTLCache(60)
+    monkeypatch.setattr(assistant_module, 'tool_result_cache', cache)
+    monkeypatch.setattr(async_assistant_module, 'tool_result_cache', cache)
+    return cache
+
+def build(*scripts):
+    client = fake_client(*scripts)
+    return StockAnalysisAssistant(FakeDataManager(), client=client), client.beta.threads.runs
+
+def build_async(*scripts):
+    client = fake_async_client(*scripts)
+    return AsyncStockAnalysisAssistant(AsyncFakeDataManager(), 'asst_1', client=client), client.beta.threads.runs
+
+def test_text_only_run():
+    assistant, runs = build([text('AAPL '), text('looks '), text('fine.'), run_status('completed')])
+    chunks = list(assistant.stream_stock_conversation('AAPL', 'How is it doing?', []))
+    assert chunks == ['AAPL ', 'looks ', 'fine.']
+    assert runs.submitted == [] and all(stream.closed for stream in runs.streams)
+
+def test_run_resumes_after_tool_outputs():
+    assistant, runs = build(
+        [text('Checking. '), requires_action('run_1', tool_call('call_1', 'get_stock_data', {'symbol': 'AAPL', 'data_type': 'summary'})),
+         text('not reached')],
+        [text('It trades at 187.5.'), run_status('completed')],
+    )
+    content = assistant.process_stock_conversation('AAPL', 'Price?', [])
+    assert content == 'Checking. It trades at 187.5.'
+    [(run_id, outputs)] = runs.submitted
+    assert run_id == 'run_1' and outputs[0]['tool_call_id'] == 'call_1'
+    assert json.loads(outputs[0]['output'])['price'] == 187.5
+    assert len(runs.streams) == 2 and all(stream.closed for stream in runs.streams)
+
+@pytest.mark.parametrize('status', ['failed', 'cancelled', 'expired', 'incomplete'])
+def test_runs_that_end_early_raise(status):
+    assistant, runs = build([text('Partial'), run_status(status)])
+    with pytest.raises(Exception, match=f'Run ended with status: {status}'):
+        list(assistant.stream_stock_conversation('AAPL', 'Price?', []))
+    assert runs.streams[0].closed
+
+def test_failed_run_is_reported_to_the_user():
+    assistant, _ = build([run_status('failed')])
+    assert 'encountered an error' in assistant.process_stock_conversation('AAPL', 'Price?', [])
+    assistant, _ = build([run_status('failed')])
+    assert assistant.analyze_stock('AAPL') is None
+
+def test_async_run_resumes_after_tool_outputs():
+    assistant, runs = build_async(
+        [requires_action('run_1', tool_call('call_1', 'get_stock_data', {'symbol': 'AAPL', 'data_type': 'summary'}))],
+        [text('It trades at 187.5.'), run_status('completed')],
+    )
+    assert asyncio.run(assistant.process_stock_conversation('AAPL', 'Price?', [])) == 'It trades at 187.5.'
+    assert runs.submitted[0][1][0]['tool_call_id'] == 'call_1'
+    assert all(stream.closed for stream in runs.streams)
+
+def test_async_incomplete_run_raises():
+    assistant, _ = build_async([text('Partial'), run_status('incomplete')])
+
+    async def consume():
+        return [chunk async for chunk in assistant.stream_stock_conversation('AAPL', 'Price?', [])]
+
+    with pytest.raises(Exception, match='Run ended with status: incomplete'):
+        asyncio.run(consume())
+
+def test_tool_calls_use_the_symbol_the_model_asks_for():
+    assistant, _ = build()
+    outputs = assistant.handle_tool_calls('AAPL', 'Compare with Microsoft', [
+        tool_call('call_1', 'get_stock_data', {'symbol': 'MSFT', 'data_type': 'summary'}),
+        tool_call('call_2', 'get_stock_data', {'data_type': 'summary'}),
+    ])
+    assert [json.loads(output['output'])['symbol'] for output in outputs] == ['MSFT', 'AAPL']
+    assert sorted(assistant.stock_data_manager.calls) == ['AAPL', 'MSFT']
+
+def test_a_failing_tool_call_does_not_drop_the_others():
+    assistant, runs = build(
+        [requires_action('run_1', tool_call('call_1', 'get_stock_data', '{"symbol": "AAPL", "data_type": '),
+                         tool_call('call_2', 'get_stock_data', {'symbol': 'AAPL', 'data_type': 'summary'}),
+                         tool_call('call_3', 'get_weather', {}))],
+        [text('Done.'), run_status('completed')],
+    )
+    assert assistant.process_stock_conversation('AAPL', 'Price?', []) == 'Done.'
+    outputs = {output['tool_call_id']: json.loads(output['output']) for output in runs.submitted[0][1]}
+    assert set(outputs) == {'call_1', 'call_2', 'call_3'}
+    assert 'get_stock_data failed' in outputs['call_1']['error']
+    assert outputs['call_2']['price'] == 187.5
+    assert outputs['call_3'] == {'error': 'Unknown tool: get_weather'}
+
+def test_async_tool_calls_fail_one_at_a_time():
+    assistant, _ = build_async()
+    outputs = asyncio.run(assistant.handle_tool_calls('AAPL', 'Compare', [
+        tool_call('call_1', 'get_stock_data', 'not json'),
+        tool_call('call_2', 'get_stock_data', {'symbol': 'MSFT', 'data_type': 'summary'}),
+    ]))
+    assert 'error' in json.loads(outputs[0]['output'])
+    assert json.loads(outputs[1]['output'])['symbol'] == 'MSFT'
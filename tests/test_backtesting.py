@@ -0,0 +1,110 @@
+import json
+import sys
+import pytest
+from app import main as main_module
+from app.backtesting import __main__ as cli
+from app.backtesting.data import synthetic_prices
+from app.backtesting.strategies import STRATEGIES, valid_windows
+from app.backtesting.sweep import evaluate, parameter_grid, run_sweep
+
+SMALL_GRID = {'fast': [0, 5, 10, 30], 'slow': [20, 30]}
+
+@pytest.fixture
+def prices():
+    return synthetic_prices(3, 300, seed=7)
+
+@pytest.fixture
+def client(monkeypatch, prices):
+    # No database: the route reads the symbol's bars from the synthetic fixture
+    monkeypatch.setattr(main_module, 'ensure_db', lambda: None)
+    monkeypatch.setattr(main_module, 'load_prices', lambda symbols: prices.select(
+        [symbol for symbol in symbols if symbol in prices.symbols]))
+    return main_module.create_app().test_client()
+
+def test_valid_windows():
+    assert valid_windows(1, 20)
+    assert not valid_windows(0)
+    assert not valid_windows(-3)
+    assert not valid_windows(2.5)
+    assert not valid_windows(True)
+    assert not valid_windows(1, minimum=2)
+
+@pytest.mark.parametrize('strategy, params', [
+    ('sma_crossover', {'fast': 0, 'slow': 5}),
+    ('sma_crossover', {'fast': 2.5, 'slow': 5}),
+    ('sma_crossover', {'fast': 50, 'slow': 20}),
+    ('ema_crossover', {'fast': -1, 'slow': 5}),
+    ('rsi_reversion', {'period': 0}),
+    ('macd_crossover', {'signal': 0}),
+    ('bollinger_reversion', {'window': 1}),
+])
+def test_strategies_reject_invalid_windows(prices, strategy, params):
+    assert STRATEGIES[strategy](prices, **params) is None
+
+@pytest.mark.parametrize('query', [
+    'strategy=sma_crossover&fast=0&slow=5',
+    'strategy=ema_crossover&fast=-1&slow=5',
+    'strategy=rsi_reversion&period=0',
+    'strategy=macd_crossover&signal=0',
+    'strategy=bollinger_reversion&window=1',
+    'strategy=sma_crossover&fast=2.5&slow=5',
+])
+def test_backtest_rejects_invalid_windows(client, prices, query):
+    response = client.get(f'/api/backtest/{prices.symbols[0]}?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Invalid parameters for')
+
+def test_backtest_rejects_bad_requests(client, prices):
+    assert client.get(f'/api/backtest/{prices.symbols[0]}?strategy=nope').status_code == 400
+    assert client.get(f'/api/backtest/{prices.symbols[0]}?fast=abc').status_code == 400
+    assert client.get(f'/api/backtest/{prices.symbols[0]}?speed=3').status_code == 400
+    assert client.get('/api/backtest/MISSING').status_code == 404
+
+@pytest.mark.parametrize('query', [
+    'strategy=sma_crossover&fast=5&slow=20',
+    'strategy=bollinger_reversion&window=2',
+])
+def test_backtest_runs_on_synthetic_prices(client, prices, query):
+    symbol = prices.symbols[0]
+    response = client.get(f'/api/backtest/{symbol}?{query}')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['symbol'] == symbol
+    assert body['metrics']['total_trades'] >= 0
+    # The same request against the same fixture gives the same numbers
+    assert client.get(f'/api/backtest/{symbol}?{query}').get_json() == body
+
+def test_sweep_matches_single_runs(prices):
+    results = run_sweep(prices, 'sma_crossover', grid=SMALL_GRID, workers=1)
+    expected = [result for result in (evaluate(prices, 'sma_crossover', params) for params in parameter_grid(SMALL_GRID))
+                if result]
+    # fast=0 and fast >= slow are dropped
+    assert len(results) == 4
+    assert sorted(results, key=lambda result: json.dumps(result['params'], sort_keys=True)) == \
+        sorted(expected, key=lambda result: json.dumps(result['params'], sort_keys=True))
+    assert run_sweep(prices, 'sma_crossover', grid=SMALL_GRID, workers=1) == results
+
+def test_sweep_in_processes_matches_serial(prices):
+    serial = run_sweep(prices, 'bollinger_reversion', grid={'window': [1, 10, 20], 'num_std': [1.5, 2.0]}, workers=1)
+    parallel = run_sweep(prices, 'bollinger_reversion', grid={'window': [1, 10, 20], 'num_std': [1.5, 2.0]},
+                         workers=2, chunk_size=1)
+    assert len(serial) == 4
+    # Workers see the prices through shared memory, which can move the last bit of a float
+    assert [result['params'] for result in parallel] == [result['params'] for result in serial]
+    for got, expected in zip(parallel, serial):
+        assert dict(got, params=None) == pytest.approx(dict(expected, params=None))
+
+def test_cli_sweep_on_fixture(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['app.backtesting', '--strategy', 'macd_crossover', '--fixture', '3', '300',
+                                      '--sweep', '--workers', '1', '--top', '3'])
+    cli.main()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == '3 symbols x 300 bars'
+    top = [json.loads(line) for line in lines[1:4]]
+    assert [result['mean_sharpe'] for result in top] == sorted((result['mean_sharpe'] for result in top), reverse=True)
+    assert lines[4].startswith('100 parameter sets in')
+
+def test_cli_rejects_invalid_params(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['app.backtesting', '--fixture', '3', '300', 'fast=0', 'slow=5'])
+    with pytest.raises(SystemExit):
+        cli.main()
@@ -0,0 +1,57 @@
+import gzip
+from datetime import datetime
+import numpy as np
+import pytest
+from bson import ObjectId
+from flask import Flask, Response, jsonify, request
+from app.utils import compression
+from app.utils.compression import COMPRESS_MIN_SIZE, compress_response
+from app.utils.json_provider import OrjsonProvider
+
+@pytest.fixture
+def client():
+    # The same wiring as create_app, without the database
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    app.after_request(lambda response: compress_response(response, request))
+
+    @app.route('/large')
+    def large():
+        return jsonify([{'symbol': 'AAPL', 'price': 187.5, 'i': i} for i in range(200)])
+
+    @app.route('/small')
+    def small():
+        return jsonify({'symbol': 'AAPL'})
+
+    @app.route('/stream')
+    def stream():
+        return Response((f"data: {i}\n\n" for i in range(500)), mimetype='text/event-stream')
+
+    @app.route('/values')
+    def values():
+        return jsonify({'id': ObjectId('65a1b2c3d4e5f60718293a4b'), 'date': datetime(2024, 6, 28, 20),
+                        'returns': np.array([0.5, 0.25]), 1: 'key'})
+
+    return app.test_client()
+
+def test_large_json_is_gzipped(client, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in response.vary
+    assert len(gzip.decompress(response.data)) > COMPRESS_MIN_SIZE
+
+def test_brotli_is_preferred_when_available(client):
+    brotli = pytest.importorskip('brotli')
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data).startswith(b'[{"symbol":"AAPL"')
+
+def test_small_streamed_and_unaccepted_responses_are_left_alone(client):
+    assert 'Content-Encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/large', headers={'Accept-Encoding': 'identity'}).headers
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers and response.data.startswith(b'data: 0')
+
+def test_orjson_provider_encodes_mongo_and_numpy_values(client):
+    assert client.get('/values').json == {'id': '65a1b2c3d4e5f60718293a4b', 'date': '2024-06-28T20:00:00+00:00',
+                                          'returns': [0.5, 0.25], '1': 'key'}
@@ -0,0 +1,59 @@
+import re
+import zlib
+from datetime import datetime
+import numpy as np
+from app.models.stock import Stock, SECReport, FinancialStatement
+from app.retrieval.document_index import DocumentIndex
+from app.retrieval.embeddings import chunk_text, normalize
+from app.retrieval.vector_index import IVFIndex
+
+# Hashed bag of words: enough for passages sharing a query's words to score highest
+class FakeEmbedder:
+    dimension = 64
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r'[a-z]+', text.lower()):
+                vectors[row, zlib.crc32(word.encode()) % self.dimension] += 1
+        return normalize(vectors + 1e-3)
+
+    def embed_query(self, text):
+        return self.embed([text])[0]
+
+def test_chunks_overlap():
+    words = [f'w{i}' for i in range(450)]
+    chunks = chunk_text('  '.join(words), max_words=200, overlap=40)
+    assert [chunk.split()[0] for chunk in chunks] == ['w0', 'w160', 'w320']
+    assert chunks[-1].split()[-1] == 'w449'
+    assert chunk_text('  ') == [] and chunk_text('one two') == ['one two']
+
+def test_ivf_search_finds_the_nearest_vectors(tmp_path):
+    rng = np.random.default_rng(7)
+    vectors = normalize(rng.normal(size=(500, 16)).astype(np.float32))
+    passages = [{'symbol': 'AAPL' if i % 2 else 'MSFT', 'i': i} for i in range(500)]
+    index = IVFIndex.build(str(tmp_path / 'index'), vectors, passages, n_lists=8)
+
+    query = vectors[123]
+    exact = np.argsort(-(vectors @ query))[:5]
+    found = index.search(query, k=5, n_probe=8)
+    assert [hit['i'] for hit in found] == exact.tolist()
+    assert abs(found[0]['score'] - 1) < 1e-5
+    assert all(hit['symbol'] == 'MSFT' for hit in index.search(query, k=5, n_probe=1, symbol='MSFT'))
+
+def test_rebuilt_indexes_are_picked_up(db, tmp_path):
+    Stock(symbol='AAPL', description='Apple designs smartphones and personal computers.',
+          sec_reports=[SECReport(filing_type='10-K', url='https://sec.gov/aapl', full_text='Services revenue grew on the App Store.')],
+          income_statement=[FinancialStatement(date=datetime(2024, 9, 28), period='FY', symbol='AAPL', revenue=391.0e9)]).save()
+    Stock(symbol='XOM', description='Exxon explores for and produces crude oil and natural gas.').save()
+    index = DocumentIndex(path=str(tmp_path / 'index'), embedder=FakeEmbedder())
+    assert index.search('oil') == []
+
+    assert index.rebuild() == 4
+    assert index.search('crude oil and natural gas', k=1)[0]['symbol'] == 'XOM'
+    assert [hit['source'] for hit in index.search('App Store services revenue', symbol='AAPL', k=1)] == ['10-K filing']
+
+    # Another process rebuilds the index; this one reloads it on the next search
+    other = DocumentIndex(path=index.path, embedder=FakeEmbedder())
+    assert other.rebuild(['XOM']) == 1
+    assert {hit['symbol'] for hit in index.search('revenue', k=5)} == {'XOM'}
@@ -0,0 +1,60 @@
+import asyncio
+import json
+from benchmarks.fake_upstream import create_app
+from app.data_retrieval.fmp_parser import KEY_METRICS_ALIASES
+from app.data_retrieval.stock_api import build_period_records, parse_real_time_quotes, profile_fields
+from app.models.stock import FinancialStatement, KeyMetrics
+
+def fetch(app, *requests):
+    async def run():
+        client = app.test_client()
+        responses = []
+        for method, path, body in requests:
+            response = await client.open(path, method=method, json=body)
+            responses.append((response.status_code, await response.get_data(as_text=True)))
+        return responses
+
+    return asyncio.run(run())
+
+def get(app, *paths):
+    return [json.loads(data) for _, data in fetch(app, *[('GET', path, None) for path in paths])]
+
+def test_fmp_responses_parse_like_the_real_ones():
+    app = create_app()
+    profile, quotes, statements, metrics = get(app, '/api/v3/profile/AAPL', '/api/v3/quote/AAPL,MSFT',
+                                               '/api/v3/income-statement/AAPL?period=quarter&limit=8',
+                                               '/api/v3/key-metrics/AAPL?limit=3')
+    assert profile_fields(profile[0])['companyName'] == 'AAPL Holdings Inc.'
+    assert sorted(parse_real_time_quotes(quotes)) == ['AAPL', 'MSFT']
+
+    periods = build_period_records(FinancialStatement, statements, None, symbol='AAPL')
+    assert len(periods) == 8 and {period['period'] for period in periods} == {'Q1', 'Q2', 'Q3', 'Q4'}
+    assert all(isinstance(period['revenue'], float) for period in periods)
+    rows = build_period_records(KeyMetrics, metrics, None, symbol='AAPL', aliases=KEY_METRICS_ALIASES)
+    assert all('researchAndDevelopmentToRevenue' in row for row in rows)
+
+def test_data_is_deterministic_per_seed():
+    path = '/api/v3/balance-sheet-statement/AAPL?limit=2'
+    assert get(create_app(), path) == get(create_app(), path)
+    assert get(create_app(), path) != get(create_app({'seed': 7}), path)
+
+def test_injected_failures_are_counted():
+    app = create_app({'error_rate': 1.0, 'error_status': 503})
+    (status, _), (_, stats), (_, _), (status_after, _) = fetch(
+        app, ('GET', '/api/v3/profile/AAPL', None), ('GET', '/__stats', None),
+        ('POST', '/__config', {'error_rate': 0.0}), ('GET', '/api/v3/profile/AAPL', None))
+    assert status == 503 and status_after == 200
+    assert json.loads(stats)['__errors'] == 1
+
+def events(stream):
+    return [line[len('event: '):] for line in stream.splitlines() if line.startswith('event: ')]
+
+def test_runs_ask_for_a_tool_call_then_stream_the_reply():
+    app = create_app({'reply_chunks': 2, 'chunk_delay_ms': 0})
+    (_, thread), = fetch(app, ('POST', '/v1/threads', {'messages': [{'role': 'user', 'content': 'hi'}]}))
+    thread_id = json.loads(thread)['id']
+    (_, run), (_, resumed) = fetch(app, ('POST', f'/v1/threads/{thread_id}/runs', {'assistant_id': 'asst_1', 'stream': True}),
+                                   ('POST', f'/v1/threads/{thread_id}/runs/run_1/submit_tool_outputs', {'tool_outputs': []}))
+    assert events(run) == ['thread.run.created', 'thread.run.requires_action', 'done']
+    assert events(resumed) == ['thread.run.in_progress', 'thread.message.delta', 'thread.message.delta',
+                               'thread.run.completed', 'done']
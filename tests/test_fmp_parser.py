@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+from app.data_retrieval.fmp_parser import (
+    KEY_METRICS_ALIASES, KEY_METRICS_SCHEMA, PROFILE_SCHEMA, QUOTE_SCHEMA, schema_for, sort_periods
+)
+from app.models.stock import KeyMetrics, RealTimeQuote
+
+def test_quote_rows_convert_each_column():
+    rows = QUOTE_SCHEMA.rows([
+        {'symbol': 'AAPL', 'price': 187.5, 'volume': 51234567, 'pe': None, 'dayLow': '186.1',
+         'earningsAnnouncement': '2024-07-25T20:00:00.000+0000', 'exchange': 'NASDAQ'},
+        {'symbol': 'MSFT', 'price': 'n/a', 'volume': 20000000.0},
+    ])
+    assert rows[0] == {'price': 187.5, 'volume': 51234567, 'dayLow': 186.1,
+                       'earningsAnnouncement': datetime(2024, 7, 25, 20, tzinfo=timezone.utc)}
+    # Unset and unparseable values are left out, like to_mongo() leaves out unset fields
+    assert rows[1] == {'volume': 20000000}
+    assert RealTimeQuote._from_son(rows[0]).price == 187.5
+
+def test_profile_row():
+    row = PROFILE_SCHEMA.row({'symbol': 'AAPL', 'companyName': 'Apple Inc.', 'mktCap': 2.9e12, 'volAvg': 5.5e7,
+                              'fullTimeEmployees': 161000, 'defaultImage': 0, 'isFund': None, 'unknownKey': 'x'})
+    assert row == {'symbol': 'AAPL', 'companyName': 'Apple Inc.', 'mktCap': 2.9e12, 'volAvg': 55000000,
+                   'fullTimeEmployees': '161000', 'defaultImage': False}
+
+def key_metrics(date, period, **fields):
+    return dict({'symbol': 'AAPL', 'date': date, 'period': period}, **fields)
+
+def test_key_metrics_use_the_fmp_spelling_and_dates():
+    records = [key_metrics('2023-09-30', 'FY', peRatio=29.4, researchAndDevelopementToRevenue=0.078),
+               key_metrics('2024-06-29', 'Q3', peRatio=None),
+               key_metrics('2019-09-28', 'FY', peRatio=18.0)]
+    rows = sort_periods(KEY_METRICS_SCHEMA.rows(records, start_date=datetime(2020, 1, 1, tzinfo=timezone.utc),
+                                                symbol='AAPL'))
+    # Newest first, older than start_date dropped, naive UTC dates as mongo returns them
+    assert [row['date'] for row in rows] == [datetime(2024, 6, 29), datetime(2023, 9, 30)]
+    assert rows[1]['researchAndDevelopmentToRevenue'] == 0.078 and 'peRatio' not in rows[0]
+
+    documents = KEY_METRICS_SCHEMA.documents(rows)
+    assert all(isinstance(document, KeyMetrics) for document in documents)
+    assert documents[1].peRatio == 29.4 and documents[1].symbol == 'AAPL'
+
+def test_sort_periods_mixes_aware_and_naive_dates():
+    rows = [{'date': datetime(2023, 1, 1)}, {'date': datetime(2024, 1, 1, tzinfo=timezone.utc)}, {'date': datetime(2023, 6, 1)}]
+    assert [row['date'].year * 100 + row['date'].month for row in sort_periods(rows)] == [202401, 202306, 202301]
+
+def test_schemas_are_built_once_per_model_and_aliases():
+    assert schema_for(KeyMetrics, dict(KEY_METRICS_ALIASES)) is KEY_METRICS_SCHEMA
+    assert schema_for(KeyMetrics) is not KEY_METRICS_SCHEMA
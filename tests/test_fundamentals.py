@@ -0,0 +1,54 @@
+from datetime import datetime
+import numpy as np
+import pytest
+from app.data_processing.fundamentals import build_panel, compute_growth, compute_ttm
+
+QUARTER_ENDS = [(3, 31), (6, 30), (9, 30), (12, 31)]
+
+def quarters(first_year, last_year, skip=()):
+    statements = []
+    for year in range(first_year, last_year + 1):
+        for q, (month, day) in enumerate(QUARTER_ENDS, 1):
+            if (year, q) not in skip:
+                statements.append({'date': datetime(year, month, day), 'period': f'Q{q}', 'revenue': 100.0 * year + q})
+    return statements
+
+def years(first_year, last_year, skip=()):
+    return [{'date': datetime(year, 9, 30), 'period': 'FY', 'revenue': 100.0 * (year - 2000)}
+            for year in range(first_year, last_year + 1) if year not in skip]
+
+def panel_for(statements, period):
+    return build_panel([{'symbol': 'AAPL', 'income_statement': statements}], period)
+
+def test_quarterly_growth_compares_the_same_quarter():
+    panel = panel_for(quarters(2022, 2023), 'quarter')
+    yoy = compute_growth(panel)['revenue_yoy'][0]
+    assert np.isnan(yoy[:4]).all()
+    assert yoy[4:] == pytest.approx([100 / (202200 + q) for q in range(1, 5)])
+
+def test_a_missing_quarter_leaves_growth_unset():
+    # Without 2022 Q3 every later column shifts, and a four-column lag from 2023 Q1..Q3
+    # lands on the wrong quarters
+    panel = panel_for(quarters(2022, 2023, skip=[(2022, 3)]), 'quarter')
+    dates = [str(d) for d in panel.dates[0]]
+    yoy = dict(zip(dates, compute_growth(panel)['revenue_yoy'][0]))
+    assert np.isnan([yoy['2023-03-31'], yoy['2023-06-30'], yoy['2023-09-30']]).all()
+    # Q4 2023 is four columns after Q4 2022 and still a year apart
+    assert yoy['2023-12-31'] == pytest.approx((202304 - 202204) / 202204)
+    # Four columns around the gap are not a trailing twelve months either
+    ttm = dict(zip(dates, compute_ttm(panel)['revenue'][0]))
+    assert np.isnan([ttm['2022-12-31'], ttm['2023-03-31'], ttm['2023-06-30']]).all()
+    assert ttm['2023-09-30'] == pytest.approx(202204 + 202301 + 202302 + 202303)
+
+def test_a_missing_year_leaves_annual_growth_unset():
+    panel = panel_for(years(2017, 2024, skip=[2019]), 'annual')
+    growth = compute_growth(panel, years=(3,))
+    dates = [str(d)[:4] for d in panel.dates[0]]
+    yoy = dict(zip(dates, growth['revenue_yoy'][0]))
+    cagr = dict(zip(dates, growth['revenue_cagr_3y'][0]))
+    assert yoy['2018'] == pytest.approx(18 / 17 - 1)
+    assert np.isnan(yoy['2020'])
+    assert yoy['2021'] == pytest.approx(21 / 20 - 1)
+    # Three columns back from 2021 and 2022 is four years back
+    assert np.isnan(cagr['2021']) and np.isnan(cagr['2022'])
+    assert cagr['2023'] == pytest.approx((23 / 20) ** (1 / 3) - 1)
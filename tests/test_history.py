@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from app.migrations.offload_user_history import offload_user_history
+from app.models.history import (
+    UserAnalysis, UserInteraction, RECENT_HISTORY_SIZE, history_page, record_analysis, record_interaction
+)
+from app.models.user import User
+
+# Recent enough for the TTL indexes to keep
+START = (datetime.now(timezone.utc) - timedelta(days=60)).replace(tzinfo=None, microsecond=0)
+
+def legacy_user(username, analyses, interactions):
+    user = {
+        '_id': ObjectId(), 'username': username, 'email': f'{username}@example.com', 'password': 'x',
+        'analysis_history': [{'date': START + timedelta(days=i), 'stock_symbol': 'AAPL', 'model_used': 'm', 'summary': f'a{i}'}
+                             for i in range(analyses)],
+        'interaction_history': [{'timestamp': START + timedelta(days=i), 'type': 'chat', 'message': f'm{i}'}
+                                for i in range(interactions)],
+    }
+    User._get_collection().insert_one(user)
+    return user
+
+def test_offload_copies_history_once_and_trims_the_user(db):
+    user = legacy_user('a', RECENT_HISTORY_SIZE + 10, 3)
+    assert offload_user_history() == {"users": 1, "entries": RECENT_HISTORY_SIZE + 13}
+
+    stored = User._get_collection().find_one({'_id': user['_id']})
+    assert stored['history_offloaded']
+    assert [entry['summary'] for entry in stored['analysis_history']] == [f'a{i}' for i in range(10, RECENT_HISTORY_SIZE + 10)]
+    assert len(stored['interaction_history']) == 3
+    assert UserInteraction.objects(user_id=user['_id'], kind='chat').count() == 3
+
+    # Nothing left to do on a re-run
+    assert offload_user_history() == {"users": 0, "entries": 0}
+    # Nor after a run that copied the entries but died before marking the user
+    User._get_collection().update_one({'_id': user['_id']}, {'$set': {
+        'history_offloaded': False, 'analysis_history': user['analysis_history']}})
+    assert offload_user_history() == {"users": 1, "entries": 0}
+    assert UserAnalysis.objects(user_id=user['_id']).count() == RECENT_HISTORY_SIZE + 10
+
+def test_entries_recorded_since_are_not_copied_again(db):
+    user = legacy_user('a', 2, 0)
+    record_analysis(user['_id'], 'MSFT', 'm', 'recorded')
+    assert len(User._get_collection().find_one({'_id': user['_id']})['analysis_history']) == 3
+    assert offload_user_history() == {"users": 1, "entries": 2}
+    assert UserAnalysis.objects(user_id=user['_id']).count() == 3
+
+def test_recording_keeps_the_user_document_bounded(db):
+    user = legacy_user('a', 0, 0)
+    offload_user_history()
+    for i in range(RECENT_HISTORY_SIZE + 5):
+        record_interaction(user['_id'], 'chat', {'message': f'm{i}'})
+    stored = User._get_collection().find_one({'_id': user['_id']})
+    assert len(stored['interaction_history']) == RECENT_HISTORY_SIZE
+    assert stored['interaction_history'][-1]['message'] == f'm{RECENT_HISTORY_SIZE + 4}'
+    assert UserInteraction.objects(user_id=user['_id']).count() == RECENT_HISTORY_SIZE + 5
+
+def test_history_pages_newest_first(db):
+    user = legacy_user('a', 5, 0)
+    offload_user_history()
+    first = history_page(UserAnalysis, user['_id'], limit=3)
+    second = history_page(UserAnalysis, user['_id'], limit=3, before=first['next'])
+    assert [item['summary'] for item in first['items'] + second['items']] == ['a4', 'a3', 'a2', 'a1', 'a0']
+    assert second['next'] is None
+    assert 'error' in history_page(UserAnalysis, user['_id'], before='nope')
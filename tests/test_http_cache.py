@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import main
+from app.models.stock import Stock, version_entry
+from app.utils.http_cache import CACHE_MAX_AGE
+
+class FakeManager:
+    def __init__(self):
+        self.calls = []
+
+    def get_stock_summary(self, symbol):
+        self.calls.append(symbol)
+        return {"error": f"Stock {symbol} not found"} if symbol == 'NONE' else {'symbol': symbol, 'price': 187.5}
+
+    def get_stock_summaries(self, symbols):
+        return {symbol: self.get_stock_summary(symbol) for symbol in symbols}
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = FakeManager()
+    monkeypatch.setattr(main, 'get_stock_data_manager', lambda: manager)
+    return manager
+
+@pytest.fixture
+def client(db, manager):
+    return main.create_app().test_client()
+
+def store_version(symbol, checked_ago=timedelta(0)):
+    entry = version_entry({'symbol': symbol}, now=datetime.now(timezone.utc) - checked_ago)
+    Stock._get_collection().insert_one({'symbol': symbol, 'data_versions': {'summary': entry}})
+    return entry
+
+def test_responses_carry_validators(client):
+    entry = store_version('AAPL')
+    response = client.get('/api/stock_summary/AAPL')
+    assert response.status_code == 200 and response.json['price'] == 187.5
+    assert response.headers['ETag'] == f'W/"{entry["etag"]}"'
+    assert response.last_modified == entry['modified'].replace(microsecond=0)
+    assert response.cache_control.public and response.cache_control.max_age == CACHE_MAX_AGE['summary']
+
+def test_matching_validators_skip_the_view(client, manager):
+    entry = store_version('AAPL')
+    response = client.get('/api/stock_summary/AAPL', headers={'If-None-Match': f'W/"{entry["etag"]}"'})
+    assert response.status_code == 304 and manager.calls == []
+
+    later = (entry['modified'] + timedelta(seconds=5)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    assert client.get('/api/stock_summary/AAPL', headers={'If-Modified-Since': later}).status_code == 304
+    assert client.get('/api/stock_summary/AAPL', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert manager.calls == ['AAPL']
+
+def test_stale_versions_go_to_the_view(client, manager):
+    entry = store_version('AAPL', checked_ago=timedelta(days=2))
+    response = client.get('/api/stock_summary/AAPL', headers={'If-None-Match': f'W/"{entry["etag"]}"'})
+    assert response.status_code == 200 and manager.calls == ['AAPL']
+
+def test_batch_validators_need_every_symbol(client):
+    entry = store_version('AAPL')
+    store_version('MSFT')
+    response = client.get('/api/stock_summary?symbols=AAPL,MSFT')
+    etag = response.headers['ETag']
+    assert etag != f'W/"{entry["etag"]}"'
+    assert client.get('/api/stock_summary?symbols=AAPL,MSFT', headers={'If-None-Match': etag}).status_code == 304
+    # One symbol without a stored version: no validator for the whole response
+    assert 'ETag' not in client.get('/api/stock_summary?symbols=AAPL,TSLA').headers
+
+def test_errors_are_not_cached(client):
+    response = client.get('/api/stock_summary/NONE')
+    assert 'ETag' not in response.headers and response.cache_control.max_age is None
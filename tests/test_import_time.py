@@ -0,0 +1,14 @@
+import pytest
+from benchmarks.import_time import HEAVY_PACKAGES, MODULES, measure, parse_importtime
+
+def test_parse_importtime_keeps_cumulative_times():
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |     orjson\n"
+              "import time:        80 |        950 | app.utils.json_provider\n"
+              "some other warning\n")
+    assert parse_importtime(stderr) == {'orjson': 120, 'app.utils.json_provider': 950}
+
+@pytest.mark.parametrize('module', MODULES)
+def test_entry_points_do_not_import_heavy_packages(module):
+    timings = measure(module, repeat=1)
+    assert [name for name in HEAVY_PACKAGES if name in timings] == []
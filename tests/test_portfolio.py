@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from app.data_processing import portfolio
+from app.data_processing.portfolio import TRADING_DAYS, value_portfolios, value_positions, volatility_and_beta
+from app.models.stock import Stock
+from app.models.user import User
+
+@pytest.fixture
+def market():
+    rng = np.random.default_rng(3)
+    benchmark = rng.normal(0, 0.01, 250)
+    return benchmark, rng.normal(0, 0.01, 250)
+
+def test_beta_of_a_levered_benchmark(market):
+    benchmark, noise = market
+    returns = np.vstack([2 * benchmark, -0.5 * benchmark + noise])
+    volatility, beta = volatility_and_beta(returns, np.broadcast_to(benchmark, returns.shape))
+    assert beta[0] == pytest.approx(2.0)
+    assert beta[1] == pytest.approx(-0.5, abs=0.2)
+    assert volatility[0] == pytest.approx(2 * np.std(benchmark, ddof=1) * np.sqrt(TRADING_DAYS))
+
+def test_volatility_does_not_need_the_benchmark(market):
+    benchmark, noise = market
+    returns = noise[None, :].copy()
+    # A symbol that missed a few days keeps its volatility over the days it has
+    returns[0, :5] = np.nan
+    volatility, beta = volatility_and_beta(returns, np.full(returns.shape, np.nan))
+    assert volatility[0] == pytest.approx(np.std(noise[5:], ddof=1) * np.sqrt(TRADING_DAYS))
+    assert np.isnan(beta[0])
+
+def test_short_histories_are_left_unset(market):
+    benchmark, noise = market
+    volatility, beta = volatility_and_beta(noise[None, :10], benchmark[None, :10])
+    assert np.isnan(volatility[0]) and np.isnan(beta[0])
+
+def test_value_positions():
+    # Two users; the second holds a symbol without a price
+    valuation = value_positions(np.array([0, 0, 1]), np.array([0, 1, 1]), np.array([10.0, 5.0, 2.0]),
+                                np.array([100.0, 20.0, 30.0]), np.array([110.0, np.nan]), 2)
+    assert valuation['total_value'].tolist() == [1100.0, 0.0]
+    assert valuation['total_pnl'].tolist() == [100.0, 0.0]
+    assert valuation['unrealized_pnl_pct'][0] == pytest.approx(0.1)
+    assert valuation['weight'][0] == 1.0 and np.isnan(valuation['weight'][1])
+
+def store_bars(symbol, closes):
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=len(closes))
+    Stock._get_collection().insert_one({
+        'symbol': symbol,
+        'real_time_quote': {'price': float(closes[-1])},
+        'historical_data': [{'date': start + timedelta(days=i), 'close': float(close)} for i, close in enumerate(closes)],
+    })
+
+def test_value_portfolios_fetches_the_benchmark(db, monkeypatch, market):
+    benchmark, _ = market
+    spy = 400 * np.exp(np.cumsum(benchmark))
+    store_bars('AAPL', 150 * np.exp(np.cumsum(1.5 * benchmark)))
+    User(username='a', email='a@example.com', password='x',
+         portfolio=[{'symbol': 'AAPL', 'quantity': 10, 'average_buy_price': 140}]).save()
+    fetched = []
+
+    def fetch_stock_data(symbol):
+        fetched.append(symbol)
+        store_bars(symbol, spy)
+        return object()
+
+    monkeypatch.setattr(portfolio, 'fetch_stock_data', fetch_stock_data)
+    monkeypatch.setattr(portfolio, '_returns_cache', {})
+    assert value_portfolios(benchmark_symbol='SPY') == {"users": 1, "positions": 1}
+    assert fetched == ['SPY']
+
+    user = User.objects(username='a').first()
+    assert user.portfolio[0].beta == pytest.approx(1.5)
+    assert user.portfolio_summary['beta'] == pytest.approx(1.5)
+    assert user.portfolio_summary['volatility'] > 0
+
+    # Stored from then on, so the next valuation reads it
+    value_portfolios(benchmark_symbol='SPY')
+    assert fetched == ['SPY']
+
+def test_volatility_is_kept_without_a_benchmark(db, monkeypatch, market):
+    _, noise = market
+    store_bars('AAPL', 150 * np.exp(np.cumsum(noise)))
+    User(username='a', email='a@example.com', password='x',
+         portfolio=[{'symbol': 'AAPL', 'quantity': 10, 'average_buy_price': 140}]).save()
+    monkeypatch.setattr(portfolio, 'fetch_stock_data', lambda symbol: None)
+    monkeypatch.setattr(portfolio, '_returns_cache', {})
+    value_portfolios(benchmark_symbol='SPY')
+
+    user = User.objects(username='a').first()
+    assert user.portfolio[0].volatility > 0 and user.portfolio[0].beta is None
+    assert user.portfolio_summary['volatility'] > 0 and user.portfolio_summary['beta'] is None
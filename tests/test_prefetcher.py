@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+from app.data_retrieval.prefetcher import prefetch, rank_symbols
+from app.data_retrieval.stock_data_manager import SUMMARY_MAX_AGE
+from app.models.history import UserAnalysis
+from app.models.user import User
+from app.scheduler import jobs
+
+class FakeScheduler:
+    def __init__(self):
+        self.jobs = []
+
+    def add_job(self, fn, trigger, **kwargs):
+        self.jobs.append((fn, trigger, kwargs))
+
+class FakeManager:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    def _results(self, name, symbols):
+        self.calls.append((name, list(symbols)))
+        return {symbol: {"error": "upstream"} if symbol in self.failing else {"symbol": symbol} for symbol in symbols}
+
+    def get_stock_summaries(self, symbols):
+        return self._results('summaries', symbols)
+
+    def get_key_metrics_batch(self, symbols):
+        return self._results('key_metrics', symbols)
+
+    def get_technical_indicators(self, symbols):
+        return self._results('indicators', symbols)
+
+def test_last_prefetch_leaves_summaries_fresh_at_the_open():
+    scheduler = FakeScheduler()
+    jobs.add_jobs(scheduler)
+    runs = [datetime(2000, 1, 3, kwargs['hour'], kwargs['minute']) for fn, _, kwargs in scheduler.jobs
+            if fn is jobs.prefetch_demanded_stocks]
+    assert runs == sorted(runs) and len(runs) == 2
+    assert runs[-1] < jobs.MARKET_OPEN < runs[-1] + SUMMARY_MAX_AGE
+
+def test_prefetch_times_follow_the_environment(monkeypatch):
+    monkeypatch.setenv('PREFETCH_HOUR', '9')
+    monkeypatch.setenv('PREFETCH_MINUTE', '25')
+    # A first pass after the last one collapses into the last
+    assert jobs.prefetch_times() == [jobs.MARKET_OPEN - jobs.PREFETCH_LEAD]
+
+def test_symbols_are_ranked_by_demand(db):
+    User(username='a', email='a@example.com', password='x', watchlist=[{'symbol': 'msft'}],
+         portfolio=[{'symbol': 'AAPL', 'quantity': 1, 'average_buy_price': 100},
+                    {'symbol': 'AAPL', 'quantity': 2, 'average_buy_price': 120}]).save()
+    user = User(username='b', email='b@example.com', password='x', preferences={'preferred_stocks': ['NVDA', 'MSFT']})
+    user.save()
+    now = datetime.now(timezone.utc)
+    for symbol, age in [('NVDA', 1), ('TSLA', 3), ('TSLA', 90)]:
+        UserAnalysis(user_id=user.id, stock_symbol=symbol, model_used='m', summary='s', date=now - timedelta(days=age)).save()
+
+    # MSFT 3 + 2, AAPL 4 (once per user), NVDA 2 + 1 analysis, TSLA one recent analysis
+    assert rank_symbols() == ['MSFT', 'AAPL', 'NVDA', 'TSLA']
+    assert rank_symbols(limit=2) == ['MSFT', 'AAPL']
+
+def test_prefetch_warms_every_dataset_and_reports_failures(db):
+    User(username='a', email='a@example.com', password='x', watchlist=[{'symbol': 'AAPL'}, {'symbol': 'BAD'}]).save()
+    manager = FakeManager(failing=['BAD'])
+    assert prefetch(manager) == {"symbols": 2, "failed": ['BAD']}
+    assert sorted(name for name, _ in manager.calls) == ['indicators', 'key_metrics', 'summaries']
+
+def test_prefetch_without_demand_does_nothing(db):
+    manager = FakeManager()
+    assert prefetch(manager) == {"symbols": 0, "failed": []}
+    assert manager.calls == []
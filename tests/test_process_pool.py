@@ -0,0 +1,50 @@
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+import numpy as np
+import pytest
+from app.utils import process_pool
+from app.utils.process_pool import SharedArrays, attach_arrays, map_in_pool, run_in_pool, run_in_pool_async, submit
+
+def column_sum(handles, column):
+    return float(attach_arrays(handles)['close'][:, column].sum())
+
+def fail(message):
+    raise ValueError(message)
+
+@pytest.fixture
+def inline(monkeypatch):
+    monkeypatch.setattr(process_pool, 'PROCESS_POOL_WORKERS', 0)
+
+def test_inline_runs_keep_results_and_errors(inline):
+    assert run_in_pool(sum, [1, 2, 3]) == 6
+    assert asyncio.run(run_in_pool_async(max, 2, 5)) == 5
+    assert map_in_pool(abs, [-1, 2, -3]) == [1, 2, 3]
+    with pytest.raises(ValueError, match='bad input'):
+        run_in_pool(fail, 'bad input')
+
+def test_shared_arrays_inline(inline):
+    close = np.arange(12, dtype=np.float64).reshape(4, 3)
+    with SharedArrays({'close': close}) as shared:
+        assert map_in_pool(column_sum, repeat(shared.handles), range(3)) == [18.0, 22.0, 26.0]
+        assert not attach_arrays(shared.handles)['close'].flags.writeable
+
+def test_shared_arrays_in_worker_processes():
+    close = np.arange(12, dtype=np.float64).reshape(4, 3)
+    with process_pool.new_process_pool(2) as pool, SharedArrays({'close': close}) as shared:
+        assert list(pool.map(column_sum, repeat(shared.handles), range(3))) == [18.0, 22.0, 26.0]
+
+class BrokenPool:
+    def submit(self, fn, *args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+class InlinePool:
+    def submit(self, fn, *args, **kwargs):
+        return process_pool._completed(fn, *args, **kwargs)
+
+def test_a_broken_pool_is_replaced_once(monkeypatch):
+    monkeypatch.setattr(process_pool, 'PROCESS_POOL_WORKERS', 1)
+    monkeypatch.setattr(process_pool, '_pool', BrokenPool())
+    monkeypatch.setattr(process_pool, 'new_process_pool', lambda workers: InlinePool())
+    assert submit(sum, [1, 2]).result() == 3
+    assert isinstance(process_pool._pool, InlinePool)
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.models.job import Job
+from app.tasks.queue import JobQueue, JOB_STALE_MINUTES
+
+# Collects what the queue hands to its pool so the tests decide when jobs run
+class FakeExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+    def run_all(self):
+        submitted, self.submitted = self.submitted, []
+        for fn, args in submitted:
+            fn(*args)
+
+@pytest.fixture
+def queue(db):
+    queue = JobQueue(max_workers=1)
+    queue._executor = FakeExecutor()
+    queue.calls = []
+
+    def analyze(symbol):
+        queue.calls.append(symbol)
+        if symbol == 'BAD':
+            raise RuntimeError("upstream down")
+        return {"symbol": symbol}
+
+    queue.register('analyze', analyze)
+    return queue
+
+def test_identical_in_flight_jobs_are_shared(queue):
+    first = queue.submit('analyze', {'symbol': 'AAPL'})
+    assert queue.submit('analyze', {'symbol': 'AAPL'}).job_id == first.job_id
+    assert queue.submit('analyze', {'symbol': 'MSFT'}).job_id != first.job_id
+    assert len(queue._executor.submitted) == 2
+
+    queue._executor.run_all()
+    job = queue.get(first.job_id)
+    assert job.status == 'succeeded' and job.result == {"symbol": 'AAPL'} and job.active_key is None
+    # Once finished, the same request starts a new job
+    assert queue.submit('analyze', {'symbol': 'AAPL'}).job_id != first.job_id
+
+def test_failed_jobs_record_the_error(queue):
+    job = queue.submit('analyze', {'symbol': 'BAD'})
+    queue._executor.run_all()
+    job = queue.get(job.job_id)
+    assert job.status == 'failed' and job.error == "upstream down" and job.active_key is None
+
+def test_unknown_kinds_are_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit('backtest', {})
+
+def test_a_job_is_claimed_once(queue):
+    job = queue.submit('analyze', {'symbol': 'AAPL'})
+    queue._run(job.job_id)
+    queue._run(job.job_id)
+    assert queue.calls == ['AAPL'] and queue.get(job.job_id).attempts == 1
+
+def running_job(job_id, started_minutes_ago, heartbeat_minutes_ago):
+    now = datetime.now(timezone.utc)
+    Job(job_id=job_id, kind='analyze', params={'symbol': job_id}, dedupe_key=job_id, active_key=job_id,
+        status='running', started_at=now - timedelta(minutes=started_minutes_ago),
+        heartbeat_at=now - timedelta(minutes=heartbeat_minutes_ago) if heartbeat_minutes_ago is not None else None).save()
+
+def test_recover_requeues_only_jobs_whose_process_is_gone(queue):
+    stale = JOB_STALE_MINUTES + 5
+    # Long-running but still beating: left to its process
+    running_job('LONG', stale * 4, 1)
+    running_job('DEAD', stale * 2, stale)
+    # Started before heartbeats were recorded
+    running_job('LEGACY', stale, None)
+    running_job('RECENT', 1, None)
+
+    assert queue.recover() == 2
+    assert {job.job_id: job.status for job in Job.objects} == {
+        'LONG': 'running', 'DEAD': 'queued', 'LEGACY': 'queued', 'RECENT': 'running'}
+    queue._executor.run_all()
+    assert sorted(queue.calls) == ['DEAD', 'LEGACY']
+    assert queue.get('DEAD').status == 'succeeded'
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import pytest
+from app.data_retrieval import quote_streamer
+from app.data_retrieval.quote_streamer import AsyncSubscription, QuoteStreamer, Subscription
+from app.models.stock import RealTimeQuote, Stock
+
+class FakeQuotes:
+    def __init__(self, prices, failing=()):
+        self.prices = prices
+        self.failing = set(failing)
+        self.calls = []
+
+    def __call__(self, symbols):
+        self.calls.append(list(symbols))
+        if self.failing & set(symbols):
+            raise RuntimeError("upstream down")
+        return {symbol: RealTimeQuote(price=self.prices[symbol]) for symbol in symbols if symbol in self.prices}
+
+def streamer_for(fetch, **kwargs):
+    streamer = QuoteStreamer(fetch=fetch, batch_size=1, persist=False, **kwargs)
+    # Polls are driven by the tests rather than the background thread
+    streamer._thread = threading.current_thread()
+    return streamer
+
+def drain(subscription):
+    payloads = []
+    while (payload := subscription.get(timeout=0)) is not None:
+        payloads.append((payload['symbol'], payload['price']))
+    return payloads
+
+def test_quotes_are_fetched_once_and_fanned_out():
+    fetch = FakeQuotes({'AAPL': 187.5, 'MSFT': 420.0})
+    streamer = streamer_for(fetch)
+    apple = streamer.subscribe(Subscription(['AAPL']))
+    both = streamer.subscribe(Subscription(['AAPL', 'MSFT']))
+
+    streamer.poll_once()
+    assert fetch.calls == [['AAPL'], ['MSFT']]
+    assert drain(apple) == [('AAPL', 187.5)]
+    assert sorted(drain(both)) == [('AAPL', 187.5), ('MSFT', 420.0)]
+
+    # Only changes are pushed
+    fetch.prices['MSFT'] = 421.0
+    streamer.poll_once()
+    assert drain(apple) == [] and drain(both) == [('MSFT', 421.0)]
+
+    # Late subscribers start from the latest quotes
+    assert sorted(drain(streamer.subscribe(Subscription(['AAPL', 'MSFT'])))) == [('AAPL', 187.5), ('MSFT', 421.0)]
+
+def test_a_failing_batch_does_not_stop_the_others():
+    streamer = streamer_for(FakeQuotes({'AAPL': 187.5, 'BAD': 1.0}, failing=['BAD']))
+    subscription = streamer.subscribe(Subscription(['AAPL', 'BAD']))
+    assert list(streamer.poll_once()) == ['AAPL']
+    assert drain(subscription) == [('AAPL', 187.5)]
+
+def test_unsubscribed_symbols_are_no_longer_polled():
+    fetch = FakeQuotes({'AAPL': 187.5})
+    streamer = streamer_for(fetch)
+    subscription = streamer.subscribe(Subscription(['AAPL']))
+    streamer.unsubscribe(subscription)
+    streamer.poll_once()
+    assert streamer.symbols() == [] and fetch.calls == []
+
+def test_slow_clients_lose_their_oldest_updates(monkeypatch):
+    monkeypatch.setattr(quote_streamer, 'SUBSCRIBER_QUEUE_SIZE', 2)
+    subscription = Subscription(['AAPL'])
+    for price in (1.0, 2.0, 3.0):
+        subscription.deliver({'symbol': 'AAPL', 'price': price})
+    assert drain(subscription) == [('AAPL', 2.0), ('AAPL', 3.0)]
+
+def test_async_subscriptions_receive_updates_from_the_poller_thread():
+    async def receive():
+        subscription = AsyncSubscription(['AAPL'])
+        threading.Thread(target=subscription.deliver, args=({'symbol': 'AAPL', 'price': 187.5},)).start()
+        return await subscription.get(timeout=1)
+
+    assert asyncio.run(receive()) == {'symbol': 'AAPL', 'price': 187.5}
+
+def test_streamed_quotes_move_the_stored_summary_version(db):
+    Stock._get_collection().insert_one({'symbol': 'AAPL', 'companyName': 'Apple Inc.', 'real_time_quote': {'price': 180.0}})
+    streamer = streamer_for(FakeQuotes({'AAPL': 187.5}))
+    streamer.persist = True
+    streamer.subscribe(Subscription(['AAPL']))
+
+    streamer.poll_once()
+    stored = Stock._get_collection().find_one({'symbol': 'AAPL'})
+    first = stored['data_versions']['summary']['etag']
+    assert stored['real_time_quote'] == {'price': 187.5}
+
+    streamer.fetch.prices['AAPL'] = 188.0
+    streamer.poll_once()
+    assert Stock._get_collection().find_one({'symbol': 'AAPL'})['data_versions']['summary']['etag'] != first
@@ -0,0 +1,67 @@
+from app.assistant.report_cache import ReportCache, compute_input_hash
+from app.models.stock import Stock
+
+QUOTE = {'price': 187.44, 'change': 1.2, 'changesPercentage': 0.64, 'pe': 29.1, 'marketCap': 2.9e12,
+         'dayLow': 185.0, 'dayHigh': 188.1, 'volume': 51_000_000, 'previousClose': 186.24, 'eps': 6.44,
+         'sharesOutstanding': 15_441_900_000, 'earningsAnnouncement': '2024-07-25T20:00:00Z'}
+
+class FakeAssistant:
+    def __init__(self):
+        self.calls = []
+
+    def analyze_stock(self, symbol):
+        self.calls.append(symbol)
+        return f"# {symbol}\n\nAnalysis {len(self.calls)}"
+
+class FakeQueue:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, kind, params):
+        self.submitted.append((kind, params))
+
+def store_stock(**quote):
+    Stock._get_collection().insert_one({
+        'symbol': 'AAPL', 'companyName': 'Apple Inc.', 'sector': 'Technology',
+        'real_time_quote': dict(QUOTE, **quote),
+        'income_statement': [{'date': '2024-03-30', 'revenue': 90_753_000_000}],
+    })
+
+def set_quote(**fields):
+    Stock._get_collection().update_one({'symbol': 'AAPL'}, {'$set': {f'real_time_quote.{name}': value
+                                                                    for name, value in fields.items()}})
+
+def test_price_moves_keep_the_hash(db):
+    store_stock()
+    before = compute_input_hash('AAPL')
+    set_quote(price=191.02, change=4.78, changesPercentage=2.57, pe=29.66, marketCap=2.95e12,
+              dayHigh=191.5, volume=63_000_000)
+    assert compute_input_hash('AAPL') == before
+
+def test_session_fields_and_statements_change_the_hash(db):
+    store_stock()
+    before = compute_input_hash('AAPL')
+    set_quote(eps=6.52)
+    after_eps = compute_input_hash('AAPL')
+    assert after_eps != before
+    Stock._get_collection().update_one({'symbol': 'AAPL'}, {'$push': {'income_statement': {
+        '$each': [{'date': '2024-06-29', 'revenue': 85_777_000_000}], '$position': 0}}})
+    assert compute_input_hash('AAPL') not in (before, after_eps)
+
+def test_missing_stock_has_no_hash(db):
+    assert compute_input_hash('NOPE') is None
+
+def test_report_is_regenerated_only_when_inputs_change(db):
+    store_stock()
+    assistant, queue = FakeAssistant(), FakeQueue()
+    cache = ReportCache(assistant, queue)
+
+    first = cache.get_report('AAPL')
+    assert 'Analysis 1' in first
+    set_quote(price=192.0, pe=29.8)
+    assert cache.get_report('AAPL') == first
+    assert assistant.calls == ['AAPL'] and queue.submitted == []
+
+    set_quote(previousClose=187.44)
+    assert cache.get_report('AAPL') == first
+    assert queue.submitted == [('analyze_stock', {'symbol': 'AAPL', 'force_refresh': True})]
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+import pytest
+from app.data_processing.rollups import build_rollup, get_ttm, update_rollup
+from app.models.rollup import StatementRollup
+
+# Fiscal quarters ending on the last Saturday of the quarter, as Apple reports them
+QUARTER_DATES = [datetime(2023, 7, 1), datetime(2023, 9, 30), datetime(2023, 12, 30), datetime(2024, 3, 30), datetime(2024, 6, 29)]
+
+def quarter(i, date):
+    return {'date': date, 'period': f'Q{(i + 2) % 4 + 1}', 'revenue': 100.0 + i, 'netIncome': 20.0 + i,
+            'netIncomeRatio': 0.2, 'weightedAverageShsOutDil': 1000.0 - i}
+
+def income_statements():
+    return ([quarter(i, date) for i, date in enumerate(QUARTER_DATES)]
+            + [{'date': datetime(2023, 9, 30), 'period': 'FY', 'revenue': 400.0, 'netIncome': 80.0}])
+
+def test_ttm_sums_the_last_four_quarters():
+    rollup = build_rollup('income_statement', income_statements())
+    ttm = rollup['ttm']
+    assert ttm['revenue'] == 101 + 102 + 103 + 104 and ttm['netIncome'] == 21 + 22 + 23 + 24
+    # Ratios are recomputed from the sums; share counts are the latest quarter's
+    assert ttm['netIncomeRatio'] == pytest.approx(90 / 410)
+    assert ttm['weightedAverageShsOutDil'] == 996
+    assert ttm['quarters'][0] == datetime(2023, 9, 30, tzinfo=timezone.utc)
+    assert rollup['latest_annual']['revenue'] == 400 and rollup['latest_quarter']['revenue'] == 104
+    assert rollup['series']['ttm']['revenue'][:3] == [None, None, None]
+
+def test_ttm_is_unset_across_a_missing_quarter():
+    statements = [s for s in income_statements() if s['date'] != datetime(2023, 12, 30)]
+    assert build_rollup('income_statement', statements)['ttm'] is None
+
+def test_balance_sheet_ttm_is_the_latest_quarter():
+    statements = [{'date': date, 'period': 'Q1', 'totalAssets': 300.0 + i} for i, date in enumerate(QUARTER_DATES)]
+    rollup = build_rollup('balance_sheet', statements)
+    assert rollup['ttm']['totalAssets'] == 304 and 'ttm' not in rollup['series']
+
+def test_rollups_are_rebuilt_only_for_newer_periods(db):
+    statements = income_statements()
+    assert update_rollup('AAPL', 'income_statement', statements[:-2])['ttm']['revenue'] == 100 + 101 + 102 + 103
+    assert update_rollup('AAPL', 'income_statement', statements[:-2]) is None
+    assert update_rollup('AAPL', 'income_statement', statements)['ttm']['revenue'] == 410
+    assert StatementRollup.objects.count() == 1
+
+    stored = get_ttm('AAPL')
+    assert stored['income_statement']['ttm']['revenue'] == 410 and 'series' not in stored['income_statement']
+    assert 'error' in get_ttm('MSFT')
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace as ns
+from app.assistant.assistant import StockAnalysisAssistant
+from app.assistant.sessions import ChatSessionManager
+from app.models.chat import ChatSession
+
+class FakeMessages:
+    def __init__(self):
+        self.created = []
+
+    def create(self, thread_id, role, content):
+        self.created.append((thread_id, role, content))
+
+class FakeThreads:
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+        self.messages = FakeMessages()
+
+    def create(self, messages):
+        self.created.append(messages)
+        return ns(id=f'thread_{len(self.created)}')
+
+    def delete(self, thread_id):
+        self.deleted.append(thread_id)
+
+def fake_client():
+    return ns(beta=ns(threads=FakeThreads(), assistants=ns(create=lambda **kwargs: ns(id='asst_1'))))
+
+def test_sessions_reuse_their_thread_until_idle(db):
+    client = fake_client()
+    sessions = ChatSessionManager(client, idle_minutes=60)
+    assert sessions.open('c1', 'AAPL', [{'role': 'user', 'content': 'hi'}]) == ('thread_1', True)
+    assert sessions.open('c1', 'AAPL', [{'role': 'user', 'content': 'again'}]) == ('thread_1', False)
+    assert ChatSession.objects(conversation_id='c1').first().message_count == 2
+
+    ChatSession.objects(conversation_id='c1').update_one(set__last_active=datetime.now(timezone.utc) - timedelta(hours=2))
+    assert sessions.open('c1', 'AAPL', []) == ('thread_2', True)
+    assert client.beta.threads.deleted == ['thread_1']
+
+def test_idle_sessions_are_expired(db):
+    client = fake_client()
+    sessions = ChatSessionManager(client, idle_minutes=60)
+    sessions.open('old', 'AAPL', [])
+    sessions.open('new', 'MSFT', [])
+    ChatSession.objects(conversation_id='old').update_one(set__last_active=datetime.now(timezone.utc) - timedelta(hours=2))
+    assert sessions.expire_idle() == 1
+    assert [session.conversation_id for session in ChatSession.objects] == ['new']
+    assert client.beta.threads.deleted == ['thread_1']
+
+def test_history_is_only_sent_when_the_thread_is_created(db):
+    client = fake_client()
+    assistant = StockAnalysisAssistant(object(), client=client)
+    history = [{'role': 'user', 'content': 'How is AAPL?'}, {'role': 'assistant', 'content': 'Fine.'}]
+
+    assert assistant.create_conversation_thread('AAPL', 'And its margins?', history, 'c1') == 'thread_1'
+    assert len(client.beta.threads.created[0]) == 3
+    history += [{'role': 'user', 'content': 'And its margins?'}, {'role': 'assistant', 'content': 'Wide.'}]
+    assert assistant.create_conversation_thread('AAPL', 'Debt?', history, 'c1') == 'thread_1'
+    assert len(client.beta.threads.created) == 1
+    assert client.beta.threads.messages.created == [('thread_1', 'user', 'Regarding AAPL: Debt?')]
+
+    # Clients without a conversation id still get the history replayed
+    assert assistant.create_conversation_thread('AAPL', 'Debt?', history, None) == 'thread_2'
+    assert len(client.beta.threads.created[1]) == 5
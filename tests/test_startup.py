@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from app import services
+from app.database import mongodb
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_python(code):
+    # A fresh interpreter without database or OpenAI settings
+    env = {key: value for key, value in os.environ.items() if key not in ('MONGODB_URI', 'OPENAI_API_KEY')}
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=dict(env, PYTHONPATH=ROOT),
+                          capture_output=True, text=True, timeout=60)
+
+def test_importing_the_apps_sets_nothing_up():
+    result = run_python(
+        "import threading\n"
+        "import app.main, app.asgi\n"
+        "from mongoengine.connection import _connection_settings\n"
+        "from app import services\n"
+        "from app.database import mongodb\n"
+        "assert not _connection_settings and not mongodb._db_initialized, 'database'\n"
+        "assert not services._instances, 'services'\n"
+        "assert [t.name for t in threading.enumerate()] == ['MainThread'], 'threads'\n"
+    )
+    assert result.returncode == 0, result.stderr
+
+def test_ensure_db_connects_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(mongodb, '_db_initialized', False)
+    monkeypatch.setattr(mongodb, 'initialize_db', lambda: calls.append(1))
+    for _ in range(3):
+        mongodb.ensure_db()
+    assert calls == [1]
+
+def test_shared_components_are_built_once(monkeypatch):
+    monkeypatch.setattr(services, '_instances', {})
+    built = []
+
+    def factory():
+        time.sleep(0.05)
+        built.append(object())
+        return built[-1]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(services._get('thing', factory))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1 and all(result is built[0] for result in results)
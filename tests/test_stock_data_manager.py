@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.data_retrieval import stock_data_manager
+from app.data_retrieval.async_stock_data_manager import AsyncStockDataManager
+from app.data_retrieval.stock_data_manager import StockDataManager, KEY_METRICS_MAX_AGE, is_stale, key_metrics_are_fresh
+from app.models.stock import Stock, KeyMetrics
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = StockDataManager()
+    manager.fetched = []
+
+    def get_financial_statement(symbol, statement_type, years=5):
+        manager.fetched.append((symbol, statement_type, years))
+        return [{'date': datetime(2024, 6, 29), 'symbol': symbol, 'fetched': True}]
+
+    def get_key_metrics(symbol, years=5, period=None):
+        manager.fetched.append((symbol, 'key_metrics', years))
+        return [{'date': datetime(2024, 6, 29), 'symbol': symbol, 'fetched': True}]
+
+    monkeypatch.setattr(manager, 'get_financial_statement', get_financial_statement)
+    monkeypatch.setattr(manager, 'get_key_metrics', get_key_metrics)
+    return manager
+
+def days_ago(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).replace(tzinfo=None)
+
+def periods(*ages, **fields):
+    return [dict({'date': days_ago(age)}, **fields) for age in ages]
+
+def test_statement_batch_refreshes_what_the_single_route_would(db, manager):
+    Stock._get_collection().insert_many([
+        # Newest period under a day old: served from the store
+        {'symbol': 'NEW', 'income_statement': periods(0.5, 400, 3000)},
+        # Same rule as fetch_statements: an older newest period is refetched
+        {'symbol': 'OLD', 'income_statement': periods(40, 400)},
+    ])
+    results = manager.get_financial_statements(['NEW', 'OLD', 'NONE'], 'income_statement', years=5)
+    # The years cutoff still applies to what is served from the store
+    assert len(results['NEW']) == 2 and not any(period.get('fetched') for period in results['NEW'])
+    assert results['OLD'][0]['fetched'] and results['NONE'][0]['fetched']
+    assert sorted(symbol for symbol, _, _ in manager.fetched) == ['NONE', 'OLD']
+
+def test_statement_batch_applies_years_to_stored_statements(db, manager):
+    Stock._get_collection().insert_one({'symbol': 'NEW', 'income_statement': periods(0.5, 400, 800)})
+    assert len(manager.get_financial_statements(['NEW'], 'income_statement', years=1)['NEW']) == 1
+    assert len(manager.get_financial_statements(['NEW'], 'income_statement', years=5)['NEW']) == 3
+    assert manager.fetched == []
+
+def test_invalid_statement_type(db, manager):
+    assert manager.get_financial_statements(['AAPL'], 'dividends') == {"error": "Invalid statement type: dividends"}
+
+def test_key_metrics_batch_applies_years_to_stored_metrics(db, manager):
+    now = datetime.now(timezone.utc)
+    Stock._get_collection().insert_one({
+        'symbol': 'AAPL', 'last_updated': now, 'data_versions': {'key_metrics': {'checked': now}},
+        'key_metrics': periods(30, 120, period='Q') + periods(200, 600, 1500, period='FY'),
+    })
+    assert len(manager.get_key_metrics_batch(['AAPL'], years=1)['AAPL']) == 3
+    assert len(manager.get_key_metrics_batch(['AAPL'], years=5)['AAPL']) == 5
+    assert len(manager.get_key_metrics_batch(['AAPL'], years=5, period='FY')['AAPL']) == 3
+    assert manager.fetched == []
+
+def key_metrics_doc(symbol, checked, last_updated, *ages):
+    return {
+        'symbol': symbol, 'last_updated': last_updated,
+        'data_versions': {'key_metrics': {'etag': 'x', 'modified': checked, 'checked': checked}} if checked else {},
+        'key_metrics': periods(*ages, symbol=symbol, period='quarterly'),
+    }
+
+def test_key_metrics_freshness_follows_the_fetch_time():
+    # The profile's last_updated does not matter, only when the metrics were fetched
+    assert key_metrics_are_fresh(key_metrics_doc('A', days_ago(0.5), days_ago(30), 90))
+    assert not key_metrics_are_fresh(key_metrics_doc('A', days_ago(2), days_ago(0), 90))
+    assert not key_metrics_are_fresh(key_metrics_doc('A', None, days_ago(0), 90))
+    assert not key_metrics_are_fresh(key_metrics_doc('A', days_ago(0), days_ago(0)))
+
+def test_key_metrics_are_refetched_by_fetch_time(db, monkeypatch):
+    fetched = []
+
+    def fetch_key_metrics(symbol, years=5):
+        fetched.append(symbol)
+        return [KeyMetrics(date=days_ago(10), period='quarterly', symbol=symbol, peRatio=31.0)]
+
+    monkeypatch.setattr(stock_data_manager, 'fetch_key_metrics', fetch_key_metrics)
+    Stock._get_collection().insert_many([
+        key_metrics_doc('FRESH', days_ago(0.5), days_ago(30), 90, 800),
+        key_metrics_doc('STALE', days_ago(3), days_ago(0), 90),
+    ])
+    manager = StockDataManager()
+
+    fresh = manager.get_key_metrics('FRESH', years=1)
+    assert fetched == [] and len(fresh) == 1
+    stale = manager.get_key_metrics('STALE')
+    assert fetched == ['STALE'] and stale[0]['peRatio'] == 31.0
+
+    # The fetch is recorded, so the next call and the batch path serve it from the store
+    checked = Stock._get_collection().find_one({'symbol': 'STALE'})['data_versions']['key_metrics']['checked']
+    assert not is_stale(checked, KEY_METRICS_MAX_AGE)
+    assert manager.get_key_metrics('STALE')[0]['peRatio'] == 31.0
+    assert manager.get_key_metrics_batch(['FRESH', 'STALE'])['STALE'][0]['peRatio'] == 31.0
+    assert fetched == ['STALE']
+
+class FakeAsyncCollection:
+    def __init__(self, docs):
+        self.docs = {doc['symbol']: doc for doc in docs}
+        self.updates = []
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query['symbol'])
+
+    async def update_one(self, query, update, upsert=False):
+        self.updates.append((query['symbol'], update))
+
+def test_async_key_metrics_use_the_same_rule(monkeypatch):
+    stocks = FakeAsyncCollection([key_metrics_doc('FRESH', days_ago(0.5), days_ago(30), 90),
+                                  key_metrics_doc('STALE', days_ago(3), days_ago(0), 90)])
+    monkeypatch.setattr(AsyncStockDataManager, 'stocks', property(lambda self: stocks))
+    fetched = []
+
+    async def fetch_periods(self, endpoint, symbol, years):
+        fetched.append(symbol)
+        return []
+
+    monkeypatch.setattr(AsyncStockDataManager, '_fetch_periods', fetch_periods)
+    manager = AsyncStockDataManager(http_client=object())
+    assert len(asyncio.run(manager.get_key_metrics('FRESH'))) == 1
+    asyncio.run(manager.get_key_metrics('STALE'))
+    assert fetched == ['STALE']
@@ -0,0 +1,44 @@
+import json
+from datetime import datetime
+from app.assistant.tool_output import CHARS_PER_TOKEN, compact_value, encode_tool_output
+
+def test_values_are_compacted():
+    assert compact_value(187.4399871826172) == 187.4
+    assert compact_value(394328000000.0) == 394300000000
+    assert compact_value(float('nan')) is None
+    assert compact_value(datetime(2024, 6, 29)) == '2024-06-29'
+    assert compact_value('2024-06-29T00:00:00') == '2024-06-29'
+    assert compact_value(True) is True
+
+def test_summary_drops_low_priority_fields_first():
+    summary = {'symbol': 'AAPL', 'price': 187.44, 'pe': 29.1, 'description': 'x' * 400, 'website': 'https://apple.com',
+               'image': None, 'ipoDate': ''}
+    assert json.loads(encode_tool_output(summary, 'summary')) == {
+        'symbol': 'AAPL', 'price': 187.4, 'pe': 29.1, 'description': 'x' * 400, 'website': 'https://apple.com'}
+
+    fitted = json.loads(encode_tool_output(summary, 'summary', token_budget=20))
+    assert len(json.dumps(fitted, separators=(',', ':'))) <= 20 * CHARS_PER_TOKEN
+    assert fitted['symbol'] == 'AAPL' and fitted['price'] == 187.4
+    assert 'description' not in fitted and fitted['omitted_fields'] == 2
+
+def test_errors_are_passed_through():
+    assert json.loads(encode_tool_output({'error': 'Stock not found'}, 'summary', token_budget=1)) == {'error': 'Stock not found'}
+
+def statements(n):
+    return [{'date': f'{2024 - i}-09-28T00:00:00', 'period': 'FY', 'symbol': 'AAPL', 'reportedCurrency': 'USD',
+             'revenue': 383285000000.0 - i * 1e10, 'netIncome': 96995000000.0 - i * 1e9, 'link': f'https://sec.gov/{i}'}
+            for i in range(n)]
+
+def test_statements_become_a_table():
+    table = json.loads(encode_tool_output(statements(3), 'income_statement'))
+    assert table['columns'] == ['date', 'period', 'revenue', 'netIncome', 'link']
+    assert table['constant'] == {'symbol': 'AAPL', 'reportedCurrency': 'USD'}
+    assert table['rows'][0] == ['2024-09-28', 'FY', 383300000000, 97000000000, 'https://sec.gov/0']
+
+def test_statement_tables_fit_the_budget():
+    encoded = encode_tool_output(statements(40), 'income_statement', token_budget=100)
+    assert len(encoded) <= 100 * CHARS_PER_TOKEN
+    table = json.loads(encoded)
+    # Unranked columns go before the ranked ones, then the oldest periods
+    assert table['columns'][:3] == ['date', 'period', 'revenue'] and 'link' not in table['columns']
+    assert table['rows'][0][0] == '2024-09-28' and table['omitted_rows'] > 0
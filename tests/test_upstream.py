@@ -0,0 +1,101 @@
+import json
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from app.data_retrieval import stock_api, upstream
+from app.data_retrieval.upstream import Archive, ArchiveMiss, request_key
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = Archive(str(tmp_path))
+    monkeypatch.setattr(upstream, '_archive', archive)
+    monkeypatch.setattr(upstream, 'UPSTREAM_MODE', 'record')
+    return archive
+
+@pytest.fixture
+def fake_requests(monkeypatch):
+    calls = []
+
+    def get(url, headers=None, timeout=None):
+        calls.append(url)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(fake_requests.bodies[url.split('?')[0]]).encode()
+        response.headers['Content-Type'] = 'application/json'
+        response.encoding = 'utf-8'
+        return response
+
+    fake_requests.bodies = {}
+    fake_requests.calls = calls
+    monkeypatch.setattr(upstream.requests, 'get', get)
+    return fake_requests
+
+def test_request_key_drops_credentials_and_orders_params():
+    assert request_key('https://x/api/quote/AAPL?apikey=secret&b=2&a=1') == 'https://x/api/quote/AAPL?a=1&b=2'
+
+def test_archive_keeps_every_fetch_and_stores_bodies_once(archive, tmp_path):
+    first = datetime(2024, 6, 3, tzinfo=timezone.utc)
+    archive.put('k', b'one', fetched_at=first)
+    archive.put('k', b'two', fetched_at=first + timedelta(hours=1))
+    archive.put('other', b'one', fetched_at=first)
+
+    assert archive.get('k')[1] == b'two'
+    assert archive.get('k', as_of=first + timedelta(minutes=30))[1] == b'one'
+    assert archive.get('k', as_of=first - timedelta(days=1)) == (None, None)
+    assert sorted(archive.keys()) == ['k', 'other']
+    # 'one' is stored once for both keys
+    assert len(list((tmp_path / 'blobs').rglob('*.gz'))) == 2
+
+def test_record_then_replay(archive, fake_requests):
+    fake_requests.bodies['https://fmp/api/v3/profile/AAPL'] = [{'symbol': 'AAPL', 'price': 187.4399871826172}]
+    live = upstream.get('https://fmp/api/v3/profile/AAPL?apikey=one')
+
+    upstream.set_mode('replay')
+    # Replays under any API key, without going upstream
+    replayed = upstream.get('https://fmp/api/v3/profile/AAPL?apikey=two')
+    assert replayed.json() == live.json()
+    assert replayed.headers['Content-Type'] == 'application/json'
+    assert len(fake_requests.calls) == 1
+    with pytest.raises(ArchiveMiss):
+        upstream.get('https://fmp/api/v3/profile/MSFT?apikey=two')
+
+def test_live_mode_archives_nothing(archive, fake_requests):
+    fake_requests.bodies['https://fmp/api/v3/quote/AAPL'] = []
+    upstream.set_mode('live')
+    upstream.get('https://fmp/api/v3/quote/AAPL')
+    upstream.set_mode('record')
+    upstream.get('https://fmp/api/v3/quote/AAPL', record=False)
+    assert list(archive.keys()) == []
+
+def test_frames_replay_bit_for_bit(archive):
+    frame = pd.DataFrame({'Close': [187.4399871826172, 1.7, np.nan, 0.1 + 0.2], 'Volume': [1, 2, 3, 4]},
+                         index=pd.date_range('2024-01-02', periods=4, name='Date'))
+    assert upstream.get_frame('yfinance:history:TEST', lambda: frame) is frame
+
+    upstream.set_mode('replay')
+    replayed = upstream.get_frame('yfinance:history:TEST', lambda: pytest.fail("replay went upstream"))
+    assert np.array_equal(replayed['Close'].to_numpy(), frame['Close'].to_numpy(), equal_nan=True)
+    assert replayed['Volume'].tolist() == [1, 2, 3, 4]
+    assert (replayed.index == frame.index).all()
+
+def test_fmp_history_replays_on_a_later_day(archive, fake_requests, monkeypatch):
+    fake_requests.bodies[f'{stock_api.FMP_BASE_URL}/historical-price-full/AAPL'] = {'historical': [
+        {'date': '2024-06-04', 'open': 194.6, 'high': 195.3, 'low': 193.0, 'close': 194.35, 'volume': 47_000_000},
+        {'date': '2024-06-03', 'open': 192.9, 'high': 194.99, 'low': 192.52, 'close': 194.03, 'volume': 50_000_000},
+    ]}
+    recorded = stock_api.load_fmp_history('AAPL')
+
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(days=3)
+
+    # The URL's from/to dates have moved on, but the recording is found under its stable key
+    monkeypatch.setattr(stock_api, 'datetime', Later)
+    upstream.set_mode('replay')
+    replayed = stock_api.load_fmp_history('AAPL')
+    assert replayed.equals(recorded)
+    assert replayed['Close'].tolist() == [194.03, 194.35]
+    assert len(fake_requests.calls) == 1